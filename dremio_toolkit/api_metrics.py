@@ -0,0 +1,185 @@
+#########################################################################
+# Copyright (C) 2023 UCE Systems Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Contact dremio@ucesys.com
+#########################################################################
+
+import json
+import random
+import threading
+
+
+###
+# Latency and throughput of Dremio API requests by endpoint class, e.g. "GET catalog/{id}/graph".
+# Latencies are kept in a histogram with fixed buckets and a reservoir sample for percentiles.
+###
+class ApiMetrics:
+    LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0]
+    RESERVOIR_SIZE = 1024
+    # Path segments kept as is, other segments after the resource name are IDs
+    _KEYWORDS = ['graph', 'collaboration', 'wiki', 'tag', 'refresh', 'results', 'cancel', 'eula', 'accept', 'queue',
+                 'rule']
+    # Segments followed by a path or a name
+    _BY_SEGMENTS = ['by-path', 'by-name']
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._random = random.Random(0)
+
+    # Returns endpoint class of a Dremio API URL, e.g. "GET catalog/{id}/graph" or "GET catalog/by-path/{path}"
+    @staticmethod
+    def get_endpoint_class(method: str, url: str) -> str:
+        path = url.split('?')[0]
+        for prefix in ['api/v3/', 'apiv2/']:
+            pos = path.find(prefix)
+            if pos >= 0:
+                path = path[pos + len(prefix):]
+                break
+        segments = [segment for segment in path.split('/') if segment != '']
+        endpoint = segments[:1]
+        for segment in segments[1:]:
+            if endpoint[-1] in ApiMetrics._BY_SEGMENTS:
+                endpoint.append('{path}' if endpoint[-1] == 'by-path' else '{name}')
+                break
+            endpoint.append(segment if segment in ApiMetrics._KEYWORDS or segment in ApiMetrics._BY_SEGMENTS
+                            else '{id}')
+        return method + ' ' + '/'.join(endpoint)
+
+    # Records a request attempt. status_code is None if no response was received, then error names the failure.
+    def record_request(self, endpoint_class: str, latency: float, status_code: int = None, bytes_sent: int = 0,
+                       bytes_received: int = 0, error: str = None) -> None:
+        with self._lock:
+            metrics = self._get_endpoint_metrics(endpoint_class)
+            metrics['count'] += 1
+            metrics['bytes_sent'] += bytes_sent
+            metrics['bytes_received'] += bytes_received
+            metrics['latency_sum'] += latency
+            for i, bucket in enumerate(self.LATENCY_BUCKETS):
+                if latency <= bucket:
+                    metrics['latency_buckets'][i] += 1
+                    break
+            else:
+                metrics['latency_buckets'][-1] += 1
+            # Reservoir sampling keeps a uniform sample of all latencies
+            reservoir = metrics['latency_reservoir']
+            if len(reservoir) < self.RESERVOIR_SIZE:
+                reservoir.append(latency)
+            else:
+                i = self._random.randrange(metrics['count'])
+                if i < self.RESERVOIR_SIZE:
+                    reservoir[i] = latency
+            if status_code is None or status_code >= 400:
+                error = str(status_code) if status_code is not None else error
+                metrics['errors'][error] = metrics['errors'].get(error, 0) + 1
+
+    def record_retry(self, endpoint_class: str) -> None:
+        with self._lock:
+            self._get_endpoint_metrics(endpoint_class)['retries'] += 1
+
+    # Returns metrics by endpoint class with latency percentiles in seconds
+    def get_metrics(self) -> dict:
+        with self._lock:
+            result = {}
+            for endpoint_class, metrics in self._endpoints.items():
+                latencies = sorted(metrics['latency_reservoir'])
+                result[endpoint_class] = {
+                    'count': metrics['count'], 'retries': metrics['retries'], 'errors': dict(metrics['errors']),
+                    'bytes_sent': metrics['bytes_sent'], 'bytes_received': metrics['bytes_received'],
+                    'latency_sum': metrics['latency_sum'],
+                    'latency_buckets': dict(zip([str(bucket) for bucket in self.LATENCY_BUCKETS] + ['+Inf'],
+                                                metrics['latency_buckets'])),
+                    'latency_p50': self._get_percentile(latencies, 0.5),
+                    'latency_p95': self._get_percentile(latencies, 0.95),
+                    'latency_p99': self._get_percentile(latencies, 0.99)}
+            return result
+
+    # Returns one line per endpoint class ordered by total time spent, the most expensive first
+    def get_summary(self, max_lines: int = None) -> list:
+        metrics = sorted(self.get_metrics().items(), key=lambda item: item[1]['latency_sum'], reverse=True)
+        lines = []
+        for endpoint_class, m in metrics[:max_lines]:
+            line = endpoint_class + ": " + str(m['count']) + " requests, " + str(round(m['latency_sum'], 1)) + \
+                   "s total, p50/p95/p99 " + "/".join(str(round(m[p] * 1000)) for p in
+                                                      ['latency_p50', 'latency_p95', 'latency_p99']) + " ms"
+            if m['retries'] > 0:
+                line += ", " + str(m['retries']) + " retries"
+            if m['errors']:
+                line += ", errors " + ", ".join(error + ": " + str(count) for error, count in
+                                                sorted(m['errors'].items()))
+            lines.append(line + ".")
+        return lines
+
+    # Writes metrics as a Prometheus text file if the file name ends with .prom, or as JSON otherwise
+    def write_metrics_file(self, filepath: str, command: str = None) -> None:
+        with open(filepath, "w", encoding="utf-8") as f:
+            if filepath.endswith('.prom'):
+                f.write(self.get_prometheus_text(command))
+            else:
+                json.dump({'command': command, 'endpoints': self.get_metrics()}, f, indent=4, sort_keys=True)
+
+    # Returns metrics in Prometheus text exposition format
+    def get_prometheus_text(self, command: str = None) -> str:
+        metrics = self.get_metrics()
+        lines = []
+
+        def labels(endpoint_class, **extra_labels):
+            label_values = {} if command is None else {'command': command}
+            label_values['endpoint'] = endpoint_class
+            label_values.update(extra_labels)
+            return '{' + ','.join(name + '="' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+                                  for name, value in label_values.items()) + '}'
+
+        for name, key, help_text in [('requests_total', 'count', 'Dremio API requests sent.'),
+                                     ('retries_total', 'retries', 'Dremio API requests retried.'),
+                                     ('bytes_sent_total', 'bytes_sent', 'Bytes sent in request bodies.'),
+                                     ('bytes_received_total', 'bytes_received', 'Bytes received in response bodies.')]:
+            lines.append('# HELP dremio_toolkit_api_' + name + ' ' + help_text)
+            lines.append('# TYPE dremio_toolkit_api_' + name + ' counter')
+            for endpoint_class, m in sorted(metrics.items()):
+                lines.append('dremio_toolkit_api_' + name + labels(endpoint_class) + ' ' + str(m[key]))
+        lines.append('# HELP dremio_toolkit_api_errors_total Dremio API requests failed by HTTP status or exception.')
+        lines.append('# TYPE dremio_toolkit_api_errors_total counter')
+        for endpoint_class, m in sorted(metrics.items()):
+            for error, count in sorted(m['errors'].items()):
+                lines.append('dremio_toolkit_api_errors_total' + labels(endpoint_class, error=error) + ' ' + str(count))
+        lines.append('# HELP dremio_toolkit_api_request_duration_seconds Dremio API request latency.')
+        lines.append('# TYPE dremio_toolkit_api_request_duration_seconds histogram')
+        for endpoint_class, m in sorted(metrics.items()):
+            cumulative_count = 0
+            for bucket, count in m['latency_buckets'].items():
+                cumulative_count += count
+                lines.append('dremio_toolkit_api_request_duration_seconds_bucket' +
+                             labels(endpoint_class, le=bucket) + ' ' + str(cumulative_count))
+            lines.append('dremio_toolkit_api_request_duration_seconds_sum' + labels(endpoint_class) + ' ' +
+                         repr(m['latency_sum']))
+            lines.append('dremio_toolkit_api_request_duration_seconds_count' + labels(endpoint_class) + ' ' +
+                         str(m['count']))
+        return '\n'.join(lines) + '\n'
+
+    def _get_endpoint_metrics(self, endpoint_class: str) -> dict:
+        metrics = self._endpoints.get(endpoint_class)
+        if metrics is None:
+            metrics = {'count': 0, 'retries': 0, 'errors': {}, 'bytes_sent': 0, 'bytes_received': 0,
+                       'latency_sum': 0.0, 'latency_buckets': [0] * (len(self.LATENCY_BUCKETS) + 1),
+                       'latency_reservoir': []}
+            self._endpoints[endpoint_class] = metrics
+        return metrics
+
+    @staticmethod
+    def _get_percentile(sorted_values: list, percentile: float) -> float:
+        if len(sorted_values) == 0:
+            return 0.0
+        return sorted_values[min(len(sorted_values) - 1, int(percentile * len(sorted_values)))]
@@ -0,0 +1,139 @@
+#########################################################################
+# Copyright (C) 2023 UCE Systems Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Contact dremio@ucesys.com
+#########################################################################
+
+import atexit
+import gzip
+import json
+import re
+import threading
+import time
+
+import requests
+
+
+###
+# Records Dremio API requests and responses to a gzip compressed JSON lines archive for ReplayEnvApi.
+# The first line is a header, each following line is a request. URLs are recorded relative to the endpoint.
+# Credentials are removed: values of password, secret and token attributes and the login request body.
+###
+class ApiRecorder:
+    FORMAT = 'dremio-toolkit-api-recording'
+    FORMAT_VERSION = 1
+    REDACTED = '***'
+    _RUN_ID_PATTERN = re.compile(r'run_id: [0-9a-fA-F-]{36}')
+
+    def __init__(self, filepath: str, endpoint: str, username: str):
+        self._lock = threading.Lock()
+        self._endpoint = endpoint
+        self._file = gzip.open(filepath, 'wt', encoding='utf-8')
+        # Commands may exit without closing EnvApi, the archive is completed on exit
+        atexit.register(self.close)
+        self._write({'format': self.FORMAT, 'version': self.FORMAT_VERSION, 'username': username})
+
+    def record(self, method: str, url: str, body, response: requests.Response = None, latency: float = 0.0,
+               error: str = None) -> None:
+        entry = {'method': method, 'url': self.get_relative_url(url, self._endpoint),
+                 'body': self.normalize_body(url, body), 'latency': round(latency, 6)}
+        if response is None:
+            entry['error'] = error
+        else:
+            entry['status'] = response.status_code
+            entry['response'] = self._sanitize_text(response.text)
+            if 'Retry-After' in response.headers:
+                entry['retry_after'] = response.headers['Retry-After']
+        self._write(entry)
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    @staticmethod
+    def get_relative_url(url: str, endpoint: str) -> str:
+        return url[len(endpoint):] if url.startswith(endpoint) else url
+
+    # Returns request body as a string that does not depend on the run: credentials and run ID are removed,
+    # JSON is serialized with sorted keys. Used both for recording and for matching requests on replay.
+    @staticmethod
+    def normalize_body(url: str, body):
+        if body is None or url.endswith('/login'):
+            return None
+        if isinstance(body, bytes):
+            body = body.decode('utf-8')
+        if isinstance(body, str):
+            try:
+                body = json.loads(body)
+            except ValueError:
+                return ApiRecorder._RUN_ID_PATTERN.sub('run_id: *', body)
+        body = json.dumps(ApiRecorder._sanitize(body), sort_keys=True)
+        return ApiRecorder._RUN_ID_PATTERN.sub('run_id: *', body)
+
+    def _sanitize_text(self, text: str) -> str:
+        if not any(key in text for key in ['assword', 'ecret', 'oken']):
+            return text
+        try:
+            return json.dumps(self._sanitize(json.loads(text)))
+        except ValueError:
+            return text
+
+    @staticmethod
+    def _sanitize(value):
+        if isinstance(value, dict):
+            return {key: ApiRecorder.REDACTED if ApiRecorder._is_sensitive(key) and isinstance(item, str)
+                    else ApiRecorder._sanitize(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [ApiRecorder._sanitize(item) for item in value]
+        return value
+
+    @staticmethod
+    def _is_sensitive(key: str) -> bool:
+        key = key.lower()
+        return 'password' in key or 'secret' in key or key == 'token'
+
+    def _write(self, entry: dict) -> None:
+        line = json.dumps(entry, separators=(',', ':')) + '\n'
+        with self._lock:
+            self._file.write(line)
+
+
+###
+# HTTP session wrapper recording each request attempt, including retried ones, with ApiRecorder.
+###
+class RecordingSession:
+    def __init__(self, session: requests.Session, recorder: ApiRecorder):
+        self._session = session
+        self._recorder = recorder
+
+    def request(self, method, url, **kwargs):
+        body = kwargs.get('json') if kwargs.get('json') is not None else kwargs.get('data')
+        start_time = time.monotonic()
+        try:
+            response = self._session.request(method, url, **kwargs)
+        except requests.exceptions.RequestException as e:
+            self._recorder.record(method, url, body, latency=time.monotonic() - start_time, error=type(e).__name__)
+            raise
+        self._recorder.record(method, url, body, response, time.monotonic() - start_time)
+        return response
+
+    def close(self) -> None:
+        self._session.close()
+        self._recorder.close()
+
+    # Connection pool statistics are read from the wrapped session
+    def __getattr__(self, name):
+        return getattr(self._session, name)
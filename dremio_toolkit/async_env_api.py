@@ -0,0 +1,510 @@
+#########################################################################
+# Copyright (C) 2023 UCE Systems Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Contact dremio@ucesys.com
+#########################################################################
+
+
+import asyncio
+import functools
+import json
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+from dremio_toolkit.api_metrics import ApiMetrics
+from dremio_toolkit.api_recorder import RecordingSession
+from dremio_toolkit.env_api import EnvApi, PollPolicy
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+###
+# AsyncEnvApi class provides asyncio facade to Dremio API with the same methods as EnvApi.
+# All requests are executed on a single event loop running in a background thread, with the number of in-flight
+# requests bounded by a semaphore. Authentication, retry policy, request budgets, circuit breakers, metrics and
+# response handling are those of the EnvApi instance, only the HTTP transport is aiohttp.
+# Coroutines can be awaited on that loop or executed from any other thread with run() and gather().
+###
+class AsyncEnvApi:
+    DEFAULT_MAX_IN_FLIGHT = 256
+
+    def __init__(self, env_api: EnvApi, max_in_flight: int = None):
+        if aiohttp is None:
+            raise ImportError("AsyncEnvApi requires aiohttp. Install it with: pip install aiohttp")
+        self._env_api = env_api
+        self._logger = env_api._logger
+        self._max_in_flight = AsyncEnvApi.DEFAULT_MAX_IN_FLIGHT if max_in_flight is None else max_in_flight
+        self._session = None
+        self._semaphore = None
+        self._auth_lock = None
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._loop_thread.start()
+
+    # Executes coroutine on the event loop and waits for the result. Must not be called from the event loop thread.
+    def run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    # Awaits all coroutines concurrently. Returns results in order of coroutines.
+    async def gather(self, *coroutines) -> list:
+        return list(await asyncio.gather(*coroutines))
+
+    # Close connections and stop the event loop
+    def close(self) -> None:
+        if self._loop.is_closed():
+            return
+        if self._session is not None:
+            self.run(self._session.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop_thread.join()
+        self._loop.close()
+
+    # Session, semaphore and lock are bound to the event loop and created on first use
+    def _init_session(self) -> None:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_in_flight)
+            self._auth_lock = asyncio.Lock()
+            connector = aiohttp.TCPConnector(limit=self._max_in_flight,
+                                             ssl=None if self._env_api._verify_ssl else False)
+            self._session = aiohttp.ClientSession(
+                connector=connector, timeout=aiohttp.ClientTimeout(total=self._env_api._api_timeout))
+
+    def get_env_endpoint(self) -> str:
+        return self._env_api.get_env_endpoint()
+
+    def get_dremio_version(self):
+        return self._env_api.get_dremio_version()
+
+    def get_username(self):
+        return self._env_api.get_username()
+
+    # Lists all top-level catalog containers.
+    # https://docs.dremio.com/software/rest-api/catalog/get-catalog/
+    async def list_catalogs(self):
+        return await self._http_get(self._env_api._catalog)
+
+    # Returns a CatalogEntity by its path
+    # https://docs.dremio.com/software/rest-api/catalog/get-catalog-path/
+    async def get_catalog_by_path(self, path):
+        if path[0] == '/':
+            path = path[1:]
+        if '#' in path:
+            path = path.replace("#", "%23")
+        return await self._http_get(self._env_api._catalog_by_path + path)
+
+    # Returns a CatalogEntity by its ID
+    # https://docs.dremio.com/software/rest-api/catalog/get-catalog-id/
+    async def get_catalog(self, catalog_id, catalog_name=None):
+        # catalogId can be an actual Dremio UID or a path prefixed with 'dremio:'
+        if catalog_id[:7] == 'dremio:':
+            return await self.get_catalog_by_path(catalog_id[8:])
+        entity = await self._http_get(self._env_api._catalog + catalog_id)
+        if entity is None and catalog_name is not None:
+            self._logger.info("Catalog Name: " + str(catalog_name) + " for the Catalog Id: " + str(catalog_id))
+        return entity
+
+    # Retrieves graph information about a specific catalog entity
+    # https://docs.dremio.com/software/rest-api/catalog/get-catalog-id-graph/
+    async def get_catalog_graph(self, catalog_id, catalog_name=None):
+        entity = await self._http_get(self._env_api._catalog + catalog_id + '/' + self._env_api._graph_postfix)
+        if entity is None and catalog_name is not None:
+            self._logger.info("Catalog Path: " + str(catalog_name) + " for the Catalog Id: " + str(catalog_id))
+        return entity
+
+    # Returns the information of a user by username
+    # https://docs.dremio.com/software/rest-api/user/get-user-2/
+    async def get_user_by_name(self, username):
+        return await self._http_get(self._env_api._user_by_name + username)
+
+    # Returns the information of a user by id
+    # https://docs.dremio.com/software/rest-api/user/get-user-2/
+    async def get_user(self, user_id):
+        return await self._http_get(self._env_api._user + user_id)
+
+    # Returns the information of a group by name
+    # https://docs.dremio.com/software/rest-api/accounts/get-group/
+    async def get_group_by_name(self, group_name):
+        return await self._http_get(self._env_api._group_by_name + group_name)
+
+    # Returns the information of a group by id
+    # https://docs.dremio.com/software/rest-api/accounts/get-group/
+    async def get_group(self, group_id):
+        return await self._http_get(self._env_api._group + group_id)
+
+    # Returns the information of a role by name
+    # https://docs.dremio.com/software/rest-api/roles/get-role-info/
+    async def get_role_by_name(self, role_name):
+        return await self._http_get(self._env_api._role_by_name + role_name)
+
+    # Returns the information of a role by id
+    # https://docs.dremio.com/software/rest-api/roles/get-role-info/
+    async def get_role(self, role_id):
+        return await self._http_get(self._env_api._role + role_id)
+
+    # Returns a list of tags for a specified catalog ID
+    # https://docs.dremio.com/software/rest-api/catalog/wikis-tags/
+    async def get_catalog_tags(self, catalog_id):
+        return await self._http_get(self._env_api._catalog + catalog_id + "/collaboration/tag")
+
+    # Returns wiki for a specified catalog ID
+    # https://docs.dremio.com/software/rest-api/catalog/wikis-tags/
+    async def get_catalog_wiki(self, catalog_id):
+        return await self._http_get(self._env_api._catalog + catalog_id + "/collaboration/wiki")
+
+    # Returns reflection definitions for a specified reflection ID
+    # https://docs.dremio.com/software/rest-api/reflections/get-reflection-id/
+    async def get_reflection(self, reflection_id):
+        return await self._http_get(self._env_api._reflection + reflection_id)
+
+    # Lists all reflections
+    # https://docs.dremio.com/software/rest-api/reflections/get-reflection/
+    async def list_reflections(self):
+        return await self._http_get(self._env_api._reflection)
+
+    # Lists all WLM Queues
+    # https://docs.dremio.com/software/rest-api/wlm/get-wlm-queue/
+    async def list_queues(self):
+        return await self._http_get(self._env_api._wlm_queue)
+
+    # Lists all WLM Rules
+    # https://docs.dremio.com/software/rest-api/wlm/get-wlm-rule/
+    async def list_rules(self):
+        return await self._http_get(self._env_api._wlm_rule)
+
+    # Lists all votes
+    # https://docs.dremio.com/software/rest-api/votes/get-vote/
+    async def list_votes(self):
+        return await self._http_get(self._env_api._vote)
+
+    # Create a catalog
+    # https://docs.dremio.com/software/rest-api/catalog/post-catalog/
+    async def create_catalog(self, catalog_definition):
+        if self._env_api._dry_run:
+            self._logger.warn("Dry Run: not creating catalog.")
+        else:
+            return await self._http_post(self._env_api._catalog, catalog_definition)
+
+    # Updates existing datasets and sources
+    # https://docs.dremio.com/software/rest-api/catalog/put-catalog-id/
+    async def update_catalog(self, catalog_id, catalog_definition):
+        if self._env_api._dry_run:
+            self._logger.warn("Dry Run: not updating catalog.")
+        else:
+            return await self._http_put(self._env_api._catalog + catalog_id, catalog_definition)
+
+    # Create a reflection
+    # https://docs.dremio.com/software/rest-api/reflections/post-reflection/
+    async def create_reflection(self, reflection_definition):
+        if self._env_api._dry_run:
+            self._logger.warn("Dry Run: not creating reflection.")
+        else:
+            return await self._http_post(self._env_api._reflection, reflection_definition)
+
+    # Updates the specific reflection by the specified ID
+    # https://docs.dremio.com/software/rest-api/reflections/put-reflection/
+    async def update_reflection(self, reflection_id, reflection_definition):
+        if self._env_api._dry_run:
+            self._logger.warn("Dry Run: not updating reflection.")
+        else:
+            return await self._http_put(self._env_api._reflection + reflection_id, reflection_definition)
+
+    # Refreshes all reflections dependent on a PDS specified by ID
+    # https://docs.dremio.com/software/rest-api/catalog/post-catalog-id-refresh/
+    async def refresh_reflections_by_pds_id(self, pds_id):
+        if self._env_api._dry_run:
+            self._logger.warn("Dry Run: not refreshing reflections by PDS ID.")
+        else:
+            return await self._http_post(self._env_api._catalog + pds_id + "/" + self._env_api._refresh_postfix,
+                                         idempotent=True)
+
+    # Refreshes all reflections dependent on a PDS specified by path
+    async def refresh_reflections_by_pds_path(self, pds_path):
+        pds = await self.get_catalog_by_path(pds_path)
+        if pds is None:
+            self._logger.error("Could not locate PDS for path: " + str(pds_path))
+            return None
+        if self._env_api._dry_run:
+            self._logger.warn("Dry Run: not refreshing reflections by PDS PATH.")
+            return
+        return await self._http_post(self._env_api._catalog + pds['id'] + "/" + self._env_api._refresh_postfix,
+                                     idempotent=True)
+
+    # Updates wiki for a catalog specified by ID
+    # https://docs.dremio.com/software/rest-api/catalog/post-catalog-collaboration/
+    async def update_wiki(self, catalog_id, wiki):
+        if self._env_api._dry_run:
+            self._logger.warn("Dry Run: not updating wiki.")
+        else:
+            return await self._http_post(self._env_api._catalog + catalog_id + "/collaboration/wiki", wiki)
+
+    # Updates tag for a catalog specified by ID
+    # https://docs.dremio.com/software/rest-api/catalog/post-catalog-collaboration/
+    async def update_tag(self, catalog_id, tag):
+        if self._env_api._dry_run:
+            self._logger.warn("Dry Run: not updating tag.")
+        else:
+            return await self._http_post(self._env_api._catalog + catalog_id + "/collaboration/tag", tag)
+
+    # Promotes a file or folder in a file-based source to a physical dataset
+    # https://docs.dremio.com/software/rest-api/catalog/post-catalog-id/
+    async def promote_pds(self, pds):
+        if self._env_api._dry_run:
+            self._logger.warn("Dry Run: not promoting PDS.")
+            return
+        return await self._http_post(self._env_api._catalog + self._env_api._encode_http_param(pds['id']), pds)
+
+    # Submits SQL for execution and returns Job ID or None. It does not wait for the query to execute.
+    # https://docs.dremio.com/software/rest-api/sql/post-sql/
+    async def submit_sql(self, sql, sql_context=None):
+        sql = json.dumps(sql, indent=4)
+        payload = '{ "sql":' + sql + '' + ("" if sql_context is None else ', "context":"' + sql_context + '"') + ' }'
+        result = await self._http_post(self._env_api._sql, payload, as_json=False)
+        if result is not None:
+            return result["id"]
+        return None
+
+    # Executes SQL and returns Job ID and Execution Status. It waits for the query to complete execution.
+    # Timeout in seconds overrides timeout of the poll policy.
+    # Returns success_status, jobid, job_info
+    # https://docs.dremio.com/software/rest-api/sql/post-sql/
+    async def execute_sql(self, sql, sql_context=None, timeout=None, poll_policy: PollPolicy = None):
+        jobid = await self.submit_sql(sql, sql_context)
+        if jobid is None:
+            return False, None, None
+        job_info = await self.wait_for_job(jobid, timeout, poll_policy)
+        if job_info is None:
+            return False, None, None
+        return job_info["jobState"] == 'COMPLETED', jobid, job_info
+
+    # Polls job status as per poll policy until the job completes, fails or is canceled.
+    # Returns job info or None if job info could not be retrieved or the job did not complete before timeout.
+    async def wait_for_job(self, jobid, timeout=None, poll_policy: PollPolicy = None):
+        if poll_policy is None:
+            poll_policy = self._env_api.DEFAULT_POLL_POLICY
+        if timeout is None:
+            timeout = poll_policy.timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        poll_number = 0
+        try:
+            while True:
+                job_info = await self.get_job_info(jobid)
+                poll_number += 1
+                if job_info is None or job_info["jobState"] in ['COMPLETED', 'CANCELED', 'FAILED']:
+                    return job_info
+                interval = poll_policy.get_interval(poll_number - 1)
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None
+                    interval = min(interval, remaining)
+                await asyncio.sleep(interval)
+        finally:
+            self._env_api._record_job_polls(jobid, poll_number)
+
+    # Returns information for a job specified by ID
+    # https://docs.dremio.com/software/rest-api/job/
+    async def get_job_info(self, jobid):
+        return await self._http_get(self._env_api._job + jobid)
+
+    # Returns job results for a job specified by ID
+    # https://docs.dremio.com/software/rest-api/job/job-results/
+    async def get_job_result(self, jobid, offset=0, limit=100):
+        return await self._http_get(
+            self._env_api._job + jobid + '/results?offset=' + str(offset) + '&limit=' + str(limit))
+
+    # Deletes a reflection specified by ID
+    # https://docs.dremio.com/software/rest-api/reflections/delete-reflection/
+    async def delete_reflection(self, reflection_id):
+        if self._env_api._dry_run:
+            self._logger.warn("Dry Run: not deleting reflection.")
+        else:
+            return await self._http_delete(self._env_api._reflection + reflection_id)
+
+    # Deletes a catalog specified by ID
+    # https://docs.dremio.com/software/rest-api/catalog/delete-catalog-id/
+    async def delete_catalog(self, entity_id):
+        if self._env_api._dry_run:
+            self._logger.warn("Dry Run: not deleting catalog.")
+        else:
+            return await self._http_delete(self._env_api._catalog + entity_id)
+
+    # Executes HTTP GET. Returns JSON if success or None
+    async def _http_get(self, url, re_authenticate=False):
+        env_api = self._env_api
+        circuit_breaker = env_api._get_circuit_breaker(url)
+        if not env_api._allow_request(circuit_breaker, url):
+            return None
+        token = env_api._token
+        try:
+            response = await self._send("GET", env_api._endpoint + url, headers=env_api._headers)
+        except requests.exceptions.Timeout:
+            # This situation might happen when an underlying object (file system eg) is not responding
+            self._logger.error("HTTP Request Timed-out: " + " <" + str(url) + ">")
+            if circuit_breaker is not None:
+                circuit_breaker.record_failure()
+            return None
+        except requests.exceptions.RequestException:
+            # Connection errors also count, otherwise a failed half-open probe would never be released
+            if circuit_breaker is not None:
+                circuit_breaker.record_failure()
+            raise
+        if circuit_breaker is not None:
+            circuit_breaker.record_success()
+        # Try to re-authenticate once since the token might expire
+        if env_api._is_auth_error(response) and not re_authenticate:
+            await self._refresh_token(token)
+            return await self._http_get(url, True)
+        return env_api._process_get_response(url, response)
+
+    # Executes HTTP POST. Returns JSON if success or None
+    async def _http_post(self, url, json_data=None, as_json=True, re_authenticate=False, idempotent=False):
+        env_api = self._env_api
+        json_data = env_api._encode_json_data(json_data)
+        token = env_api._token
+        try:
+            response = await self._send("POST", env_api._endpoint + url, idempotent, headers=env_api._headers,
+                                        **env_api._get_body_kwargs(json_data, as_json))
+        except requests.exceptions.Timeout:
+            # This situation might happen when an underlying object (file system eg) is not responding
+            self._logger.error("HTTP Request Timed-out: " + " <" + str(url) + ">", catalog=json_data)
+            return None
+        # Try to re-authenticate since the token might expire
+        if env_api._is_auth_error(response) and not re_authenticate:
+            await self._refresh_token(token)
+            return await self._http_post(url, json_data, as_json, True, idempotent)
+        return env_api._process_post_response(url, response, json_data)
+
+    # Executes HTTP PUT. Returns JSON if success or None
+    async def _http_put(self, url, json_data, re_authenticate=False):
+        return await self._http_put_or_delete("PUT", url, {'json': json_data}, re_authenticate)
+
+    # Executes HTTP DELETE. Returns JSON if success or None
+    async def _http_delete(self, url, re_authenticate=False):
+        return await self._http_put_or_delete("DELETE", url, {}, re_authenticate)
+
+    async def _http_put_or_delete(self, method, url, body_kwargs: dict, re_authenticate=False):
+        env_api = self._env_api
+        token = env_api._token
+        try:
+            response = await self._send(method, env_api._endpoint + url, headers=env_api._headers, **body_kwargs)
+        except requests.exceptions.Timeout:
+            # This situation might happen when an underlying object (file system eg) is not responding
+            self._logger.error("HTTP Request Timed-out: " + " <" + str(url) + ">")
+            return None
+        # Try to re-authenticate since the token might expire
+        if env_api._is_auth_error(response) and not re_authenticate:
+            await self._refresh_token(token)
+            return await self._http_put_or_delete(method, url, body_kwargs, True)
+        return env_api._process_put_or_delete_response(url, response)
+
+    # Sends HTTP request with retries of transient failures as per retry policy of EnvApi.
+    # Mirrors EnvApi._send, waiting without blocking the event loop.
+    async def _send(self, method: str, url: str, idempotent: bool = None, **kwargs) -> requests.Response:
+        env_api = self._env_api
+        if idempotent is None:
+            idempotent = method in EnvApi.IDEMPOTENT_METHODS
+        self._init_session()
+        budget = env_api._get_request_budget(method, url)
+        endpoint_class = ApiMetrics.get_endpoint_class(method, url)
+        attempt = 0
+        while True:
+            attempt += 1
+            if 'Authorization' in kwargs.get('headers', {}):
+                if env_api._is_token_refresh_due():
+                    await self._refresh_token(env_api._token)
+                # Use the current token, it might have been refreshed by another request
+                kwargs['headers'] = env_api._headers
+            env_api._count_request()
+            if budget is not None:
+                # Waiting for a limited budget blocks, so it is done in a worker thread
+                if budget.is_limited():
+                    await self._loop.run_in_executor(None, budget.acquire)
+                else:
+                    budget.acquire()
+            response, error, retry = None, None, None
+            request_start = time.monotonic()
+            try:
+                async with self._semaphore:
+                    response = await self._request(method, url, **kwargs)
+                retry = env_api._get_retry(attempt, idempotent, response=response)
+            except requests.exceptions.RequestException as e:
+                error = e
+                retry = env_api._get_retry(attempt, idempotent, error=e)
+                if retry is None:
+                    raise
+            finally:
+                env_api._finish_attempt(budget, endpoint_class, time.monotonic() - request_start, response, error)
+            if retry is None:
+                return response
+            await asyncio.sleep(env_api._get_retry_backoff(method, url, attempt, retry, endpoint_class))
+
+    # Sends a single HTTP request and returns it as requests.Response, so that it is handled as by EnvApi.
+    # aiohttp errors are raised as the requests exceptions EnvApi retries. Sessions of EnvApi that are not
+    # HTTP sessions, e.g. replay, are called in a worker thread.
+    async def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        env_api = self._env_api
+        if not isinstance(env_api._session, (requests.Session, RecordingSession)):
+            return await self._loop.run_in_executor(None, functools.partial(
+                env_api._session.request, method, url, timeout=env_api._api_timeout, verify=env_api._verify_ssl,
+                **kwargs))
+        body = kwargs.get('json') if kwargs.get('json') is not None else kwargs.get('data')
+        data = json.dumps(kwargs['json']).encode('utf-8') if kwargs.get('json') is not None else kwargs.get('data')
+        request_start = time.monotonic()
+        try:
+            async with self._session.request(method, url, headers=kwargs.get('headers'), data=data) as aio_response:
+                content = await aio_response.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            error = self._get_request_exception(url, e)
+            if env_api._recorder is not None:
+                env_api._recorder.record(method, url, body, latency=time.monotonic() - request_start,
+                                         error=type(error).__name__)
+            raise error from e
+        response = requests.Response()
+        response.status_code = aio_response.status
+        response.reason = aio_response.reason
+        response.headers = CaseInsensitiveDict(aio_response.headers)
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.url = url
+        response._content = content
+        response.request = requests.PreparedRequest()
+        response.request.prepare(method=method, url=url, data=data)
+        if env_api._recorder is not None:
+            env_api._recorder.record(method, url, body, response, time.monotonic() - request_start)
+        return response
+
+    # Returns the requests exception for an aiohttp error. Failures to connect are raised as by urllib3, since
+    # requests that have not reached Dremio are safe to retry.
+    @staticmethod
+    def _get_request_exception(url: str, error: Exception) -> requests.exceptions.RequestException:
+        if isinstance(error, (asyncio.TimeoutError, aiohttp.ServerTimeoutError)):
+            return requests.exceptions.Timeout(str(error))
+        if isinstance(error, aiohttp.ClientConnectorError):
+            return requests.exceptions.ConnectionError(MaxRetryError(None, url, NewConnectionError(None, str(error))))
+        return requests.exceptions.ConnectionError(str(error))
+
+    # Re-authenticates with the blocking EnvApi in a worker thread unless the stale token has already been replaced.
+    # Concurrent requests wait for a single login.
+    async def _refresh_token(self, stale_token: str) -> None:
+        self._init_session()
+        async with self._auth_lock:
+            if stale_token == self._env_api._token:
+                await self._loop.run_in_executor(None, self._env_api._refresh_token, stale_token)
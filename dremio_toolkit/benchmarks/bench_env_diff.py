@@ -0,0 +1,79 @@
+#########################################################################
+# Copyright (C) 2023 UCE Systems Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Contact dremio@ucesys.com
+#########################################################################
+
+import argparse
+import time
+
+from dremio_toolkit.context import Context
+from dremio_toolkit.env_definition import EnvDefinition
+from dremio_toolkit.env_diff import EnvDiff
+
+
+def parse_args():
+    arg_parser = argparse.ArgumentParser(
+        description='Benchmark for comparing snapshots with EnvDiff. Measures diff time for snapshots with '
+                    'increasing number of VDSs to demonstrate scaling.')
+    arg_parser.add_argument("-s", "--sizes", help="Numbers of VDSs in each snapshot.", type=int, nargs='+',
+                            default=[1000, 2000, 4000, 8000, 16000, 32000])
+    return arg_parser.parse_args()
+
+
+# Generate a pair of snapshots with num_vds VDSs each. Every 10th VDS is changed, every 20th is missing in comp.
+def generate_env_defs(num_vds: int) -> (EnvDefinition, EnvDefinition):
+    base_env_def = EnvDefinition()
+    comp_env_def = EnvDefinition()
+    for env_def in [base_env_def, comp_env_def]:
+        env_def.referenced_users = [{'id': 'user-id', 'name': 'user'}]
+    for i in range(num_vds):
+        vds = {'entityType': 'dataset', 'type': 'VIRTUAL_DATASET', 'path': ['Space', 'Folder' + str(i % 100), 'VDS' + str(i)],
+               'sql': 'SELECT * FROM Source.table' + str(i), 'sqlContext': ['Space'],
+               'owner': {'ownerId': 'user-id', 'ownerType': 'USER'}, 'accessControlList': {}}
+        base_env_def.vds_list.append(vds)
+        if i % 20 == 0:
+            continue
+        comp_vds = dict(vds)
+        if i % 10 == 0:
+            comp_vds['sql'] = vds['sql'] + ' WHERE 1=1'
+        comp_env_def.vds_list.append(comp_vds)
+    return base_env_def, comp_env_def
+
+
+def bench_env_diff(sizes: list) -> list:
+    context = Context(Context.CMD_DIFF_SNAPSHOT)
+    context.init_logger(log_level='ERROR', log_verbose=False)
+    results = []
+    for num_vds in sizes:
+        base_env_def, comp_env_def = generate_env_defs(num_vds)
+        env_diff = EnvDiff(context)
+        env_diff.diff_vds = []
+        start_time = time.perf_counter()
+        env_diff.diff_snapshot(base_env_def, comp_env_def)
+        elapsed = time.perf_counter() - start_time
+        results.append({'vds': num_vds, 'seconds': elapsed, 'microseconds_per_vds': elapsed / num_vds * 1000000,
+                        'differences': len(env_diff.diff_vds)})
+    return results
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    results = bench_env_diff(args.sizes)
+    print()
+    print('VDS'.rjust(10) + 'Seconds'.rjust(12) + 'us/VDS'.rjust(10) + 'Diffs'.rjust(10))
+    for result in results:
+        print(str(result['vds']).rjust(10) + ('%.3f' % result['seconds']).rjust(12) +
+              ('%.1f' % result['microseconds_per_vds']).rjust(10) + str(result['differences']).rjust(10))
@@ -0,0 +1,338 @@
+#########################################################################
+# Copyright (C) 2023 UCE Systems Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Contact dremio@ucesys.com
+#########################################################################
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from contextlib import redirect_stdout
+from datetime import datetime
+
+from dremio_toolkit.context import Context
+from dremio_toolkit.diff_snapshot import diff_snapshot
+from dremio_toolkit.env_api import EnvApi
+from dremio_toolkit.env_definition import EnvDefinition
+from dremio_toolkit.env_file_writer import EnvFileWriter
+from dremio_toolkit.exec_sql import exec_sql
+from dremio_toolkit.explode_snapshot import explode_snapshot
+from dremio_toolkit.implode_snapshot import implode_snapshot
+from dremio_toolkit.push_snapshot import push_snapshot
+from dremio_toolkit.rebuild_metadata import rebuild_metadata
+from dremio_toolkit.take_snapshot import create_snapshot
+from dremio_toolkit.testing.mock_dremio_server import MockDremioServer
+from dremio_toolkit.testing.mock_env_definition import generate_env_definition
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Benchmarks in the order they run. create_snapshot and explode_snapshot produce inputs of later benchmarks
+# but every benchmark falls back to the generated environment file when run on its own.
+BENCHMARKS = ['create_snapshot', 'push_snapshot', 'diff_snapshot', 'explode_snapshot', 'implode_snapshot',
+              'exec_sql', 'rebuild_metadata']
+RESULTS_FORMAT = 'dremio-toolkit-benchmark-results'
+USER = 'admin'
+PASSWORD = 'password'
+# Files in the work directory of each size
+GENERATED_FILENAME = 'generated.json'
+CHANGED_FILENAME = 'changed.json'
+SNAPSHOT_FILENAME = 'snapshot.json'
+EXPLODED_DIRNAME = 'exploded'
+IMPLODED_FILENAME = 'imploded.json'
+SQL_FILENAME = 'statements.sql'
+# Wall time differences below this are timer and scheduling noise, not regressions
+MIN_SECONDS_REGRESSION = 0.1
+
+
+def parse_args():
+    arg_parser = argparse.ArgumentParser(
+        description='Benchmark suite for dremio-toolkit commands. Runs every command against generated environments '
+                    'served by MockDremioServer and reports wall time, number of API requests, peak RSS and objects '
+                    'per second. Each benchmark runs in its own process so peak RSS is measured per command.')
+    arg_parser.add_argument("-s", "--sizes", help="Approximate numbers of objects (sources, spaces, folders, PDSs and "
+                                                  "VDSs) in each generated environment.", type=int, nargs='+',
+                            default=[1000, 10000, 100000])
+    arg_parser.add_argument("-b", "--benchmarks", help="Benchmarks to run. All by default.", nargs='+',
+                            choices=BENCHMARKS, default=BENCHMARKS)
+    arg_parser.add_argument("-c", "--concurrency", help="Concurrency of commands that support it. Default is 8.",
+                            type=int, default=8)
+    arg_parser.add_argument("-l", "--latency", help="Latency of every MockDremioServer request in seconds. "
+                                                    "Default is 0.", type=float, default=0.0)
+    arg_parser.add_argument("-w", "--work-dir", help="Directory for generated environments, snapshots and logs.",
+                            default='bench_work')
+    arg_parser.add_argument("-o", "--output-filename", help="JSON file name for the benchmark results.",
+                            default='bench_results.json')
+    arg_parser.add_argument("-r", "--baseline-filename", help="Results file of a previous run. Exits with code 1 if "
+                                                              "any benchmark regressed against it.", required=False)
+    arg_parser.add_argument("-t", "--tolerance", help="Allowed relative increase of wall time, request count and peak "
+                                                      "RSS over the baseline. Default is 0.2.", type=float, default=0.2)
+    # Internal arguments of the benchmark child process
+    arg_parser.add_argument("--run-benchmark", help=argparse.SUPPRESS, choices=BENCHMARKS)
+    arg_parser.add_argument("--endpoint", help=argparse.SUPPRESS)
+    arg_parser.add_argument("--size-dir", help=argparse.SUPPRESS)
+    return arg_parser.parse_args()
+
+
+# Generates an environment with approximately num_objects objects: 10% PDSs, VDSs and a few spaces with folders.
+def generate_benchmark_env(num_objects: int) -> EnvDefinition:
+    num_spaces = max(2, num_objects // 2000)
+    folder_depth = 2
+    folders_per_level = 3
+    num_folders = num_spaces * sum(folders_per_level ** level for level in range(1, folder_depth + 1))
+    num_pds = max(1, num_objects // 10)
+    num_vds = max(1, num_objects - num_pds - num_folders - num_spaces - 1)
+    return generate_env_definition(num_spaces=num_spaces, folder_depth=folder_depth,
+                                   folders_per_level=folders_per_level, num_vds=num_vds, num_sources=1,
+                                   num_pds=num_pds, num_users=max(10, num_objects // 1000),
+                                   num_roles=max(5, num_objects // 2000))
+
+
+def get_pds_count(env_def: EnvDefinition) -> int:
+    return sum(1 for source in env_def.sources for child in source.get('children', [])
+               if child.get('type') == 'DATASET')
+
+
+def get_object_count(env_def: EnvDefinition) -> int:
+    return len(env_def.sources) + len(env_def.spaces) + len(env_def.folders) + len(env_def.vds_list) + \
+        get_pds_count(env_def)
+
+
+# Target of push_snapshot: the same sources, PDSs, users and roles but no spaces, folders or VDSs.
+def get_push_target_env(env_def: EnvDefinition) -> EnvDefinition:
+    target_env_def = EnvDefinition()
+    target_env_def.containers = [container for container in env_def.containers
+                                 if container.get('containerType') == 'SOURCE']
+    target_env_def.sources = env_def.sources
+    target_env_def.referenced_users = env_def.referenced_users
+    target_env_def.referenced_roles = env_def.referenced_roles
+    return target_env_def
+
+
+# Copy of the environment with every 10th VDS changed and every 20th VDS removed, the comparand of diff_snapshot.
+def get_changed_env(env_def: EnvDefinition) -> EnvDefinition:
+    changed_env_def = EnvDefinition()
+    changed_env_def.__dict__.update(env_def.__dict__)
+    changed_env_def.vds_list = []
+    for i, vds in enumerate(env_def.vds_list):
+        if i % 20 == 0:
+            continue
+        if i % 10 == 0:
+            vds = dict(vds)
+            vds['sql'] = vds['sql'] + ' WHERE 1=1'
+        changed_env_def.vds_list.append(vds)
+    return changed_env_def
+
+
+def save_env_file(env_def: EnvDefinition, filepath: str) -> None:
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        context = Context(Context.CMD_CREATE_SNAPSHOT)
+        context.init_logger(log_level='ERROR', log_verbose=False)
+        context.set_target(output_mode=Context.PATH_MODE_FILE, output_path=filepath)
+        EnvFileWriter.save_dremio_environment(context, env_def)
+
+
+# Writes generated inputs of all benchmarks into size_dir. Returns numbers of objects each benchmark processes.
+def prepare_size_dir(env_def: EnvDefinition, size_dir: str) -> dict:
+    os.makedirs(os.path.join(size_dir, 'logs'), exist_ok=True)
+    save_env_file(env_def, os.path.join(size_dir, GENERATED_FILENAME))
+    save_env_file(get_changed_env(env_def), os.path.join(size_dir, CHANGED_FILENAME))
+    pds_paths = [child['path'] for source in env_def.sources for child in source.get('children', [])
+                 if child.get('type') == 'DATASET']
+    num_statements = max(10, get_object_count(env_def) // 100)
+    with open(os.path.join(size_dir, SQL_FILENAME), 'w', encoding='utf-8') as f:
+        for i in range(num_statements):
+            if i % 2 == 0 or not pds_paths:
+                f.write('SELECT * FROM sys.version;\n')
+            else:
+                f.write('SELECT COUNT(*) FROM "' + '"."'.join(pds_paths[i % len(pds_paths)]) + '";\n')
+    num_objects = get_object_count(env_def)
+    return {'create_snapshot': num_objects,
+            'push_snapshot': len(env_def.spaces) + len(env_def.folders) + len(env_def.vds_list),
+            'diff_snapshot': num_objects, 'explode_snapshot': num_objects, 'implode_snapshot': num_objects,
+            'exec_sql': num_statements, 'rebuild_metadata': len(pds_paths)}
+
+
+# Runs a single benchmark in this process and writes its result next to the logs.
+def run_benchmark(benchmark: str, endpoint: str, size_dir: str, concurrency: int) -> None:
+    generated_filepath = os.path.join(size_dir, GENERATED_FILENAME)
+    snapshot_filepath = os.path.join(size_dir, SNAPSHOT_FILENAME)
+    input_filepath = snapshot_filepath if os.path.isfile(snapshot_filepath) else generated_filepath
+    exploded_dir = os.path.join(size_dir, EXPLODED_DIRNAME)
+    context = Context(Context.CMD_NOT_SPECIFIED)
+    if benchmark == 'implode_snapshot' and not os.path.isdir(exploded_dir):
+        explode_context = Context(Context.CMD_EXPLODE_SNAPSHOT)
+        explode_context.init_logger(log_level='ERROR', log_verbose=False)
+        explode_context.set_source(input_mode=Context.PATH_MODE_FILE, input_path=input_filepath)
+        explode_context.set_target(output_mode=Context.PATH_MODE_DIR, output_path=exploded_dir)
+        explode_snapshot(explode_context)
+    context.init_logger(log_level='ERROR', log_verbose=False)
+    context.set_report(report_filepath=os.path.join(size_dir, 'logs', benchmark + '_report.csv'))
+    if benchmark in ['create_snapshot', 'exec_sql', 'rebuild_metadata', 'push_snapshot']:
+        env_api = EnvApi(endpoint, USER, PASSWORD, context, dry_run=False)
+        if benchmark == 'create_snapshot':
+            context.set_source(env_api=env_api)
+            context.set_target(output_mode=Context.PATH_MODE_FILE, output_path=snapshot_filepath)
+        elif benchmark == 'push_snapshot':
+            context.set_source(input_mode=Context.PATH_MODE_FILE, input_path=generated_filepath)
+            context.set_target(env_api=env_api)
+        else:
+            context.set_target(env_api=env_api)
+    elif benchmark == 'diff_snapshot':
+        context.set_source(input_mode=Context.PATH_MODE_FILE, input_path=generated_filepath)
+        context.set_target(output_mode=Context.PATH_MODE_FILE, output_path=os.path.join(size_dir, CHANGED_FILENAME))
+    elif benchmark == 'explode_snapshot':
+        context.set_source(input_mode=Context.PATH_MODE_FILE, input_path=input_filepath)
+        context.set_target(output_mode=Context.PATH_MODE_DIR, output_path=exploded_dir)
+    elif benchmark == 'implode_snapshot':
+        context.set_source(input_mode=Context.PATH_MODE_DIR, input_path=exploded_dir)
+        context.set_target(output_mode=Context.PATH_MODE_FILE, output_path=os.path.join(size_dir, IMPLODED_FILENAME))
+
+    exit_code = 0
+    start_time = time.perf_counter()
+    try:
+        if benchmark == 'create_snapshot':
+            create_snapshot(context, None, False, concurrency)
+        elif benchmark == 'push_snapshot':
+            push_snapshot(context, False, concurrency)
+        elif benchmark == 'diff_snapshot':
+            diff_snapshot(context)
+        elif benchmark == 'explode_snapshot':
+            explode_snapshot(context)
+        elif benchmark == 'implode_snapshot':
+            implode_snapshot(context)
+        elif benchmark == 'exec_sql':
+            exec_sql(context, os.path.join(size_dir, SQL_FILENAME), False)
+        elif benchmark == 'rebuild_metadata':
+            rebuild_metadata(context, None, concurrency, False)
+    except SystemExit as e:
+        exit_code = e.code
+    seconds = time.perf_counter() - start_time
+    result = {'seconds': seconds, 'peak_rss_mb': get_peak_rss_mb(), 'exit_code': exit_code,
+              'errors': context.get_logger().get_error_count()}
+    with open(os.path.join(size_dir, 'logs', benchmark + '_result.json'), 'w', encoding='utf-8') as f:
+        json.dump(result, f)
+
+
+# Peak resident set size of this process in MB, None where the resource module is not available
+def get_peak_rss_mb():
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return max_rss / (1024 * 1024) if sys.platform == 'darwin' else max_rss / 1024
+
+
+# Runs the benchmark in a child process. Its output goes to a log file in the work directory.
+def run_benchmark_process(benchmark: str, server: MockDremioServer, size_dir: str, concurrency: int,
+                          num_objects: int) -> dict:
+    request_count = server.get_request_count()
+    log_filepath = os.path.join(size_dir, 'logs', benchmark + '.log')
+    result_filepath = os.path.join(size_dir, 'logs', benchmark + '_result.json')
+    if os.path.isfile(result_filepath):
+        os.remove(result_filepath)
+    with open(log_filepath, 'w', encoding='utf-8') as log_file:
+        completed = subprocess.run([sys.executable, '-m', 'dremio_toolkit.benchmarks.bench_suite',
+                                    '--run-benchmark', benchmark, '--endpoint', server.get_endpoint(),
+                                    '--size-dir', size_dir, '--concurrency', str(concurrency)],
+                                   stdout=log_file, stderr=subprocess.STDOUT)
+    if completed.returncode != 0 or not os.path.isfile(result_filepath):
+        raise RuntimeError('Benchmark ' + benchmark + ' failed. See ' + log_filepath)
+    with open(result_filepath, 'r', encoding='utf-8') as f:
+        result = json.load(f)
+    result['benchmark'] = benchmark
+    result['objects'] = num_objects
+    result['requests'] = server.get_request_count() - request_count
+    result['objects_per_second'] = num_objects / result['seconds'] if result['seconds'] > 0 else None
+    return result
+
+
+def run_benchmark_suite(sizes: list, benchmarks: list, work_dir: str, concurrency: int = 8,
+                        latency: float = 0.0) -> dict:
+    results = []
+    for size in sizes:
+        size_dir = os.path.abspath(os.path.join(work_dir, str(size)))
+        env_def = generate_benchmark_env(size)
+        if os.path.isfile(os.path.join(size_dir, SNAPSHOT_FILENAME)):
+            os.remove(os.path.join(size_dir, SNAPSHOT_FILENAME))
+        num_objects = prepare_size_dir(env_def, size_dir)
+        with MockDremioServer(env_def, latency=latency) as server, \
+                MockDremioServer(get_push_target_env(env_def), latency=latency) as push_server:
+            for benchmark in [benchmark for benchmark in BENCHMARKS if benchmark in benchmarks]:
+                result = run_benchmark_process(benchmark, push_server if benchmark == 'push_snapshot' else server,
+                                               size_dir, concurrency, num_objects[benchmark])
+                result['size'] = size
+                results.append(result)
+                print_result(result)
+    return {'format': RESULTS_FORMAT, 'version': Context.APP_VERSION, 'timestamp_utc': str(datetime.utcnow()),
+            'python': platform.python_version(), 'platform': platform.platform(), 'concurrency': concurrency,
+            'latency': latency, 'results': results}
+
+
+# Returns descriptions of benchmarks whose wall time, request count or peak RSS grew over the baseline by more than
+# the tolerance. Benchmarks missing in either results are ignored. Request counts are deterministic for a given size,
+# so any growth there points at a change in the toolkit rather than in the machine.
+def compare_results(results: dict, baseline: dict, tolerance: float) -> list:
+    baseline_results = {(result['benchmark'], result['size']): result for result in baseline['results']}
+    regressions = []
+    for result in results['results']:
+        baseline_result = baseline_results.get((result['benchmark'], result['size']))
+        if baseline_result is None:
+            continue
+        for metric in ['seconds', 'requests', 'peak_rss_mb']:
+            value = result.get(metric)
+            baseline_value = baseline_result.get(metric)
+            if value is None or not baseline_value:
+                continue
+            if metric == 'seconds' and value - baseline_value < MIN_SECONDS_REGRESSION:
+                continue
+            if value > baseline_value * (1 + tolerance):
+                regressions.append(result['benchmark'] + ' size ' + str(result['size']) + ': ' + metric + ' ' +
+                                   ('%.3f' % value) + ' vs baseline ' + ('%.3f' % baseline_value))
+    return regressions
+
+
+def print_result(result: dict) -> None:
+    print(result['benchmark'].ljust(18) + str(result['size']).rjust(8) + str(result['objects']).rjust(9) +
+          ('%.3f' % result['seconds']).rjust(10) + str(result['requests']).rjust(10) +
+          ('-' if result['peak_rss_mb'] is None else '%.1f' % result['peak_rss_mb']).rjust(10) +
+          ('%.1f' % (result['objects_per_second'] or 0)).rjust(12) + str(result['errors']).rjust(8))
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.run_benchmark:
+        run_benchmark(args.run_benchmark, args.endpoint, args.size_dir, args.concurrency)
+        sys.exit(0)
+    print('Benchmark'.ljust(18) + 'Size'.rjust(8) + 'Objects'.rjust(9) + 'Seconds'.rjust(10) + 'Requests'.rjust(10) +
+          'RSS MB'.rjust(10) + 'Objects/s'.rjust(12) + 'Errors'.rjust(8))
+    suite_results = run_benchmark_suite(args.sizes, args.benchmarks, args.work_dir, args.concurrency, args.latency)
+    with open(args.output_filename, 'w', encoding='utf-8') as f:
+        json.dump(suite_results, f, indent=4)
+    print('Results saved to ' + args.output_filename)
+    if args.baseline_filename:
+        with open(args.baseline_filename, 'r', encoding='utf-8') as f:
+            baseline_results = json.load(f)
+        regressions = compare_results(suite_results, baseline_results, args.tolerance)
+        for regression in regressions:
+            print('Regression: ' + regression)
+        if regressions:
+            sys.exit(1)
@@ -0,0 +1,104 @@
+#########################################################################
+# Copyright (C) 2023 UCE Systems Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Contact dremio@ucesys.com
+#########################################################################
+
+import threading
+import time
+
+
+###
+# Thresholds for circuit breakers. A breaker opens after failure_threshold consecutive failures, rejects requests
+# for cool_down seconds and then lets up to max_probes requests through to decide whether to close again.
+###
+class CircuitBreakerPolicy:
+    def __init__(self, failure_threshold: int = 2, cool_down: float = 60.0, max_probes: int = 1):
+        self.failure_threshold = failure_threshold
+        self.cool_down = cool_down
+        self.max_probes = max_probes
+
+
+###
+# Circuit breaker for requests to a single Dremio source. States: closed (requests allowed), open (requests rejected)
+# and half-open (a limited number of probe requests allowed). Transitions are logged and counted.
+###
+class CircuitBreaker:
+    STATE_CLOSED = 'closed'
+    STATE_OPEN = 'open'
+    STATE_HALF_OPEN = 'half-open'
+
+    def __init__(self, name: str, policy: CircuitBreakerPolicy, logger):
+        self._name = name
+        self._policy = policy
+        self._logger = logger
+        self._lock = threading.Lock()
+        self._state = self.STATE_CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._probes = 0
+        self._transition_counts = {}
+        self._rejected_count = 0
+
+    def get_name(self) -> str:
+        return self._name
+
+    def get_state(self) -> str:
+        with self._lock:
+            return self._state
+
+    # Returns True if a request may be sent
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self._state == self.STATE_OPEN and time.monotonic() - self._opened_at >= self._policy.cool_down:
+                self._transition(self.STATE_HALF_OPEN)
+            if self._state == self.STATE_CLOSED:
+                return True
+            if self._state == self.STATE_HALF_OPEN and self._probes < self._policy.max_probes:
+                self._probes += 1
+                return True
+            self._rejected_count += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            if self._state == self.STATE_HALF_OPEN:
+                self._transition(self.STATE_CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.STATE_HALF_OPEN or \
+                    (self._state == self.STATE_CLOSED and self._failures >= self._policy.failure_threshold):
+                self._transition(self.STATE_OPEN)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {'name': self._name, 'state': self._state, 'rejected': self._rejected_count,
+                    'transitions': dict(self._transition_counts)}
+
+    def _transition(self, state: str) -> None:
+        transition = self._state + ' -> ' + state
+        self._transition_counts[transition] = self._transition_counts.get(transition, 0) + 1
+        self._state = state
+        self._probes = 0
+        if state == self.STATE_OPEN:
+            self._opened_at = time.monotonic()
+            self._logger.warn("Circuit breaker for source " + self._name + " is open after " + str(self._failures) +
+                              " consecutive timeouts or connection errors. Requests for the source are skipped for " +
+                              str(self._policy.cool_down) + " seconds.")
+        else:
+            self._logger.info("Circuit breaker for source " + self._name + " is " + state + ".")
@@ -39,6 +39,8 @@ class Context:
     PATH_MODE_FILE = 'FILE'
     PATH_MODE_DIR = 'DIR'
 
+    DEFAULT_IO_WORKERS = 8
+
     def __init__(self, command: str = None):
         if command is None:
             self._command = Context.CMD_NOT_SPECIFIED
@@ -53,11 +55,15 @@ class Context:
 
         self._input_mode = None
         self._input_path = None
+        self._lazy_load = False
         self._output_mode = None
         self._output_path = None
+        self._compact_json = False
+        self._io_workers = Context.DEFAULT_IO_WORKERS
 
         self._report_filepath = None
         self._report_delimiter = None
+        self._metrics_filepath = None
 
         return
 
@@ -99,10 +105,12 @@ class Context:
     def get_target_env_version(self):
         return self._env_api_target.get_dremio_version()
 
-    def set_source(self, env_api: EnvApi = None, input_mode: str = None, input_path: str = None):
+    def set_source(self, env_api: EnvApi = None, input_mode: str = None, input_path: str = None,
+                   lazy_load: bool = False):
         self._env_api_source = env_api
         self._input_mode = input_mode
         self._input_path = input_path
+        self._lazy_load = lazy_load
 
     def get_input_mode(self):
         return self._input_mode
@@ -110,10 +118,15 @@ class Context:
     def get_input_path(self):
         return self._input_path
 
-    def set_target(self, env_api: EnvApi = None, output_mode: str = None, output_path: str = None):
+    def get_lazy_load(self):
+        return self._lazy_load
+
+    def set_target(self, env_api: EnvApi = None, output_mode: str = None, output_path: str = None,
+                   compact_json: bool = False):
         self._env_api_target = env_api
         self._output_mode = output_mode
         self._output_path = output_path
+        self._compact_json = compact_json
 
     def get_output_mode(self):
         return self._output_mode
@@ -121,9 +134,19 @@ class Context:
     def get_output_path(self):
         return self._output_path
 
-    def set_report(self, report_filepath: str = None, report_delimiter: str = None):
+    def get_compact_json(self):
+        return self._compact_json
+
+    def set_io_workers(self, io_workers: int):
+        self._io_workers = io_workers
+
+    def get_io_workers(self):
+        return self._io_workers
+
+    def set_report(self, report_filepath: str = None, report_delimiter: str = None, metrics_filepath: str = None):
         self._report_filepath = report_filepath
         self._report_delimiter = report_delimiter
+        self._metrics_filepath = metrics_filepath
 
     def get_report_filepath(self):
         if self._report_filepath is None:
@@ -132,3 +155,6 @@ class Context:
 
     def get_report_delimiter(self):
         return self._report_delimiter
+
+    def get_metrics_filepath(self):
+        return self._metrics_filepath
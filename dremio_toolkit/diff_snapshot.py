@@ -36,6 +36,11 @@ def parse_args():
                             required=False, choices=['FILE', 'DIR'], default='FILE')
     arg_parser.add_argument("-b", "--base-path", help="Json file name or a directory name with snapshot of a 'base' Dremio environment.", required=True)
     arg_parser.add_argument("-c", "--comp-path", help="Json file name or a directory name with snapshot of a 'comp' Dremio environment.", required=True)
+    arg_parser.add_argument("-z", "--lazy-load", help="Read the snapshot file section by section instead of loading it "
+                                                      "into memory at once. Lowers peak memory by the size of the sections not "
+                                                      "being compared. Each compared section is still loaded at once. "
+                                                      "Only applies to FILE input mode.",
+                            required=False, default=False, action='store_true')
     arg_parser.add_argument("-r", "--report-filename", help="Json file name for the 'diff' report.", required=True)
     arg_parser.add_argument("-l", "--log-level", help="Set Log Level to DEBUG, INFO, WARN, ERROR.",
                             choices=['ERROR', 'WARN', 'INFO', 'DEBUG'], default='WARN')
@@ -50,15 +55,15 @@ def parse_args():
 def diff_snapshot(ctx: Context):
     # Process command
     file_reader = EnvFileReader()
-    base_env_def = file_reader.read_dremio_source_environment(context)
-    comp_env_def = file_reader.read_dremio_target_environment(context)
+    base_env_def = file_reader.read_dremio_source_environment(ctx)
+    comp_env_def = file_reader.read_dremio_target_environment(ctx)
     env_diff = EnvDiff(ctx)
     env_diff.diff_snapshot(base_env_def, comp_env_def)
     env_diff.write_diff_report()
 
     # Return process status to the OS
-    context.get_logger().finish_process_status_reporting()
-    if context.get_logger().get_error_count() > 0:
+    ctx.get_logger().finish_process_status_reporting()
+    if ctx.get_logger().get_error_count() > 0:
         exit(Context.NON_FATAL_EXIT_CODE)
 
 if __name__ == '__main__':
@@ -68,7 +73,7 @@ if __name__ == '__main__':
 
     context = Context(Context.CMD_DIFF_SNAPSHOT)
     context.init_logger(log_level=args.log_level, log_verbose=args.verbose, log_filepath=args.log_filename)
-    context.set_source(input_mode=args.file_mode, input_path=args.base_path)
+    context.set_source(input_mode=args.file_mode, input_path=args.base_path, lazy_load=args.lazy_load)
     context.set_target(output_mode=args.file_mode, output_path=args.comp_path)
     context.set_report(report_filepath=args.report_filename)
     diff_snapshot(context)
@@ -22,6 +22,89 @@ import sys
 import urllib
 import time
 import getpass
+import datetime
+import email.utils
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+from dremio_toolkit.rate_limiter import RequestBudget
+from dremio_toolkit.circuit_breaker import CircuitBreaker, CircuitBreakerPolicy
+from dremio_toolkit.api_metrics import ApiMetrics
+from dremio_toolkit.api_recorder import ApiRecorder, RecordingSession
+
+
+###
+# Schedule for polling job status: fast initial polls, then exponential backoff with jitter up to max_interval.
+# Timeout is measured in wall-clock seconds, None waits until the job completes.
+###
+class PollPolicy:
+    def __init__(self, initial_interval: float = 0.1, max_interval: float = 10.0, multiplier: float = 2.0,
+                 jitter: float = 0.2, timeout: float = None):
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.timeout = timeout
+
+    # Returns seconds to wait after poll_number polls have been made
+    def get_interval(self, poll_number: int) -> float:
+        interval = self.initial_interval * self.multiplier ** min(poll_number, 64)
+        interval = min(self.max_interval, interval)
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+
+###
+# Retry schedule for transient failures of HTTP requests: exponential backoff with jitter, capped by max_backoff.
+# Retry-After header of a response overrides the backoff, capped by max_retry_after.
+# Idempotent requests are retried on retryable status codes, connection errors and timeouts. Other requests are only
+# retried when the connection could not be established or on responses showing that the request has not been
+# processed. This is the only retry layer, the HTTP transport does not retry.
+###
+class RetryPolicy:
+    RETRYABLE_STATUS_CODES = [429, 500, 502, 503, 504]
+    NOT_PROCESSED_STATUS_CODES = [429]
+
+    def __init__(self, max_attempts: int = 4, initial_backoff: float = 0.5, max_backoff: float = 30.0,
+                 multiplier: float = 2.0, jitter: float = 0.5, max_retry_after: float = 120.0,
+                 max_timeout_attempts: int = 2):
+        self.max_attempts = max_attempts
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.max_retry_after = max_retry_after
+        # Timed out requests are retried fewer times since each attempt takes the full API timeout
+        self.max_timeout_attempts = max_timeout_attempts
+
+    def is_retryable_status(self, status_code: int, idempotent: bool) -> bool:
+        if idempotent:
+            return status_code in self.RETRYABLE_STATUS_CODES
+        return status_code in self.NOT_PROCESSED_STATUS_CODES
+
+    # Returns seconds to wait before the next attempt after attempt number of failed attempts
+    def get_backoff(self, attempt: int, retry_after: str = None) -> float:
+        if retry_after is not None:
+            retry_after_seconds = self._parse_retry_after(retry_after)
+            if retry_after_seconds is not None:
+                return min(self.max_retry_after, retry_after_seconds)
+        backoff = min(self.max_backoff, self.initial_backoff * self.multiplier ** min(attempt - 1, 64))
+        return backoff * random.uniform(1 - self.jitter, 1)
+
+    # Retry-After is either a number of seconds or an HTTP date
+    @staticmethod
+    def _parse_retry_after(retry_after: str):
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+        try:
+            retry_time = email.utils.parsedate_to_datetime(retry_after)
+            return max(0.0, (retry_time - datetime.datetime.now(retry_time.tzinfo)).total_seconds())
+        except (TypeError, ValueError):
+            return None
 
 
 ###
@@ -56,18 +139,58 @@ class EnvApi:
     _username = ""  # Need to keep for expired token processing
     _password = ""
     _token = ""
+    _personal_access_token = None
+    # Token lifecycle: time the token was obtained and the age at which it is refreshed ahead of expiry
+    _token_issued_at = None
+    _token_refresh_age = None
+    _token_lock = threading.Lock()
+    _admin_verified = False
+    _version = None
     # Configuration
     _verify_ssl = None
     DEFAULT_API_TIMEOUT = 120  # Accommodate for Dremio processing time
+    DEFAULT_POOL_SIZE = 32  # Max number of keep-alive connections kept open to the Dremio host
+    DEFAULT_POLL_POLICY = PollPolicy()
+    DEFAULT_RETRY_POLICY = RetryPolicy()
+    DEFAULT_CIRCUIT_BREAKER_POLICY = CircuitBreakerPolicy()
+    DEFAULT_TOKEN_REFRESH_AGE = 20 * 3600  # Dremio login tokens expire after 30 hours by default
+    MAX_JOB_RESULT_PAGE_SIZE = 500  # Max number of rows Dremio returns per job results request
+    DEFAULT_JOB_RESULT_PREFETCH_PAGES = 4
+    MAX_METRICS_SUMMARY_LINES = 10  # Endpoint classes with the most time spent listed in the run summary
+    IDEMPOTENT_METHODS = ['GET', 'HEAD', 'PUT', 'DELETE']
+    # Request budgets, each with its own rate and in-flight limits
+    BUDGET_CATALOG_READ = 'catalog_read'
+    BUDGET_CATALOG_WRITE = 'catalog_write'
+    BUDGET_SQL = 'sql'
     _api_timeout: int = DEFAULT_API_TIMEOUT
     _dry_run = None
+    # HTTP session with a connection pool shared by all requests
+    _session = None
+    _request_count = 0
+    # Per-thread state, e.g. HTTP status code of the last response
+    _thread_state = threading.local()
+    _request_budgets = {}
+    # Latency and throughput by endpoint class
+    _api_metrics = None
+    # Recorder of requests and responses, if recording
+    _recorder = None
+    # AsyncEnvApi and JobWatcher created on demand
+    _async_api = None
+    _job_watcher = None
+    # Circuit breakers by path root and path roots of catalog IDs learned from catalog responses
+    _circuit_breaker_policy = DEFAULT_CIRCUIT_BREAKER_POLICY
+    _circuit_breakers = {}
+    _source_roots = {}
     # Misc
-    _timed_out_sources = []
     _headers = ""
     _logger = None
 
     def __init__(self, endpoint, username, password, context,
-                 api_timeout=DEFAULT_API_TIMEOUT, verify_ssl=True, dry_run=True, request_password=True):
+                 api_timeout=DEFAULT_API_TIMEOUT, verify_ssl=True, dry_run=True, request_password=True,
+                 pool_size=DEFAULT_POOL_SIZE, retry_policy: RetryPolicy = None,
+                 request_budgets: dict = None, circuit_breaker_policy: CircuitBreakerPolicy = None,
+                 personal_access_token: str = None, token_refresh_age: float = DEFAULT_TOKEN_REFRESH_AGE,
+                 record_filepath: str = None):
         self._context = context
         self._logger = context.get_logger()
         self._endpoint = endpoint
@@ -75,16 +198,307 @@ class EnvApi:
         if self._endpoint[-1:] != '/':
             self._endpoint += '/'
         self._username = username
-        if password is None or password == '':
+        # A personal access token is used as is, without login
+        self._personal_access_token = personal_access_token
+        if personal_access_token is None and (password is None or password == ''):
             password = getpass.getpass()
         self._password = password
+        self._token_refresh_age = token_refresh_age
         self._verify_ssl = verify_ssl
         self._api_timeout = api_timeout
         self._dry_run = dry_run
+        self._retry_policy = self.DEFAULT_RETRY_POLICY if retry_policy is None else retry_policy
+        if circuit_breaker_policy is not None:
+            self._circuit_breaker_policy = circuit_breaker_policy
         if not verify_ssl:
             self._logger.warn("Unverified SSL certificates will be accepted as per configuration.")
             requests.packages.urllib3.disable_warnings(requests.packages.urllib3.exceptions.InsecureRequestWarning)
-        self._authenticate()
+        self._init_session(pool_size)
+        if record_filepath is not None:
+            # Requests and responses are recorded for replay with ReplayEnvApi
+            self._recorder = ApiRecorder(record_filepath, self._endpoint, username)
+            self._session = RecordingSession(self._session, self._recorder)
+        self._init_request_budgets(request_budgets)
+        if personal_access_token is None:
+            self._authenticate()
+        else:
+            self._set_token('Bearer ' + personal_access_token)
+
+    # Create HTTP session with a thread-safe keep-alive connection pool.
+    # Connection setup (TCP + TLS handshake) is paid once per pooled connection instead of once per request.
+    def _init_session(self, pool_size: int) -> None:
+        self._stats_lock = threading.Lock()
+        self._token_lock = threading.Lock()
+        self._request_count = 0
+        self._job_poll_counts = {}
+        self._retry_counts = {}
+        self._api_metrics = ApiMetrics()
+        self._circuit_breakers = {}
+        self._source_roots = {}
+        self._thread_state = threading.local()
+        # Retries are made by _send as per RetryPolicy only
+        adapter = HTTPAdapter(pool_maxsize=pool_size, max_retries=0)
+        self._session = requests.Session()
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        self._async_api = None
+        self._job_watcher = None
+
+    # Budgets not specified are unlimited, but still slow down when Dremio responds with 429 or 503
+    def _init_request_budgets(self, request_budgets: dict = None) -> None:
+        self._request_budgets = {} if request_budgets is None else dict(request_budgets)
+        for name in [self.BUDGET_CATALOG_READ, self.BUDGET_CATALOG_WRITE, self.BUDGET_SQL]:
+            if name not in self._request_budgets:
+                self._request_budgets[name] = RequestBudget(name)
+
+    # Returns request budgets for command line limits. Rates are in requests per second, None for unlimited.
+    @staticmethod
+    def get_request_budgets(max_request_rate: float = None, max_sql_rate: float = None,
+                            max_in_flight: int = None) -> dict:
+        return {EnvApi.BUDGET_CATALOG_READ: RequestBudget(EnvApi.BUDGET_CATALOG_READ, max_request_rate, max_in_flight),
+                EnvApi.BUDGET_CATALOG_WRITE: RequestBudget(EnvApi.BUDGET_CATALOG_WRITE, max_request_rate,
+                                                           max_in_flight),
+                EnvApi.BUDGET_SQL: RequestBudget(EnvApi.BUDGET_SQL, max_sql_rate, max_in_flight)}
+
+    # Returns connection pool size for the number of concurrent workers, so that no worker waits for
+    # or opens a connection that is not kept alive.
+    @staticmethod
+    def get_pool_size(concurrency: int = 1) -> int:
+        return max(EnvApi.DEFAULT_POOL_SIZE, concurrency)
+
+    # Classify request: SQL submission, catalog (and job status) reads, or writes. Login is not limited.
+    def _get_request_budget(self, method: str, url: str):
+        if self._login in url:
+            return None
+        if method == 'POST' and url.endswith(self._sql):
+            name = self.BUDGET_SQL
+        elif method in ['GET', 'HEAD']:
+            name = self.BUDGET_CATALOG_READ
+        else:
+            name = self.BUDGET_CATALOG_WRITE
+        return self._request_budgets.get(name)
+
+    # Close all pooled connections
+    def close(self) -> None:
+        if self._job_watcher is not None:
+            self._job_watcher.close()
+        if self._async_api is not None:
+            self._async_api.close()
+        if self._session is not None:
+            self._session.close()
+
+    # Returns AsyncEnvApi sharing authentication, retry policy, request budgets, circuit breakers and metrics with
+    # this EnvApi. Requires aiohttp.
+    def get_async_api(self, max_in_flight: int = None):
+        with self._stats_lock:
+            if self._async_api is None:
+                from dremio_toolkit.async_env_api import AsyncEnvApi
+                self._async_api = AsyncEnvApi(self, max_in_flight)
+            return self._async_api
+
+    # Executes calls concurrently on the event loop of AsyncEnvApi and waits for all of them to complete.
+    # Calls are (method name, args) tuples, e.g. ('get_catalog', (catalog_id,)). Returns results in order of calls.
+    def gather(self, calls: list) -> list:
+        async_api = self.get_async_api()
+        return async_api.run(async_api.gather(*[getattr(async_api, name)(*args) for name, args in calls]))
+
+    # Returns JobWatcher polling status of jobs submitted with this EnvApi from a single thread
+    def get_job_watcher(self):
+        with self._stats_lock:
+            if self._job_watcher is None:
+                from dremio_toolkit.job_watcher import JobWatcher
+                self._job_watcher = JobWatcher(self)
+            return self._job_watcher
+
+    # Returns statistics for the HTTP connection pools
+    def get_connection_pool_stats(self) -> dict:
+        pools = []
+        if self._session is not None:
+            for adapter in set(self._session.adapters.values()):
+                pool_manager = adapter.poolmanager
+                for key in pool_manager.pools.keys():
+                    pool = pool_manager.pools.get(key)
+                    if pool is None:
+                        continue
+                    pools.append({'host': pool.host, 'port': pool.port, 'scheme': pool.scheme,
+                                  'max_size': pool.pool.maxsize if pool.pool is not None else 0,
+                                  'idle_connections': 0 if pool.pool is None else
+                                  len([conn for conn in list(pool.pool.queue) if conn is not None]),
+                                  'opened_connections': pool.num_connections,
+                                  'requests': pool.num_requests})
+        return {'requests': self._request_count, 'pools': pools}
+
+    # Log connection pool and job polling statistics
+    def _log_connection_pool_stats(self) -> None:
+        stats = self.get_connection_pool_stats()
+        for pool in stats['pools']:
+            self._logger.info("Connection pool " + pool['scheme'] + "://" + pool['host'] + ":" + str(pool['port']) +
+                              " opened " + str(pool['opened_connections']) + " connections for " +
+                              str(pool['requests']) + " requests.")
+        self._logger.info("Total HTTP requests: " + str(stats['requests']))
+        self._logger.info("Polled status of " + str(len(self._job_poll_counts)) + " jobs " +
+                          str(sum(self._job_poll_counts.values())) + " times.")
+
+    # Log connection pool statistics and add retries, request budgets, API metrics and circuit breakers
+    # to the run summary, e.g. at the end of a run
+    def log_run_stats(self) -> None:
+        self._log_connection_pool_stats()
+        retry_counts = self.get_retry_counts()
+        if retry_counts:
+            self._logger.add_summary("Retried " + str(sum(retry_counts.values())) + " HTTP requests after transient "
+                                     "failures: " + ", ".join(reason + ": " + str(count) for reason, count in
+                                                               sorted(retry_counts.items())) + ".")
+        for budget in self._request_budgets.values():
+            budget_stats = budget.get_stats()
+            if budget_stats['slow_downs'] > 0 or budget_stats['wait_time'] > 0:
+                self._logger.add_summary("Request budget " + budget_stats['name'] + " slowed down " +
+                                         str(budget_stats['slow_downs']) + " times, requests waited " +
+                                         str(round(budget_stats['wait_time'], 1)) + " seconds in total.")
+        if self._api_metrics is not None:
+            for line in self._api_metrics.get_summary(self.MAX_METRICS_SUMMARY_LINES):
+                self._logger.add_summary(line)
+        for circuit_breaker_stats in self.get_circuit_breaker_stats():
+            if circuit_breaker_stats['transitions']:
+                self._logger.add_summary("Circuit breaker for source " + circuit_breaker_stats['name'] + ": " +
+                                         ", ".join(transition + ": " + str(count) for transition, count in
+                                                   sorted(circuit_breaker_stats['transitions'].items())) +
+                                         ", skipped " + str(circuit_breaker_stats['rejected']) + " requests.")
+
+    # Returns HTTP status code of the last response received by the calling thread or None if there was no response
+    def get_last_status_code(self):
+        return getattr(self._thread_state, 'status_code', None)
+
+    # Returns True if the connection could not be established, so the request has not reached Dremio
+    @staticmethod
+    def _is_connect_error(error: requests.exceptions.ConnectionError) -> bool:
+        reason = getattr(error.args[0], 'reason', None) if error.args else None
+        return isinstance(reason, NewConnectionError)
+
+    def _count_request(self) -> None:
+        with self._stats_lock:
+            self._request_count += 1
+
+    # Sends HTTP request via the pooled session. Transient failures are retried as per retry policy.
+    # Requests are idempotent by method unless specified, e.g. for POST requests that are safe to repeat.
+    def _send(self, method: str, url: str, idempotent: bool = None, **kwargs) -> requests.Response:
+        if idempotent is None:
+            idempotent = method in self.IDEMPOTENT_METHODS
+        budget = self._get_request_budget(method, url)
+        endpoint_class = ApiMetrics.get_endpoint_class(method, url)
+        attempt = 0
+        while True:
+            attempt += 1
+            if 'Authorization' in kwargs.get('headers', {}):
+                if self._is_token_refresh_due():
+                    self._refresh_token(self._token)
+                # Use the current token, it might have been refreshed by another thread
+                kwargs['headers'] = self._headers
+                self._thread_state.token = self._token
+            self._count_request()
+            self._thread_state.status_code = None
+            if budget is not None:
+                budget.acquire()
+            response, error, retry = None, None, None
+            request_start = time.monotonic()
+            try:
+                response = self._session.request(method, url, timeout=self._api_timeout, verify=self._verify_ssl,
+                                                 **kwargs)
+                self._thread_state.status_code = response.status_code
+                retry = self._get_retry(attempt, idempotent, response=response)
+            except requests.exceptions.RequestException as e:
+                error = e
+                retry = self._get_retry(attempt, idempotent, error=e)
+                if retry is None:
+                    raise
+            finally:
+                self._finish_attempt(budget, endpoint_class, time.monotonic() - request_start, response, error)
+            if retry is None:
+                return response
+            if response is not None:
+                response.close()
+            time.sleep(self._get_retry_backoff(method, url, attempt, retry, endpoint_class))
+
+    # Returns (reason, Retry-After) if a failed attempt is to be retried as per retry policy or None otherwise.
+    # Either the response or the exception raised by the attempt is given.
+    def _get_retry(self, attempt: int, idempotent: bool, response: requests.Response = None,
+                   error: requests.exceptions.RequestException = None):
+        retry_policy = self._retry_policy
+        if isinstance(error, requests.exceptions.Timeout):
+            if idempotent and attempt < min(retry_policy.max_attempts, retry_policy.max_timeout_attempts):
+                return type(error).__name__, None
+            return None
+        if isinstance(error, requests.exceptions.ConnectionError):
+            if (idempotent or self._is_connect_error(error)) and attempt < retry_policy.max_attempts:
+                return type(error).__name__, None
+            return None
+        if error is not None or attempt >= retry_policy.max_attempts or \
+                not retry_policy.is_retryable_status(response.status_code, idempotent):
+            return None
+        return str(response.status_code), response.headers.get('Retry-After')
+
+    # Releases the request budget and records metrics of a request attempt
+    def _finish_attempt(self, budget: RequestBudget, endpoint_class: str, latency: float,
+                        response: requests.Response = None, error: Exception = None) -> None:
+        if budget is not None:
+            budget.release(None if response is None else response.status_code)
+        self._record_request_metrics(endpoint_class, latency, response, None if error is None else type(error).__name__)
+
+    # Records a retry and returns seconds to wait before the next attempt
+    def _get_retry_backoff(self, method: str, url: str, attempt: int, retry: tuple, endpoint_class: str) -> float:
+        reason, retry_after = retry
+        backoff = self._retry_policy.get_backoff(attempt, retry_after)
+        self._logger.debug("Retrying " + method + " <" + url + "> in " + str(round(backoff, 1)) +
+                           " seconds after " + reason + ". Attempt " + str(attempt) + ".")
+        self._record_retry(reason)
+        if self._api_metrics is not None:
+            self._api_metrics.record_retry(endpoint_class)
+        return backoff
+
+    def _record_request_metrics(self, endpoint_class: str, latency: float, response: requests.Response = None,
+                                error: str = None) -> None:
+        if self._api_metrics is None:
+            return
+        if response is None:
+            self._api_metrics.record_request(endpoint_class, latency, error=error or 'RequestException')
+            return
+        body = response.request.body if response.request is not None else None
+        self._api_metrics.record_request(endpoint_class, latency, response.status_code,
+                                         0 if body is None else len(body), len(response.content or b''))
+
+    # Returns metrics by endpoint class, see ApiMetrics
+    def get_api_metrics(self) -> ApiMetrics:
+        return self._api_metrics
+
+    # Writes API metrics as JSON, or as a Prometheus text file if the file name ends with .prom
+    def write_metrics_file(self, filepath: str) -> None:
+        self._api_metrics.write_metrics_file(filepath, self._context.get_command())
+
+    def _record_retry(self, reason: str) -> None:
+        with self._stats_lock:
+            self._retry_counts[reason] = self._retry_counts.get(reason, 0) + 1
+
+    # Returns number of retries by reason, i.e. HTTP status code or exception name
+    def get_retry_counts(self) -> dict:
+        with self._stats_lock:
+            return dict(self._retry_counts)
+
+    # Returns circuit breaker for the path root of a catalog URL or None if the root is not known
+    def _get_circuit_breaker(self, url):
+        source_name = self._get_source_name(url)
+        if source_name is None:
+            return None
+        with self._stats_lock:
+            circuit_breaker = self._circuit_breakers.get(source_name)
+            if circuit_breaker is None:
+                circuit_breaker = CircuitBreaker(source_name, self._circuit_breaker_policy, self._logger)
+                self._circuit_breakers[source_name] = circuit_breaker
+            return circuit_breaker
+
+    # Returns state, number of skipped requests and state transition counts of each circuit breaker
+    def get_circuit_breaker_stats(self) -> list:
+        with self._stats_lock:
+            circuit_breakers = list(self._circuit_breakers.values())
+        return [circuit_breaker.get_stats() for circuit_breaker in circuit_breakers]
 
     # Return Dremio environment end point
     def get_env_endpoint(self) -> str:
@@ -92,27 +506,56 @@ class EnvApi:
 
     # Generate an authentication token and save it
     # https://docs.dremio.com/software/rest-api/#authentication
+    # Logs in and verifies that the user is an admin. Admin role is only verified once, not on each token refresh.
     def _authenticate(self, admin=True) -> None:
         headers = {"Content-Type": "application/json"}
         payload = '{"userName": "' + self._username + '","password": "' + self._password + '"}'
         payload = payload.encode(encoding='utf-8')
-        response = requests.request("POST", self._endpoint + self._login, data=payload,
-                                    headers=headers, timeout=self._api_timeout, verify=self._verify_ssl)
+        response = self._send("POST", self._endpoint + self._login, idempotent=True, data=payload, headers=headers)
         if response.status_code != 200:
             self._logger.fatal("Authentication Error " + str(response.status_code) + ' Auth URL: ' + self._endpoint + self._login)
         self._version = response.json()['version']
-        self._token = '_dremio' + response.json()['token']
-        self._headers = {"Content-Type": "application/json", "Authorization": self._token}
+        self._set_token('_dremio' + response.json()['token'])
         # User must be an Admin for most of the dremio-toolkit operations
-        if admin:
+        if admin and not self._admin_verified:
             user = self.get_user_by_name(self._username)
             user = self.get_user(user['id'])
             for role in user['roles']:
                 if role['name'] == 'ADMIN':
+                    self._admin_verified = True
                     return
             self._logger.fatal("Dremio user is not in ADMIN role.")
 
+    def _set_token(self, token: str) -> None:
+        self._headers = {"Content-Type": "application/json", "Authorization": token}
+        self._token = token
+        self._token_issued_at = time.monotonic()
+
+    def _is_token_refresh_due(self) -> bool:
+        return self._personal_access_token is None and self._token_issued_at is not None and \
+            self._token_refresh_age is not None and time.monotonic() - self._token_issued_at >= self._token_refresh_age
+
+    # Replaces stale_token with a new one. Only one thread logs in, others wait and share the new token.
+    # Personal access tokens cannot be refreshed.
+    def _refresh_token(self, stale_token: str) -> None:
+        if self._personal_access_token is not None:
+            return
+        with self._token_lock:
+            if self._token == stale_token:
+                self._logger.debug("Refreshing Dremio token.")
+                self._authenticate()
+
+    # Refreshes the token used by the last request of the calling thread, e.g. after a 401 response
+    def _refresh_last_token(self) -> None:
+        self._refresh_token(getattr(self._thread_state, 'token', self._token))
+
+    # Dremio version is returned by login. With a personal access token it is queried on first use.
     def get_dremio_version(self):
+        if self._version is None:
+            status, jobid, job_info = self.execute_sql('SELECT version FROM sys.version')
+            job_result = self.get_job_result(jobid, 0, 1) if status else None
+            if job_result is not None and job_result.get('rows'):
+                self._version = job_result['rows'][0]['version']
         return self._version
 
     # Lists all top-level catalog containers.
@@ -221,7 +664,7 @@ class EnvApi:
     # https://docs.dremio.com/software/rest-api/catalog/post-catalog/
     def create_catalog(self, catalog_definition):
         if self._dry_run:
-            self._logger.warning("Dry Run: not creating catalog.")
+            self._logger.warn("Dry Run: not creating catalog.")
         else:
             return self._http_post(self._catalog, catalog_definition)
 
@@ -255,7 +698,7 @@ class EnvApi:
         if self._dry_run:
             self._logger.warn("Dry Run: not refreshing reflections by PDS ID.")
         else:
-            return self._http_post(self._catalog + pds_id + "/" + self._refresh_postfix)
+            return self._http_post(self._catalog + pds_id + "/" + self._refresh_postfix, idempotent=True)
 
     # Refreshes all reflections dependent on a PDS specified by path
     def refresh_reflections_by_pds_path(self, pds_path):
@@ -267,7 +710,7 @@ class EnvApi:
             self._logger.warn("Dry Run: not refreshing reflections by PDS PATH.")
             return
         pds_id = pds['id']
-        return self._http_post(self._catalog + pds_id + "/" + self._refresh_postfix)
+        return self._http_post(self._catalog + pds_id + "/" + self._refresh_postfix, idempotent=True)
 
     # Updates wiki for a catalog specified by ID
     # https://docs.dremio.com/software/rest-api/catalog/post-catalog-collaboration/
@@ -307,25 +750,51 @@ class EnvApi:
             return None
 
     # Executes SQL and returns Job ID and Execution Status. It waits for the query to complete execution.
+    # Timeout in seconds overrides timeout of the poll policy.
     # Returns success_status, jobid, job_info
     # https://docs.dremio.com/software/rest-api/sql/post-sql/
-    def execute_sql(self, sql, sql_context=None, timeout=None):
+    def execute_sql(self, sql, sql_context=None, timeout=None, poll_policy: PollPolicy = None):
         jobid = self.submit_sql(sql, sql_context)
         if jobid is None:
             return False, None, None
-        # Wait for job to complete
-        process_time = 0
-        while timeout is None or process_time < timeout:
-            job_info = self.get_job_info(jobid)
-            if job_info is None:
-                return False, None, None
-            elif job_info["jobState"] in ['COMPLETED']:
-                return True, jobid, job_info
-            elif job_info["jobState"] in ['CANCELED', 'FAILED']:
-                return False, jobid, job_info
-            time.sleep(1)
-            process_time += 1
-        return False, None, None
+        job_info = self.wait_for_job(jobid, timeout, poll_policy)
+        if job_info is None:
+            return False, None, None
+        return job_info["jobState"] == 'COMPLETED', jobid, job_info
+
+    # Polls job status as per poll policy until the job completes, fails or is canceled.
+    # Returns job info or None if job info could not be retrieved or the job did not complete before timeout.
+    def wait_for_job(self, jobid, timeout=None, poll_policy: PollPolicy = None):
+        if poll_policy is None:
+            poll_policy = self.DEFAULT_POLL_POLICY
+        if timeout is None:
+            timeout = poll_policy.timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        poll_number = 0
+        try:
+            while True:
+                job_info = self.get_job_info(jobid)
+                poll_number += 1
+                if job_info is None or job_info["jobState"] in ['COMPLETED', 'CANCELED', 'FAILED']:
+                    return job_info
+                interval = poll_policy.get_interval(poll_number - 1)
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None
+                    interval = min(interval, remaining)
+                time.sleep(interval)
+        finally:
+            self._record_job_polls(jobid, poll_number)
+
+    def _record_job_polls(self, jobid, poll_count: int) -> None:
+        with self._stats_lock:
+            self._job_poll_counts[jobid] = self._job_poll_counts.get(jobid, 0) + poll_count
+
+    # Returns number of status polls made for a job specified by ID
+    def get_job_poll_count(self, jobid) -> int:
+        with self._stats_lock:
+            return self._job_poll_counts.get(jobid, 0)
 
     # Returns information for a job specified by ID
     # https://docs.dremio.com/software/rest-api/job/
@@ -337,6 +806,38 @@ class EnvApi:
     def get_job_result(self, jobid, offset=0, limit=100):
         return self._http_get(self._job + jobid + '/results?offset=' + str(offset) + '&limit=' + str(limit))
 
+    # Yields rows of a completed job in order. Pages of page_size rows are fetched by prefetch_pages threads ahead of
+    # the consumer. Number of rows is taken from the first page if not specified.
+    # Raises RuntimeError if a page cannot be retrieved, so that a partial result is not taken for a complete one.
+    def iter_job_result(self, jobid, num_rows: int = None, page_size: int = MAX_JOB_RESULT_PAGE_SIZE,
+                        prefetch_pages: int = DEFAULT_JOB_RESULT_PREFETCH_PAGES):
+        offset = 0
+        if num_rows is None:
+            job_result = self.get_job_result(jobid, 0, page_size)
+            if job_result is None:
+                self._raise_job_result_error(jobid, 0)
+            num_rows = int(job_result['rowCount'])
+            for row in job_result['rows']:
+                yield row
+            offset = page_size
+        with ThreadPoolExecutor(max_workers=prefetch_pages) as executor:
+            pages = deque()
+            while offset < num_rows or pages:
+                while offset < num_rows and len(pages) < prefetch_pages:
+                    pages.append((offset, executor.submit(self.get_job_result, jobid, offset, page_size)))
+                    offset += page_size
+                page_offset, page = pages.popleft()
+                job_result = page.result()
+                if job_result is None:
+                    self._raise_job_result_error(jobid, page_offset)
+                for row in job_result['rows']:
+                    yield row
+
+    def _raise_job_result_error(self, jobid, offset: int) -> None:
+        message = "Unable to retrieve results of job " + str(jobid) + " at offset " + str(offset) + "."
+        self._logger.error(message)
+        raise RuntimeError(message)
+
     # Deletes a reflection specified by ID
     # https://docs.dremio.com/software/rest-api/reflections/delete-reflection/
     def delete_reflection(self, reflection_id):
@@ -387,172 +888,199 @@ class EnvApi:
     # Executes HTTP GET. Returns JSON if success or None
     def _http_get(self, url, re_authenticate=False):
         if re_authenticate:
-            self._authenticate()
-        # Infer source
-        source_name = None
-        pos = url.find(self._catalog_by_path)
-        if pos >= 0:
-            source_name = url[pos + 23:]
-            source_name = source_name[0:source_name.find("/")]
-        else:
-            pos = url.find(self._catalog)
-            if pos >= 0:
-                source_name = url[pos + 23:]
-                source_name = source_name[0:source_name.find("/")]
-
-        try:
-            if source_name in self._timed_out_sources:
-                raise requests.exceptions.Timeout()
-            response = requests.request("GET", self._endpoint + url, headers=self._headers, timeout=self._api_timeout,
-                                        verify=self._verify_ssl)
-            if response.status_code == 200:
-                return response.json()
-            elif response.status_code == 400:  # Bad Request
-                self._logger.info("Received HTTP Response Code " + str(response.status_code) +
-                                  " for : <" + str(url) + ">" + self._get_error_message(response))
-            elif response.status_code == 404:  # Not found
-                self._logger.info("Received HTTP Response Code " + str(response.status_code) +
-                                  " for : <" + str(url) + ">" + self._get_error_message(response))
-            elif response.status_code == 401 or response.status_code == 403:
-                # Try to re-authenticate once since the token might expire
-                if not re_authenticate:
-                    return self._http_get(url, True)
-                self._logger.fatal("Received HTTP Response Code " + str(response.status_code) +
-                                   " for : <" + str(url) + ">" + self._get_error_message(response))
-                raise RuntimeError(self._get_error_message(response))
-            else:
-                self._logger.error("Received HTTP Response Code " + str(response.status_code) +
-                                   " for : <" + str(url) + ">" + self._get_error_message(response))
+            self._refresh_last_token()
+        circuit_breaker = self._get_circuit_breaker(url)
+        if not self._allow_request(circuit_breaker, url):
             return None
+        try:
+            response = self._send("GET", self._endpoint + url, headers=self._headers)
         except requests.exceptions.Timeout:
-            if source_name is None or source_name not in self._timed_out_sources:
-                # This situation might happen when an underlying object (file system eg) is not responding
-                self._logger.error("HTTP Request Timed-out: " + " <" + str(url) + ">")
-            if source_name is not None and source_name not in self._timed_out_sources:
-                self._timed_out_sources.append(source_name)
+            # This situation might happen when an underlying object (file system eg) is not responding
+            self._logger.error("HTTP Request Timed-out: " + " <" + str(url) + ">")
+            if circuit_breaker is not None:
+                circuit_breaker.record_failure()
             return None
+        except requests.exceptions.RequestException:
+            # Connection errors also count, otherwise a failed half-open probe would never be released
+            if circuit_breaker is not None:
+                circuit_breaker.record_failure()
+            raise
+        if circuit_breaker is not None:
+            circuit_breaker.record_success()
+        # Try to re-authenticate once since the token might expire
+        if self._is_auth_error(response) and not re_authenticate:
+            return self._http_get(url, True)
+        return self._process_get_response(url, response)
+
+    # Returns False if the request is to be skipped since the circuit breaker of its source is open
+    def _allow_request(self, circuit_breaker, url) -> bool:
+        if circuit_breaker is None or circuit_breaker.allow_request():
+            return True
+        self._logger.debug("Circuit breaker for source " + circuit_breaker.get_name() + " is open. Skipping <" +
+                           str(url) + ">")
+        return False
+
+    @staticmethod
+    def _is_auth_error(response: requests.Response) -> bool:
+        return response.status_code == 401 or response.status_code == 403
+
+    # Returns JSON of a GET response if success or None
+    def _process_get_response(self, url, response: requests.Response):
+        if response.status_code == 200:
+            entity = response.json()
+            self._learn_source_roots(url, entity)
+            return entity
+        elif response.status_code == 400:  # Bad Request
+            self._logger.info("Received HTTP Response Code " + str(response.status_code) +
+                              " for : <" + str(url) + ">" + self._get_error_message(response))
+        elif response.status_code == 404:  # Not found
+            self._logger.info("Received HTTP Response Code " + str(response.status_code) +
+                              " for : <" + str(url) + ">" + self._get_error_message(response))
+        elif self._is_auth_error(response):
+            self._logger.fatal("Received HTTP Response Code " + str(response.status_code) +
+                               " for : <" + str(url) + ">" + self._get_error_message(response))
+            raise RuntimeError(self._get_error_message(response))
+        else:
+            self._logger.error("Received HTTP Response Code " + str(response.status_code) +
+                               " for : <" + str(url) + ">" + self._get_error_message(response))
+        return None
 
     # Executes HTTP POST. Returns JSON if success or None
-    def _http_post(self, url, json_data=None, as_json=True, re_authenticate=False):
+    def _http_post(self, url, json_data=None, as_json=True, re_authenticate=False, idempotent=False):
         if re_authenticate:
-            self._authenticate()
+            self._refresh_last_token()
+        json_data = self._encode_json_data(json_data)
         try:
-            try:
-                if json_data and isinstance(json_data, str):
-                    json_data = json_data.encode("utf-8")
-            except UnicodeEncodeError as e:
-                self._logger.error(e)
-                self._logger.error(f"Data: {json_data}")
-            if json_data is None:
-                response = requests.request("POST", self._endpoint + url, headers=self._headers,
-                                            timeout=self._api_timeout, verify=self._verify_ssl)
-            elif as_json:
-                response = requests.request("POST", self._endpoint + url, json=json_data, headers=self._headers,
-                                            timeout=self._api_timeout, verify=self._verify_ssl)
-            else:
-                response = requests.request("POST", self._endpoint + url, data=json_data, headers=self._headers,
-                                            timeout=self._api_timeout, verify=self._verify_ssl)
-            if response.status_code == 200:
-                return response.json()
-            elif response.status_code == 204:
-                return None
-            elif response.status_code == 400:
-                self._logger.error("Received HTTP Response Code " + str(response.status_code) +
-                                   " for : <" + str(url) + ">" + self._get_error_message(response), catalog=json_data)
-            elif response.status_code == 401 or response.status_code == 403:
-                # Try to re-authenticate since the token might expire
-                if not re_authenticate:
-                    return self._http_post(url, json_data, as_json, False)
-                self._logger.fatal("Received HTTP Response Code " + str(response.status_code) +
-                                   " for : <" + str(url) + ">" + self._get_error_message(response), catalog=json_data)
-                raise RuntimeError(self._get_error_message(response))
-            elif response.status_code == 409:  # Already exists.
-                self._logger.error("Received HTTP Response Code " + str(response.status_code) +
-                                   " for : <" + str(url) + ">" + self._get_error_message(response), catalog=json_data)
-            elif response.status_code == 404:  # Not found
-                self._logger.info("Received HTTP Response Code " + str(response.status_code) +
-                                  " for : <" + str(url) + ">" + self._get_error_message(response), catalog=json_data)
-            else:
-                self._logger.error("Received HTTP Response Code " + str(response.status_code) +
-                                   " for : <" + str(url) + ">" + self._get_error_message(response), catalog=json_data)
-            return None
+            response = self._send("POST", self._endpoint + url, idempotent, headers=self._headers,
+                                  **self._get_body_kwargs(json_data, as_json))
         except requests.exceptions.Timeout:
             # This situation might happen when an underlying object (file system eg) is not responding
             self._logger.error("HTTP Request Timed-out: " + " <" + str(url) + ">", catalog=json_data)
             return None
+        # Try to re-authenticate since the token might expire
+        if self._is_auth_error(response) and not re_authenticate:
+            return self._http_post(url, json_data, as_json, True, idempotent)
+        return self._process_post_response(url, response, json_data)
+
+    def _encode_json_data(self, json_data):
+        try:
+            if json_data and isinstance(json_data, str):
+                json_data = json_data.encode("utf-8")
+        except UnicodeEncodeError as e:
+            self._logger.error(e)
+            self._logger.error(f"Data: {json_data}")
+        return json_data
+
+    # Returns request keyword arguments for the body: JSON data is serialized, otherwise data is sent as is
+    @staticmethod
+    def _get_body_kwargs(json_data, as_json=True) -> dict:
+        if json_data is None:
+            return {}
+        return {'json': json_data} if as_json else {'data': json_data}
+
+    # Returns JSON of a POST response if success or None
+    def _process_post_response(self, url, response: requests.Response, json_data=None):
+        if response.status_code == 200:
+            return response.json()
+        elif response.status_code == 204:
+            return None
+        elif response.status_code == 400:
+            self._logger.error("Received HTTP Response Code " + str(response.status_code) +
+                               " for : <" + str(url) + ">" + self._get_error_message(response), catalog=json_data)
+        elif self._is_auth_error(response):
+            self._logger.fatal("Received HTTP Response Code " + str(response.status_code) +
+                               " for : <" + str(url) + ">" + self._get_error_message(response), catalog=json_data)
+            raise RuntimeError(self._get_error_message(response))
+        elif response.status_code == 409:  # Already exists.
+            self._logger.error("Received HTTP Response Code " + str(response.status_code) +
+                               " for : <" + str(url) + ">" + self._get_error_message(response), catalog=json_data)
+        elif response.status_code == 404:  # Not found
+            self._logger.info("Received HTTP Response Code " + str(response.status_code) +
+                              " for : <" + str(url) + ">" + self._get_error_message(response), catalog=json_data)
+        else:
+            self._logger.error("Received HTTP Response Code " + str(response.status_code) +
+                               " for : <" + str(url) + ">" + self._get_error_message(response), catalog=json_data)
+        return None
 
     # Executes HTTP PUT. Returns JSON if success or None
     def _http_put(self, url, json_data, re_authenticate=False):
         if re_authenticate:
-            self._authenticate()
+            self._refresh_last_token()
         try:
-            response = requests.request("PUT", self._endpoint + url, json=json_data, headers=self._headers,
-                                        timeout=self._api_timeout, verify=self._verify_ssl)
-            if response.status_code == 200:
-                return response.json()
-            elif response.status_code == 400:  # The supplied CatalogEntity object is invalid.
-                self._logger.error("Received HTTP Response Code 400 for : <" + str(url) + ">" +
-                                   self._get_error_message(response))
-            elif response.status_code == 401 or response.status_code == 403:
-                # Try to re-authenticate since the token might expire
-                if not re_authenticate:
-                    return self._http_put(url, json_data, True)
-                self._logger.fatal("Received HTTP Response Code " + str(response.status_code) +
-                                   " for : <" + str(url) + ">" + self._get_error_message(response))
-                raise RuntimeError(self._get_error_message(response))
-            elif response.status_code == 409:  # A catalog catalog with the specified path already exists.
-                self._logger.error("Received HTTP Response Code 409 for : <" + str(url) + ">" +
-                                   self._get_error_message(response))
-            elif response.status_code == 404:  # Not found
-                self._logger.info("Received HTTP Response Code 404 for : <" + str(url) + ">" +
-                                  self._get_error_message(response))
-            else:
-                self._logger.error("Received HTTP Response Code " + str(response.status_code) +
-                                   " for : <" + str(url) + ">" + self._get_error_message(response))
-            return None
+            response = self._send("PUT", self._endpoint + url, json=json_data, headers=self._headers)
         except requests.exceptions.Timeout:
             # This situation might happen when an underlying object (file system eg) is not responding
             self._logger.error("HTTP Request Timed-out: " + " <" + str(url) + ">")
             return None
+        # Try to re-authenticate since the token might expire
+        if self._is_auth_error(response) and not re_authenticate:
+            return self._http_put(url, json_data, True)
+        return self._process_put_or_delete_response(url, response)
 
     # Executes HTTP DELETE. Returns JSON if success or None
     def _http_delete(self, url, re_authenticate=False):
         if re_authenticate:
-            self._authenticate()
+            self._refresh_last_token()
         try:
-            response = requests.request("DELETE", self._endpoint + url, headers=self._headers,
-                                        timeout=self._api_timeout, verify=self._verify_ssl)
-            if response.status_code == 200:
-                if response.text == '':
-                    # if text is empty then response.json() fails, e.g. delete reflections return 200 and empty text.
-                    return None
-                return response.json()
-            elif response.status_code == 204:
-                return None
-            elif response.status_code == 400:  # The supplied CatalogEntity object is invalid.
-                self._logger.error("Received HTTP Response Code 400 for : <" + str(url) + ">" +
-                                   self._get_error_message(response))
-            elif response.status_code == 401 or response.status_code == 403:
-                # Try to re-authenticate since the token might expire
-                if not re_authenticate:
-                    return self._http_delete(url, False)
-                self._logger.fatal("Received HTTP Response Code " + str(response.status_code) +
-                                   " for : <" + str(url) + ">" + self._get_error_message(response))
-                raise RuntimeError(self._get_error_message(response))
-            elif response.status_code == 409:  # A catalog catalog with the specified path already exists.
-                self._logger.error("Received HTTP Response Code 409 for : <" + str(url) + ">" +
-                                   self._get_error_message(response))
-            elif response.status_code == 404:  # Not found
-                self._logger.info("Received HTTP Response Code 404 for : <" + str(url) + ">" +
-                                  self._get_error_message(response))
-            else:
-                self._logger.error("Received HTTP Response Code " + str(response.status_code) +
-                                   " for : <" + str(url) + ">" + self._get_error_message(response))
-            return None
+            response = self._send("DELETE", self._endpoint + url, headers=self._headers)
         except requests.exceptions.Timeout:
             # This situation might happen when an underlying object (file system eg) is not responding
             self._logger.error("HTTP Request Timed-out: " + " <" + str(url) + ">")
             return None
+        # Try to re-authenticate since the token might expire
+        if self._is_auth_error(response) and not re_authenticate:
+            return self._http_delete(url, True)
+        return self._process_put_or_delete_response(url, response)
+
+    # Returns JSON of a PUT or DELETE response if success or None
+    def _process_put_or_delete_response(self, url, response: requests.Response):
+        if response.status_code == 200:
+            if response.text == '':
+                # if text is empty then response.json() fails, e.g. delete reflections return 200 and empty text.
+                return None
+            return response.json()
+        elif response.status_code == 204:
+            return None
+        elif response.status_code == 400:  # The supplied CatalogEntity object is invalid.
+            self._logger.error("Received HTTP Response Code 400 for : <" + str(url) + ">" +
+                               self._get_error_message(response))
+        elif self._is_auth_error(response):
+            self._logger.fatal("Received HTTP Response Code " + str(response.status_code) +
+                               " for : <" + str(url) + ">" + self._get_error_message(response))
+            raise RuntimeError(self._get_error_message(response))
+        elif response.status_code == 409:  # A catalog catalog with the specified path already exists.
+            self._logger.error("Received HTTP Response Code 409 for : <" + str(url) + ">" +
+                               self._get_error_message(response))
+        elif response.status_code == 404:  # Not found
+            self._logger.info("Received HTTP Response Code 404 for : <" + str(url) + ">" +
+                              self._get_error_message(response))
+        else:
+            self._logger.error("Received HTTP Response Code " + str(response.status_code) +
+                               " for : <" + str(url) + ">" + self._get_error_message(response))
+        return None
+
+    # Infer path root (source, space or home) of a catalog URL. Roots of catalog IDs are known once the ID has been
+    # seen in a catalog response. Returns None if the root is not known.
+    def _get_source_name(self, url):
+        url = url.split('?')[0]
+        pos = url.find(self._catalog_by_path)
+        if pos >= 0:
+            source_name = urllib.parse.unquote(url[pos + len(self._catalog_by_path):].split('/')[0])
+            return source_name if source_name != '' else None
+        pos = url.find(self._catalog)
+        if pos >= 0:
+            return self._source_roots.get(urllib.parse.unquote(url[pos + len(self._catalog):].split('/')[0]))
+        return None
+
+    # Remember path roots of catalog entities and their children in a catalog response
+    def _learn_source_roots(self, url, response_json) -> None:
+        if self._catalog not in url or not isinstance(response_json, dict):
+            return
+        entities = [response_json] + (response_json.get('children') or []) + (response_json.get('data') or [])
+        for entity in entities:
+            if isinstance(entity, dict) and 'id' in entity and isinstance(entity.get('path'), list) and \
+                    len(entity['path']) > 0:
+                self._source_roots[entity['id']] = entity['path'][0]
 
     def _get_error_message(self, response):
         message = ""
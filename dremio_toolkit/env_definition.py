@@ -17,8 +17,159 @@
 #########################################################################
 
 
+# Returns hashable index value for an attribute of a catalog object.
+# Paths are normalized to tuples, e.g. ['Space', 'VDS'] and 'Space/VDS' both become ('Space', 'VDS').
+def _index_value(key: str, value):
+    if isinstance(value, (list, tuple)):
+        return tuple(value)
+    if key == 'path' and isinstance(value, str):
+        return tuple(value[1:].split('/') if value[:1] == '/' else value.split('/'))
+    return value
+
+
+# List of catalog objects (dicts) with hash indexes on selected attributes.
+# Indexes are maintained by all list operations. Call reindex() if indexed attributes of items are changed in place.
+class IndexedList(list):
+    def __init__(self, items=None, keys: list = None):
+        super().__init__()
+        self._keys = keys if keys is not None else []
+        self._indexes = {key: {} for key in self._keys}
+        if items is not None:
+            self.extend(items)
+
+    # Returns the first item with the attribute 'key' equal to 'value' or None
+    def find(self, key: str, value):
+        items = self.find_all(key, value)
+        return items[0] if items else None
+
+    # Returns all items with the attribute 'key' equal to 'value'
+    def find_all(self, key: str, value) -> list:
+        value = _index_value(key, value)
+        try:
+            items = self._indexes[key].get(value, [])
+        except TypeError:
+            return []
+        # Skip items that have been modified in place since they were indexed
+        return [item for item in items if _index_value(key, item.get(key)) == value]
+
+    def reindex(self) -> None:
+        self._indexes = {key: {} for key in self._keys}
+        for item in self:
+            self._index(item)
+
+    def append(self, item) -> None:
+        super().append(item)
+        self._index(item)
+
+    def extend(self, items) -> None:
+        for item in items:
+            self.append(item)
+
+    def insert(self, i, item) -> None:
+        super().insert(i, item)
+        self._index(item)
+
+    def remove(self, item) -> None:
+        del self[super().index(item)]
+
+    def pop(self, i=-1):
+        item = super().pop(i)
+        self._unindex(item)
+        return item
+
+    def clear(self) -> None:
+        super().clear()
+        self._indexes = {key: {} for key in self._keys}
+
+    def __setitem__(self, i, value) -> None:
+        old_items = self[i] if isinstance(i, slice) else [self[i]]
+        super().__setitem__(i, value)
+        for item in old_items:
+            self._unindex(item)
+        for item in (self[i] if isinstance(i, slice) else [self[i]]):
+            self._index(item)
+
+    def __delitem__(self, i) -> None:
+        old_items = self[i] if isinstance(i, slice) else [self[i]]
+        super().__delitem__(i)
+        for item in old_items:
+            self._unindex(item)
+
+    def __iadd__(self, items):
+        self.extend(items)
+        return self
+
+    def __imul__(self, n):
+        super().__imul__(n)
+        self.reindex()
+        return self
+
+    # Use an index to check membership. Equal dicts have equal attributes, so only items that share the index
+    # value need to be compared.
+    def __contains__(self, item) -> bool:
+        if isinstance(item, dict):
+            for key in self._keys:
+                if key in item:
+                    try:
+                        candidates = self._indexes[key].get(_index_value(key, item[key]), [])
+                    except TypeError:
+                        break
+                    return any(candidate == item for candidate in candidates)
+        return super().__contains__(item)
+
+    def _index(self, item) -> None:
+        if not isinstance(item, dict):
+            return
+        for key in self._keys:
+            if key in item:
+                try:
+                    self._indexes[key].setdefault(_index_value(key, item[key]), []).append(item)
+                except TypeError:
+                    pass
+
+    def _unindex(self, item) -> None:
+        if not isinstance(item, dict):
+            return
+        for key in self._keys:
+            index = self._indexes[key]
+            try:
+                value = _index_value(key, item[key]) if key in item else None
+                found = value in index and any(indexed_item is item for indexed_item in index[value])
+            except TypeError:
+                found = False
+            # Item might have been modified in place since it was indexed, search all index values
+            values = [value] if found else [value for value, items in index.items()
+                                            if any(indexed_item is item for indexed_item in items)]
+            for value in values:
+                remaining = [indexed_item for indexed_item in index[value] if indexed_item is not item]
+                if remaining:
+                    index[value] = remaining
+                else:
+                    index.pop(value)
+
+
 # Data Class to contain definition of Dremio Environment
 class EnvDefinition:
+    # Attributes indexed for each list of Dremio objects
+    INDEXED_KEYS = {
+        'containers': ['id', 'path'],
+        'sources': ['id', 'name'],
+        'spaces': ['id', 'name'],
+        'folders': ['id', 'path'],
+        'vds_list': ['id', 'path'],
+        'vds_parents': ['id', 'path'],
+        'reflections': ['id', 'datasetId', 'path'],
+        'rules': ['name'],
+        'queues': ['id', 'name'],
+        'votes': ['datasetId'],
+        'files': ['id', 'path'],
+        'tags': ['entity_id', 'path'],
+        'wikis': ['entity_id', 'path'],
+        'referenced_users': ['id', 'name'],
+        'referenced_groups': ['id', 'name'],
+        'referenced_roles': ['id', 'name'],
+    }
+
     def __init__(self):
         self.containers = []
         self.sources = []
@@ -41,3 +192,8 @@ class EnvDefinition:
         self.endpoint = None
         self.timestamp_utc = None
 
+    # Lists assigned to Dremio object attributes are converted to IndexedList
+    def __setattr__(self, name, value):
+        if name in EnvDefinition.INDEXED_KEYS and isinstance(value, list) and not isinstance(value, IndexedList):
+            value = IndexedList(value, EnvDefinition.INDEXED_KEYS[name])
+        super().__setattr__(name, value)
@@ -17,7 +17,7 @@
 #########################################################################
 
 from dremio_toolkit.logger import Logger
-from dremio_toolkit.env_definition import EnvDefinition
+from dremio_toolkit.env_definition import EnvDefinition, IndexedList
 from dremio_toolkit.context import Context
 import os
 import json
@@ -151,12 +151,19 @@ class EnvDiff:
         self._diff_lists(self._base_def.wikis, self._comp_def.wikis, 'path', fields,
                          self.diff_wikis, 'Wikis')
 
+    # Hash join of base and comp lists on uid. Only items with equal uid are compared with each other.
     def _diff_lists(self, base_list: list, comp_list: list, uid: str, fields: [], report_list: list, msg: str) -> None:
         self._logger.new_process_status(len(base_list) + len(comp_list), 'Comparing snapshots for ' + msg + '. ')
+        # Items with the same uid are kept in their original order
+        comp_items_by_uid = {}
+        for comp_item in comp_list:
+            comp_items_by_uid.setdefault(self._get_uid_key(comp_item[uid]), []).append(comp_item)
+        base_uids = set()
         for base_item in base_list:
             self._logger.print_process_status(increment=1)
+            base_uids.add(self._get_uid_key(base_item[uid]))
             match_found = False
-            for comp_item in comp_list:
+            for comp_item in comp_items_by_uid.get(self._get_uid_key(base_item[uid]), []):
                 diff, explanation = self._diff_item(base_item, comp_item, uid, fields)
                 if diff == DiffType.NO_DIFF:
                     match_found = True
@@ -173,15 +180,16 @@ class EnvDiff:
                 self._report_diff(report_list, base_item, diff='Item is missing in Comp Environment')
         for comp_item in comp_list:
             self._logger.print_process_status(increment=1)
-            match_found = False
-            for base_item in base_list:
-                diff, explanation = self._diff_item(base_item, comp_item, uid, fields)
-                if diff != DiffType.DIFF_UID:  # Matching paths have been evaluated in prior loop
-                    match_found = True
-                    break
-            if not match_found:
+            # Items with matching uid have been evaluated in prior loop
+            if self._get_uid_key(comp_item[uid]) not in base_uids:
                 self._report_diff(report_list, comp=comp_item, diff='Extra item in Comp Environment')
 
+    # Returns hashable key for a uid value, e.g. a path list
+    def _get_uid_key(self, uid_value):
+        if isinstance(uid_value, list):
+            return tuple(self._get_uid_key(item) for item in uid_value)
+        return uid_value
+
     def _diff_item(self, base_item: dict, comp_item: dict, uid: str, fields: []):
         # Verify UID for recursive calls
         if uid is not None and base_item[uid] != comp_item[uid]:
@@ -249,7 +257,7 @@ class EnvDiff:
         return DiffType.NO_DIFF
 
     def _diff_acl_permissions(self, principal_type: str, base_acl: dict, comp_acl: dict,
-                              base_referenced_principals: list, comp_referenced_principals: list):
+                              base_referenced_principals: IndexedList, comp_referenced_principals: IndexedList):
         if base_acl == {} and comp_acl == {}:
             return DiffType.NO_DIFF
         if principal_type in base_acl and principal_type in comp_acl:
@@ -270,11 +278,9 @@ class EnvDiff:
             return DiffType.NO_DIFF
         return DiffType.DIFF_PERMISSIONS
 
-    def _resolve_referenced_principal(self, principal_id: str, referenced_principals: list) -> str:
-        for principal in referenced_principals:
-            if principal['id'] == principal_id:
-                return principal['name']
-        return None
+    def _resolve_referenced_principal(self, principal_id: str, referenced_principals: IndexedList) -> str:
+        principal = referenced_principals.find('id', principal_id)
+        return principal['name'] if principal is not None else None
 
     def _report_diff(self, report_list: list, base: dict = None, comp: dict = None, diff: str = None, msg=None):
         report_list.append({"base": base, "comp": comp, "diff": diff, "message": msg})
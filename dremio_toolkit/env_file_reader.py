@@ -16,19 +16,191 @@
 # Contact dremio@ucesys.com
 #########################################################################
 
+import codecs
 import json
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 from dremio_toolkit.env_definition import EnvDefinition
 from dremio_toolkit.env_file_writer import EnvFileWriter
 from dremio_toolkit.context import Context
 from dremio_toolkit.env_definition import EnvDefinition
 
+# Incremental parser of a snapshot file. Decodes one JSON value at a time from a buffer refilled with chunked reads.
+class _JsonStreamParser:
+    _CHUNK_SIZE = 1024 * 1024
+    _STRUCTURAL_CHARS = re.compile(r'[\[\]{}"]')
+    _STRING_SPECIAL_CHARS = re.compile(r'["\\]')
+
+    def __init__(self, f, offset: int = 0):
+        self._file = f
+        self._file.seek(offset)
+        self._utf8_decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json_decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        # Byte offset in the file of the first character of the buffer
+        self._buffer_offset = offset
+        self._eof = False
+
+    # Returns byte offset in the file of the current position
+    def tell(self) -> int:
+        return self._buffer_offset + len(self._buffer[:self._pos].encode('utf-8'))
+
+    # Returns next non-whitespace character without consuming it or an empty string at the end of file
+    def peek(self) -> str:
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in ' \t\n\r':
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._read_chunk(self._CHUNK_SIZE):
+                return ''
+
+    # Consumes next non-whitespace character, which must be one of chars
+    def expect(self, chars: str) -> str:
+        char = self.peek()
+        if char == '' or char not in chars:
+            raise ValueError('Unexpected content in snapshot file at byte ' + str(self.tell()) + ', expected: ' + chars)
+        self._pos += 1
+        return char
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self._json_decoder.raw_decode(self._buffer, self._pos)
+                # A value ending at the end of the buffer might continue in the next chunk
+                if end < len(self._buffer) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._read_chunk(max(self._CHUNK_SIZE, len(self._buffer)))
+
+    # Consumes next value without decoding it. Containers and strings are scanned for their end only.
+    def skip_value(self):
+        if self.peek() not in '[{"':
+            self.value()
+            return
+        depth = 0
+        while True:
+            if self._pos >= len(self._buffer):
+                if not self._read_chunk(self._CHUNK_SIZE):
+                    raise ValueError('Unexpected end of snapshot file at byte ' + str(self.tell()))
+                continue
+            char = self._buffer[self._pos]
+            if char == '"':
+                self._skip_string()
+            elif char in '[{':
+                depth += 1
+                self._pos += 1
+            elif char in ']}':
+                depth -= 1
+                self._pos += 1
+            else:
+                match = self._STRUCTURAL_CHARS.search(self._buffer, self._pos)
+                self._pos = match.start() if match else len(self._buffer)
+                continue
+            if depth == 0:
+                return
+
+    # Consumes a list without decoding its items and returns the number of items
+    def skip_list(self) -> int:
+        self.expect('[')
+        if self.peek() == ']':
+            self._pos += 1
+            return 0
+        count = 0
+        while True:
+            self.skip_value()
+            count += 1
+            if self.expect(',]') == ']':
+                return count
+
+    def iterate_list(self):
+        self.expect('[')
+        if self.peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(',]') == ']':
+                return
+
+    # Yields keys of an object. The caller must consume the value of each key before requesting the next key.
+    def iterate_object_keys(self):
+        self.expect('{')
+        if self.peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            if self.expect(',}') == '}':
+                return
+
+    def _skip_string(self):
+        self._pos += 1
+        while True:
+            match = self._STRING_SPECIAL_CHARS.search(self._buffer, self._pos)
+            # An escape at the end of the buffer is kept until the escaped character is read
+            if match is None or (match.group() == '\\' and match.end() == len(self._buffer)):
+                self._pos = match.start() if match else len(self._buffer)
+                if not self._read_chunk(self._CHUNK_SIZE):
+                    raise ValueError('Unexpected end of snapshot file at byte ' + str(self.tell()))
+            elif match.group() == '"':
+                self._pos = match.end()
+                return
+            else:
+                self._pos = match.end() + 1
+
+    def _read_chunk(self, size: int) -> bool:
+        if self._eof:
+            return False
+        # Drop the consumed part of the buffer
+        if self._pos > 0:
+            self._buffer_offset += len(self._buffer[:self._pos].encode('utf-8'))
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+        data = self._file.read(size)
+        if not data:
+            self._eof = True
+            self._buffer += self._utf8_decoder.decode(b'', final=True)
+            return False
+        self._buffer += self._utf8_decoder.decode(data)
+        return True
+
+
+###
+# Section of a snapshot file read lazily. Every iteration parses the section from the file one item at a time.
+###
+class SnapshotSection:
+    def __init__(self, filename: str, offset: int, length: int):
+        self._filename = filename
+        self._offset = offset
+        self._length = length
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        with open(self._filename, 'rb') as f:
+            for item in _JsonStreamParser(f, self._offset).iterate_list():
+                yield item
+
+
 ###
 # This class uses DremioData object to update Dremio environment.
 ###
 class EnvFileReader:
 
     DREMIO_ENV_FILE_VERSION_20 = '2.0'
+    # Sections loaded into memory by the lazy reader as they are used for lookups
+    MATERIALIZED_SECTIONS = ['dremio_environment', 'vds_parents', 'referenced_users', 'referenced_groups',
+                             'referenced_roles']
 
     @staticmethod
     def read_dremio_source_environment(context: Context):
@@ -37,6 +209,14 @@ class EnvFileReader:
         else:
             return EnvFileReader._read_dremio_environment_from_directory(context, context.get_input_path())
 
+    # Reads a snapshot file or directory, e.g. the baseline of an incremental snapshot
+    @staticmethod
+    def read_dremio_environment(context: Context, path: str):
+        if os.path.isdir(path):
+            return EnvFileReader._read_dremio_environment_from_directory(context, path)
+        else:
+            return EnvFileReader._read_dremio_environment_from_file(context, path)
+
     @staticmethod
     def read_dremio_target_environment(context: Context):
         if context.get_output_mode() == Context.PATH_MODE_FILE:
@@ -46,9 +226,12 @@ class EnvFileReader:
 
     @staticmethod
     def _read_dremio_environment_from_file(context: Context, filename: str):
-        f = open(filename, "r", encoding="utf-8")
-        data = json.load(f)['data']
-        f.close()
+        if context.get_lazy_load():
+            data = EnvFileReader._index_snapshot_file(filename)
+        else:
+            f = open(filename, "r", encoding="utf-8")
+            data = json.load(f)['data']
+            f.close()
         env_def = EnvDefinition()
         if 'dremio_environment' in data:
             for env_item in data['dremio_environment']:
@@ -63,6 +246,26 @@ class EnvFileReader:
         else:
             context.get_logger().fatal("Unsupported file version: " + str(env_def.file_version))
 
+    # Scans the snapshot file without keeping its content in memory. Returns data with SnapshotSection
+    # for each section other than MATERIALIZED_SECTIONS. Items of those sections are counted without being decoded.
+    @staticmethod
+    def _index_snapshot_file(filename: str) -> dict:
+        data = {}
+        with open(filename, 'rb') as f:
+            parser = _JsonStreamParser(f)
+            for key in parser.iterate_object_keys():
+                if key != 'data':
+                    parser.skip_value()
+                    continue
+                for section in parser.iterate_object_keys():
+                    if section in EnvFileReader.MATERIALIZED_SECTIONS:
+                        data[section] = parser.value()
+                    else:
+                        parser.peek()
+                        offset = parser.tell()
+                        data[section] = SnapshotSection(filename, offset, parser.skip_list())
+        return data
+
     @staticmethod
     def _read_dremio_environment_from_file_fv20(data, env_def: EnvDefinition):
         if 'sources' in data:
@@ -111,43 +314,55 @@ class EnvFileReader:
                 elif 'timestamp_utc' in env_item:
                     env_def.timestamp_utc = env_item['timestamp_utc']
             f.close()
-            EnvFileReader._collect_directory(os.path.join(source_directory, 'containers'), env_def.containers, None, None)
-            EnvFileReader._collect_directory(os.path.join(source_directory, 'sources'), env_def.sources, None, None)
-            EnvFileReader._collect_directory(os.path.join(source_directory, 'spaces'), env_def.spaces, env_def.folders,
-                                             env_def.vds_list)
-            EnvFileReader._collect_directory(os.path.join(source_directory, 'reflections'), None, None,
-                                             env_def.reflections)
-            EnvFileReader._collect_directory(os.path.join(source_directory, 'rules'), None, None, env_def.rules)
-            EnvFileReader._collect_directory(os.path.join(source_directory, 'queues'), None, None, env_def.queues)
-            EnvFileReader._collect_directory(os.path.join(source_directory, 'tags'), None, None, env_def.tags)
-            EnvFileReader._collect_directory(os.path.join(source_directory, 'wikis'), None, None, env_def.wikis)
-            EnvFileReader._collect_directory(os.path.join(source_directory, 'referenced_users'), None, None,
-                                             env_def.referenced_users)
-            EnvFileReader._collect_directory(os.path.join(source_directory, 'referenced_groups'), None, None,
-                                             env_def.referenced_groups)
-            EnvFileReader._collect_directory(os.path.join(source_directory, 'referenced_roles'), None, None,
-                                             env_def.referenced_roles)
-            EnvFileReader._collect_directory(os.path.join(source_directory, 'vds_parents'), None, None,
-                                             env_def.vds_parents)
+            with ThreadPoolExecutor(max_workers=context.get_io_workers()) as executor:
+                EnvFileReader._collect_directory(executor, os.path.join(source_directory, 'containers'),
+                                                 env_def.containers, None, None)
+                EnvFileReader._collect_directory(executor, os.path.join(source_directory, 'sources'),
+                                                 env_def.sources, None, None)
+                EnvFileReader._collect_directory(executor, os.path.join(source_directory, 'spaces'),
+                                                 env_def.spaces, env_def.folders, env_def.vds_list)
+                EnvFileReader._collect_directory(executor, os.path.join(source_directory, 'reflections'), None, None,
+                                                 env_def.reflections)
+                EnvFileReader._collect_directory(executor, os.path.join(source_directory, 'rules'), None, None,
+                                                 env_def.rules)
+                EnvFileReader._collect_directory(executor, os.path.join(source_directory, 'queues'), None, None,
+                                                 env_def.queues)
+                EnvFileReader._collect_directory(executor, os.path.join(source_directory, 'tags'), None, None,
+                                                 env_def.tags)
+                EnvFileReader._collect_directory(executor, os.path.join(source_directory, 'wikis'), None, None,
+                                                 env_def.wikis)
+                EnvFileReader._collect_directory(executor, os.path.join(source_directory, 'referenced_users'),
+                                                 None, None, env_def.referenced_users)
+                EnvFileReader._collect_directory(executor, os.path.join(source_directory, 'referenced_groups'),
+                                                 None, None, env_def.referenced_groups)
+                EnvFileReader._collect_directory(executor, os.path.join(source_directory, 'referenced_roles'),
+                                                 None, None, env_def.referenced_roles)
+                EnvFileReader._collect_directory(executor, os.path.join(source_directory, 'vds_parents'), None, None,
+                                                 env_def.vds_parents)
         except OSError as e:
             raise Exception("Error reading file. OS Error: " + e.strerror)
         return env_def
 
+    # Files are read by the executor's threads. Results are collected in the order of the directory walk.
     @staticmethod
-    def _collect_directory(directory, container_list, folder_list, object_list):
-        for (dirpath, dirnames, filenames) in os.walk(directory):
-            for filename in filenames:
-                f = open(os.path.join(dirpath, filename), "r", encoding="utf-8")
-                data = json.load(f)
-                f.close()
-                if EnvFileWriter.CONTAINER_SELF_FILENAME == filename:
-                    # First level of dirpath is a container if container_list passed
-                    if container_list is None or (
-                            '/' in dirpath[len(directory) + 1:] or '\\' in dirpath[len(directory) + 1:]):
-                        if folder_list is not None:
-                            folder_list.append(data)
-                    else:
-                        container_list.append(data)
+    def _collect_directory(executor, directory, container_list, folder_list, object_list):
+        files = [(dirpath, filename) for (dirpath, dirnames, filenames) in os.walk(directory) for filename in filenames]
+        data_list = executor.map(EnvFileReader._read_json_file,
+                                 [os.path.join(dirpath, filename) for dirpath, filename in files])
+        for (dirpath, filename), data in zip(files, data_list):
+            if EnvFileWriter.CONTAINER_SELF_FILENAME == filename:
+                # First level of dirpath is a container if container_list passed
+                if container_list is None or (
+                        '/' in dirpath[len(directory) + 1:] or '\\' in dirpath[len(directory) + 1:]):
+                    if folder_list is not None:
+                        folder_list.append(data)
                 else:
-                    if object_list is not None:
-                        object_list.append(data)
+                    container_list.append(data)
+            else:
+                if object_list is not None:
+                    object_list.append(data)
+
+    @staticmethod
+    def _read_json_file(filepath):
+        with open(filepath, "r", encoding="utf-8") as f:
+            return json.load(f)
@@ -18,8 +18,9 @@
 
 import json
 import os
-import errno
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from itertools import chain
 from shutil import rmtree
 
 
@@ -31,6 +32,7 @@ class EnvFileWriter:
     CONTAINER_SELF_FILENAME = '___self.json'
     DREMIO_ENV_FILENAME = 'dremio_environment.json'
     DREMIO_ENV_FILE_VERSION = "2.0"
+    _PENDING_FILES_PER_IO_WORKER = 16
 
     @staticmethod
     def save_dremio_environment(context: Context, env_def: EnvDefinition) -> None:
@@ -47,34 +49,59 @@ class EnvFileWriter:
         if os.path.isfile(output_file):
             os.remove(output_file)
 
-        env_snapshot = {
-            'data': {
-                'dremio_environment': [
-                    {'file_version': EnvFileWriter.DREMIO_ENV_FILE_VERSION},
-                    {'endpoint': env_def.endpoint},
-                    {'timestamp_utc':
-                        str(datetime.utcnow()) if env_def.timestamp_utc is None else env_def.timestamp_utc}
-                ],
-                'sources': env_def.sources,
-                'spaces': env_def.spaces,
-                'folders': env_def.folders,
-                'vds': env_def.vds_list,
-                'vds_parents': env_def.vds_parents,
-                'files': env_def.files,
-                'reflections': env_def.reflections,
-                'queues': env_def.queues,
-                'rules': env_def.rules,
-                'tags': env_def.tags,
-                'wikis': env_def.wikis,
-                'votes': env_def.votes,
-                'referenced_users': env_def.referenced_users,
-                'referenced_groups': env_def.referenced_groups,
-                'referenced_roles': env_def.referenced_roles,
-            }
+        sections = {
+            'dremio_environment': [
+                {'file_version': EnvFileWriter.DREMIO_ENV_FILE_VERSION},
+                {'endpoint': env_def.endpoint},
+                {'timestamp_utc':
+                    str(datetime.utcnow()) if env_def.timestamp_utc is None else env_def.timestamp_utc}
+            ],
+            'sources': env_def.sources,
+            'spaces': env_def.spaces,
+            'folders': env_def.folders,
+            'vds': env_def.vds_list,
+            'vds_parents': env_def.vds_parents,
+            'files': env_def.files,
+            'reflections': env_def.reflections,
+            'queues': env_def.queues,
+            'rules': env_def.rules,
+            'tags': env_def.tags,
+            'wikis': env_def.wikis,
+            'votes': env_def.votes,
+            'referenced_users': env_def.referenced_users,
+            'referenced_groups': env_def.referenced_groups,
+            'referenced_roles': env_def.referenced_roles,
         }
 
         with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(env_snapshot, f, indent=4, sort_keys=True)
+            EnvFileWriter._stream_snapshot(f, sections, context.get_compact_json())
+
+    # Streams the snapshot into the file one item at a time instead of serializing the whole environment at once.
+    # Indented output is identical to json.dump(..., indent=4, sort_keys=True) of {'data': sections}.
+    @staticmethod
+    def _stream_snapshot(f, sections: dict, compact: bool = False) -> None:
+        if compact:
+            f.write('{"data":{')
+            for section_num, section in enumerate(sorted(sections.keys())):
+                f.write((',' if section_num > 0 else '') + json.dumps(section) + ':[')
+                for item_num, item in enumerate(sections[section]):
+                    if item_num > 0:
+                        f.write(',')
+                    f.write(json.dumps(item, separators=(',', ':'), sort_keys=True))
+                f.write(']')
+            f.write('}}')
+            return
+        f.write('{\n    "data": {')
+        for section_num, section in enumerate(sorted(sections.keys())):
+            f.write((',' if section_num > 0 else '') + '\n        ' + json.dumps(section) + ': [')
+            item_num = 0
+            for item in sections[section]:
+                # Nested lines of the item are shifted to the item's nesting level
+                f.write((',' if item_num > 0 else '') + '\n            ' +
+                        json.dumps(item, indent=4, sort_keys=True).replace('\n', '\n            '))
+                item_num += 1
+            f.write('\n        ]' if item_num > 0 else ']')
+        f.write('\n    }\n}')
 
     @staticmethod
     def save_dremio_environment_as_directory(context, env_def) -> None:
@@ -109,111 +136,79 @@ class EnvFileWriter:
                                 str(datetime.utcnow()) if env_def.timestamp_utc is None else env_def.timestamp_utc}
                         ]}, f, indent=4, sort_keys=True)
             f.close()
-            for source in env_def.sources:
-                os.makedirs(
-                    os.path.join(output_dir, "sources", EnvFileWriter._replace_special_characters(source['name'])).
-                    encode(encoding='utf-8', errors='strict'))
-                EnvFileWriter._write_container_json_file(os.path.join(output_dir, "sources"), source)
-            for space in env_def.spaces:
-                os.makedirs(
-                    os.path.join(output_dir, "spaces", EnvFileWriter._replace_special_characters(space['name'])).
-                    encode(encoding='utf-8', errors='strict'))
-                EnvFileWriter._write_container_json_file(os.path.join(output_dir, "spaces"), space)
-            for folder in env_def.folders:
-                # ignore directory exists error, we might have created it prior
-                dir_path = os.path.join(output_dir, "spaces", EnvFileWriter._get_fs_path(folder['path'])).\
-                    encode(encoding='utf-8', errors='strict')
-                if not os.path.isdir(dir_path):
-                    os.makedirs(dir_path)
-                EnvFileWriter._write_folder_json_file(os.path.join(output_dir, "spaces"), folder)
-            for vds in env_def.vds_list:
-                EnvFileWriter._write_entity_json_file(os.path.join(output_dir, "spaces"), vds)
-            for vds_parent in env_def.vds_parents:
-                EnvFileWriter._write_object_json_file(os.path.join(output_dir, "vds_parents"), vds_parent)
-            for reflection in env_def.reflections:
-                EnvFileWriter._write_object_json_file(os.path.join(output_dir, "reflections"), reflection)
-            for rule in env_def.rules:
-                EnvFileWriter._write_object_json_file(os.path.join(output_dir, "rules"), rule)
-            for queue in env_def.queues:
-                EnvFileWriter._write_object_json_file(os.path.join(output_dir, "queues"), queue)
-            for vote in env_def.votes:
-                EnvFileWriter._write_vote_json_file(os.path.join(output_dir, "votes"), vote)
-            for tag in env_def.tags:
-                EnvFileWriter._write_tag_json_file(os.path.join(output_dir, "tags"), tag)
-            for wiki in env_def.wikis:
-                EnvFileWriter._write_wiki_json_file(os.path.join(output_dir, "wikis"), wiki)
-            for user in env_def.referenced_users:
-                EnvFileWriter._write_object_json_file(os.path.join(output_dir, "referenced_users"), user)
-            for group in env_def.referenced_groups:
-                EnvFileWriter._write_object_json_file(os.path.join(output_dir, "referenced_groups"), group)
-            for role in env_def.referenced_roles:
-                EnvFileWriter._write_object_json_file(os.path.join(output_dir, "referenced_roles"), role)
+            # Top level directories have been created above
+            created_dirs = set(os.path.join(output_dir, name).encode(encoding='utf-8', errors='strict') for name in
+                               ['sources', 'spaces', 'reflections', 'referenced_users', 'referenced_groups',
+                                'referenced_roles', 'queues', 'rules', 'tags', 'wikis', 'votes', 'vds_parents'])
+            sources_dir = os.path.join(output_dir, "sources")
+            spaces_dir = os.path.join(output_dir, "spaces")
+            files = chain(
+                ((EnvFileWriter._get_container_filepath(sources_dir, source), source) for source in env_def.sources),
+                ((EnvFileWriter._get_container_filepath(spaces_dir, space), space) for space in env_def.spaces),
+                ((EnvFileWriter._get_folder_filepath(spaces_dir, folder), folder) for folder in env_def.folders),
+                ((EnvFileWriter._get_entity_filepath(spaces_dir, vds), vds) for vds in env_def.vds_list),
+                EnvFileWriter._get_object_files(os.path.join(output_dir, "vds_parents"), env_def.vds_parents, 'id'),
+                EnvFileWriter._get_object_files(os.path.join(output_dir, "reflections"), env_def.reflections, 'id'),
+                EnvFileWriter._get_object_files(os.path.join(output_dir, "rules"), env_def.rules, 'id'),
+                EnvFileWriter._get_object_files(os.path.join(output_dir, "queues"), env_def.queues, 'id'),
+                EnvFileWriter._get_object_files(os.path.join(output_dir, "votes"), env_def.votes, 'datasetId'),
+                EnvFileWriter._get_object_files(os.path.join(output_dir, "tags"), env_def.tags, 'entity_id'),
+                EnvFileWriter._get_object_files(os.path.join(output_dir, "wikis"), env_def.wikis, 'entity_id'),
+                EnvFileWriter._get_object_files(os.path.join(output_dir, "referenced_users"),
+                                                env_def.referenced_users, 'id'),
+                EnvFileWriter._get_object_files(os.path.join(output_dir, "referenced_groups"),
+                                                env_def.referenced_groups, 'id'),
+                EnvFileWriter._get_object_files(os.path.join(output_dir, "referenced_roles"),
+                                                env_def.referenced_roles, 'id'))
+            EnvFileWriter._write_json_files(files, context.get_io_workers(), created_dirs)
         except OSError as e:
             raise Exception("Error writing file. OS Error: " + e.strerror)
 
+    # Writes (filepath, object) pairs with a pool of io_workers threads. Each directory is created once by the calling
+    # thread. The number of pending files is bounded, so lazily loaded sections are not materialized.
     @staticmethod
-    def _write_container_json_file(root_dir, container):
-        filepath = os.path.join(root_dir, container['name'],
-                                EnvFileWriter.CONTAINER_SELF_FILENAME).encode(encoding='utf-8', errors='strict')
-        f = open(filepath, "w", encoding="utf-8")
-        json.dump(container, f, indent=4, sort_keys=True)
-        f.close()
-
-    @staticmethod
-    def _write_folder_json_file(root_dir, folder):
-        filepath = os.path.join(root_dir, EnvFileWriter._get_fs_path(folder['path']),
-                                EnvFileWriter.CONTAINER_SELF_FILENAME).encode(encoding='utf-8', errors='strict')
-        f = open(filepath, "w", encoding="utf-8")
-        json.dump(folder, f, indent=4, sort_keys=True)
-        f.close()
-
+    def _write_json_files(files, io_workers: int, created_dirs: set) -> None:
+        pending = {}
+        with ThreadPoolExecutor(max_workers=io_workers) as executor:
+            for filepath, obj in files:
+                dir_path = os.path.dirname(filepath)
+                if dir_path not in created_dirs:
+                    os.makedirs(dir_path, exist_ok=True)
+                    created_dirs.add(dir_path)
+                # The last object saved into the same file wins as it would with sequential writes
+                if filepath in pending:
+                    pending.pop(filepath).result()
+                pending[filepath] = executor.submit(EnvFileWriter._write_json_file, filepath, obj)
+                if len(pending) >= io_workers * EnvFileWriter._PENDING_FILES_PER_IO_WORKER:
+                    pending.pop(next(iter(pending))).result()
+            for future in pending.values():
+                future.result()
+
+    # Serializing before writing issues a single write call per file
     @staticmethod
-    def _write_entity_json_file(root_dir, entity, postfix=''):
-        # check if any folder needs to be created
-        path = entity['path']
-        filepath = root_dir
-        for item in path:
-            if not os.path.isdir(filepath.encode(encoding='utf-8', errors='strict')):
-                try:
-                    os.makedirs(filepath.encode(encoding='utf-8', errors='strict'))
-                except OSError as e:
-                    if e.errno != errno.EEXIST:
-                        raise "Cannot create directory: " + filepath
-            # Replace special characters with underscore
-            filepath = os.path.join(filepath, EnvFileWriter._replace_special_characters(item))
-        # write entity into json file
-        filepath = (filepath + postfix + ".json").encode(encoding='utf-8', errors='strict')
-        f = open(filepath, "w", encoding="utf-8")
-        json.dump(entity, f, indent=4, sort_keys=True)
-        f.close()
+    def _write_json_file(filepath, obj) -> None:
+        with open(filepath, "w", encoding="utf-8") as f:
+            f.write(json.dumps(obj, indent=4, sort_keys=True))
 
     @staticmethod
-    def _write_object_json_file(root_dir, obj):
-        filepath = os.path.join(root_dir, obj['id'] + ".json").encode(encoding='utf-8', errors='strict')
-        f = open(filepath, "w", encoding="utf-8")
-        json.dump(obj, f, indent=4, sort_keys=True)
-        f.close()
+    def _get_container_filepath(root_dir, container):
+        return os.path.join(root_dir, EnvFileWriter._replace_special_characters(container['name']),
+                            EnvFileWriter.CONTAINER_SELF_FILENAME).encode(encoding='utf-8', errors='strict')
 
     @staticmethod
-    def _write_vote_json_file(root_dir, obj):
-        filepath = os.path.join(root_dir, obj['datasetId'] + ".json").encode(encoding='utf-8', errors='strict')
-        f = open(filepath, "w", encoding="utf-8")
-        json.dump(obj, f, indent=4, sort_keys=True)
-        f.close()
+    def _get_folder_filepath(root_dir, folder):
+        return os.path.join(root_dir, EnvFileWriter._get_fs_path(folder['path']),
+                            EnvFileWriter.CONTAINER_SELF_FILENAME).encode(encoding='utf-8', errors='strict')
 
     @staticmethod
-    def _write_tag_json_file(root_dir, tags):
-        filepath = os.path.join(root_dir, tags['entity_id'] + ".json").encode(encoding='utf-8', errors='strict')
-        f = open(filepath, "w", encoding="utf-8")
-        json.dump(tags, f, indent=4, sort_keys=True)
-        f.close()
+    def _get_entity_filepath(root_dir, entity, postfix=''):
+        return (os.path.join(root_dir, EnvFileWriter._get_fs_path(entity['path'])) + postfix + ".json").\
+            encode(encoding='utf-8', errors='strict')
 
     @staticmethod
-    def _write_wiki_json_file(root_dir, wiki):
-        filepath = os.path.join(root_dir, wiki['entity_id'] + ".json").encode(encoding='utf-8', errors='strict')
-        f = open(filepath, "w", encoding="utf-8")
-        json.dump(wiki, f, indent=4, sort_keys=True)
-        f.close()
+    def _get_object_files(root_dir, objects, key):
+        for obj in objects:
+            yield os.path.join(root_dir, obj[key] + ".json").encode(encoding='utf-8', errors='strict'), obj
 
     @staticmethod
     def _replace_special_characters(fs_item):
@@ -20,10 +20,12 @@ from typing import Dict, Optional
 from dremio_toolkit.env_api import EnvApi
 from dremio_toolkit.env_definition import EnvDefinition
 from dremio_toolkit.logger import Logger
+from dremio_toolkit.sql_lineage import SqlLineage
 from dremio_toolkit.utils import Utils
 from dremio_toolkit.context import Context
-import time
 import os
+import queue
+import threading
 
 class ContainerType:
 	HOME = "HOME"
@@ -35,8 +37,48 @@ class ContainerType:
 		return [cls.HOME, cls.SPACE, cls.SOURCE]
 
 
+# Per-run cache of users, groups and roles keyed by (principal type, id).
+# Principals that do not exist in Dremio (HTTP 404) are cached as None.
+class PrincipalCache:
+	def __init__(self, env_api: EnvApi):
+		self._env_api = env_api
+		self._principals = {}
+		self._lock = threading.Lock()
+		self._lookups = 0
+		self._hits = 0
+		self._not_found = 0
+
+	# Returns principal definition for principal_type 'user', 'group' or 'role'
+	def get(self, principal_type: str, principal_id: str) -> Optional[Dict]:
+		key = (principal_type, principal_id)
+		with self._lock:
+			self._lookups += 1
+			if key in self._principals:
+				self._hits += 1
+				return self._principals[key]
+		principal = getattr(self._env_api, 'get_' + principal_type)(principal_id)
+		if principal is not None or self._env_api.get_last_status_code() == 404:
+			with self._lock:
+				if principal is None and key not in self._principals:
+					self._not_found += 1
+				self._principals[key] = principal
+		return principal
+
+	def get_hit_ratio(self) -> float:
+		return self._hits / self._lookups if self._lookups > 0 else 0.0
+
+	def get_summary(self) -> str:
+		return 'Principal cache: ' + str(self._lookups) + ' lookups, ' + str(self._hits) + ' hits (' + \
+			str(round(self.get_hit_ratio() * 100, 1)) + '% hit ratio), ' + str(self._not_found) + ' principals not found.'
+
+
 class EnvReader:
-	def __init__(self, context: Context):
+	# Sources of VDS parents: catalog graph endpoint per VDS or VDS SQL resolved against views and tables read in bulk
+	LINEAGE_SOURCE_GRAPH = 'GRAPH'
+	LINEAGE_SOURCE_SQL = 'SQL'
+
+	def __init__(self, context: Context, concurrency: int = 1, lineage_source: str = LINEAGE_SOURCE_GRAPH,
+				 baseline: EnvDefinition = None):
 		self._env_def = EnvDefinition()
 		self._context = context
 		self._env_api = context.get_source_env_api()
@@ -45,9 +87,24 @@ class EnvReader:
 		# Current top-level hierarchy context: Home, Space, Source
 		self._top_level_hierarchy_context: Optional[str] = None
 		self._failed_vds_graphs = []
+		# Number of workers traversing catalog hierarchies concurrently
+		self._concurrency = concurrency
+		# API responses collected by concurrent traversal, keyed by (API call, id)
+		self._prefetched = {}
+		self._principal_cache = PrincipalCache(self._env_api)
+		self._lineage_source = lineage_source
+		# SqlLineage if lineage is derived from VDS SQL
+		self._sql_lineage = None
+		self._sql_lineage_count = 0
+		self._graph_lineage_count = 0
+		# Previous snapshot of the environment. VDS with the same tag (version) in catalog listings are carried over.
+		self._baseline = baseline
+		self._carried_over_vds_count = 0
 
 	# Read all objects from the source Dremio environment and return as EnvDefinition
 	def read_dremio_environment(self, spaces: str = None, suppress_dependencies: bool = True) -> EnvDefinition:
+		if self._lineage_source == self.LINEAGE_SOURCE_SQL:
+			self._load_sql_lineage()
 		self._read_catalogs(spaces)
 		self._read_reflections()
 		self._read_rules()
@@ -56,16 +113,31 @@ class EnvReader:
 		# If not a full snapshot, make sure to collect VDS dependencies
 		if spaces is not None and not suppress_dependencies:
 			self._collect_vds_dependencies()
+		self._logger.add_summary(self._principal_cache.get_summary())
+		if self._baseline is not None:
+			self._logger.add_summary('Incremental snapshot: ' + str(self._carried_over_vds_count) +
+									 ' VDS carried over from baseline, ' +
+									 str(len(self._env_def.vds_list) - self._carried_over_vds_count) +
+									 ' VDS read from catalog.')
+		if self._sql_lineage is not None:
+			self._logger.add_summary('VDS lineage: ' + str(self._sql_lineage_count) + ' VDS resolved from SQL, ' +
+									 str(self._graph_lineage_count) + ' VDS read from catalog graph.')
 		return self._env_def
 
+	def _load_sql_lineage(self) -> None:
+		self._logger.new_process_status(1, 'Reading views and tables for VDS lineage. ')
+		sql_lineage = SqlLineage(self._env_api, self._context.get_sql_comment_uuid())
+		if sql_lineage.load():
+			self._sql_lineage = sql_lineage
+		else:
+			self._logger.warn('Unable to read views and tables for VDS lineage, catalog graph will be used instead. '
+							  'SQL lineage requires Dremio R' + str(SqlLineage.MIN_DREMIO_VERSION) + ' or higher.')
+		self._logger.print_process_status(increment=1)
+
 	def _collect_vds_dependencies(self):
 		for graph in self._env_def.vds_parents:
 			for parent_path in graph['parents']:
-				parent_found = False
-				for vds in self._env_def.vds_list:
-					if parent_path == Utils.get_str_path(vds['path']):
-						parent_found = True
-				if not parent_found:
+				if self._env_def.vds_list.find('path', parent_path) is None:
 					# Collect parent
 					parent_entity = self._env_api.get_catalog_by_path(parent_path)
 					# Ignore PDS
@@ -99,16 +171,10 @@ class EnvReader:
 			  "WHERE POSITION('@' IN PATH)=2 "
 		jobid = self._env_api.submit_sql(sql)
 		# Wait for the job to complete. Should only take a moment
-		while True:
-			job_info = self._env_api.get_job_info(jobid)
-			if job_info is None or job_info["jobState"] in ['CANCELED', 'FAILED']:
-				self._logger.fatal("Unexpected error. Cannot get a list of SYS.VIEWS.")
-			if job_info["jobState"] == 'COMPLETED':
-				break
-			time.sleep(1)
-		# Retrieve list of TABLES
-		job_result = self._env_api.get_job_result(jobid)
-		num_rows = int(job_result['rowCount'])
+		job_info = self._env_api.wait_for_job(jobid)
+		if job_info is None or job_info["jobState"] != 'COMPLETED':
+			self._logger.fatal("Unexpected error. Cannot get a list of SYS.VIEWS.")
+		num_rows = int(job_info['rowCount'])
 		if num_rows == 0:
 			return
 		# Prep report file
@@ -117,15 +183,13 @@ class EnvReader:
 		with open(report_file, "w", encoding="utf-8") as f:
 			f.write("ERROR" + delimiter + "OBJECT TYPE" + delimiter + "OWNER_USER_NAME" + delimiter + "VIEW_NAME" +
 					delimiter + "PATH" + delimiter + "NOTES\n")
-			# Page through the results, 100 rows per page
-			limit = 100
-			for i in range(0, int(num_rows / limit) + 1):
-				job_result = self._env_api.get_job_result(jobid, limit * i, limit)
-				if job_result is not None:
-					for row in job_result['rows']:
-						f.write('No permission for private user VDS' + delimiter + 'VDS' + delimiter +
-								row['OWNER_USER_NAME'] + delimiter + row['VIEW_NAME'] + delimiter +
-								row['PATH'] + delimiter + 'SQL_CONTEXT:' + row['SQL_CONTEXT'] + '\n')
+			try:
+				for row in self._env_api.iter_job_result(jobid, num_rows):
+					f.write('No permission for private user VDS' + delimiter + 'VDS' + delimiter +
+							row['OWNER_USER_NAME'] + delimiter + row['VIEW_NAME'] + delimiter +
+							row['PATH'] + delimiter + 'SQL_CONTEXT:' + row['SQL_CONTEXT'] + '\n')
+			except RuntimeError:
+				self._logger.error("Exception Report is incomplete: private user VDS could not be listed.")
 			# Report on failed VDS Graph
 			for vds in self._failed_vds_graphs:
 				f.write('Unable to retrieve Graph' + delimiter + 'VDS' + delimiter + '' + delimiter + '' +
@@ -136,6 +200,10 @@ class EnvReader:
 	# and save objects into self._env_api_def
 	def _read_catalogs(self, spaces: str) -> None:
 		containers = self._env_api.list_catalogs()['data']
+		if self._concurrency > 1:
+			self._prefetch_catalogs([container for container in containers
+									 if container['containerType'] in [ContainerType.SPACE, ContainerType.SOURCE] and
+									 (spaces is None or spaces == [] or container['path'][0] in spaces)])
 		self._logger.new_process_status(len(containers), 'Reading Catalogs. ')
 		for container in containers:
 			container_type = container['containerType']
@@ -189,7 +257,9 @@ class EnvReader:
 		self._logger.debug("Processing DATASET: ", catalog=dataset_container)
 		dataset_entity = self._get_referenced_entity(dataset_container)
 		if dataset_entity is not None:
-			if dataset_container['datasetType'] == "PROMOTED" or dataset_container['datasetType'] == "DIRECT":
+			if self._get_baseline_vds(dataset_entity) is not None:
+				self._carry_over_virtual_dataset(dataset_entity)
+			elif dataset_container['datasetType'] == "PROMOTED" or dataset_container['datasetType'] == "DIRECT":
 				self._logger.info(
 					"Unexpected DATASET type: " + dataset_container['datasetType'] + " : ", catalog=dataset_container)
 			elif dataset_container['datasetType'] == "VIRTUAL":
@@ -207,6 +277,34 @@ class EnvReader:
 		self._read_tags(dataset_entity)
 		self._read_vds_graph(dataset_entity)
 
+	# Returns VDS from the baseline snapshot if its tag (version) and path have not changed
+	def _get_baseline_vds(self, dataset_entity) -> Optional[Dict]:
+		if self._baseline is None or 'tag' not in dataset_entity:
+			return None
+		vds = self._baseline.vds_list.find('id', dataset_entity['id'])
+		if vds is None or vds.get('tag') != dataset_entity['tag'] or vds['path'] != dataset_entity.get('path'):
+			return None
+		return vds
+
+	# Collect unchanged VDS with its wiki, tags and parents carried over from the baseline snapshot.
+	# The entity itself is always read since SQL GRANT and ALTER ... OWNER do not change the VDS version.
+	def _carry_over_virtual_dataset(self, vds) -> None:
+		if vds not in self._env_def.vds_list:
+			self._env_def.vds_list.append(vds)
+		self._read_entity_acl(vds)
+		wiki = self._baseline.wikis.find('entity_id', vds['id'])
+		if wiki is not None and wiki not in self._env_def.wikis:
+			self._env_def.wikis.append(wiki)
+		tags = self._baseline.tags.find('entity_id', vds['id'])
+		if tags is not None and tags not in self._env_def.tags:
+			self._env_def.tags.append(tags)
+		vds_parents = self._baseline.vds_parents.find('id', vds['id'])
+		if vds_parents is not None:
+			self._env_def.vds_parents.append(vds_parents)
+		else:
+			self._read_vds_graph(vds)
+		self._carried_over_vds_count += 1
+
 # Read Home/Space/Folder container and traverse through its children hierarchy.
 	def _read_space_or_folder_children(self, space) -> None:
 		self._logger.debug("Processing children for HOME/SPACE/FOLDER: ", catalog=space)
@@ -243,7 +341,7 @@ class EnvReader:
 	# Read All Tags for a given catalog.
 	def _read_tags(self, entity) -> None:
 		self._logger.debug("Reading tags for catalog ", catalog=entity)
-		tags = self._env_api.get_catalog_tags(entity['id'])
+		tags = self._fetch('tags', entity['id'], lambda: self._env_api.get_catalog_tags(entity['id']))
 		if tags is not None:
 			tags['entity_id'] = entity['id']
 			if entity['entityType'] == 'space' or entity['entityType'] == 'source':
@@ -256,7 +354,7 @@ class EnvReader:
 	# Read Wiki for a given catalog.
 	def _read_wiki(self, entity) -> None:
 		self._logger.debug("Reading wiki for catalog ", catalog=entity)
-		wiki = self._env_api.get_catalog_wiki(entity['id'])
+		wiki = self._fetch('wiki', entity['id'], lambda: self._env_api.get_catalog_wiki(entity['id']))
 		if wiki is not None:
 			wiki["entity_id"] = entity['id']
 			if entity['entityType'] == 'space' or entity['entityType'] == 'source' or entity['entityType'] == 'home':
@@ -281,42 +379,13 @@ class EnvReader:
 
 	# Reads Users, Groups, and Roles from entity AccessControlLost
 	def _read_entity_acl(self, entity) -> None:
-		# Read Owner
-		if 'owner' in entity:
-			owner_id = entity['owner']['ownerId']
-			owner_type = entity['owner']['ownerType']
-			if owner_type == 'USER':
-				user_entity = self._env_api.get_user(owner_id)
-				if user_entity is not None and user_entity not in self._env_def.referenced_users:
-					self._env_def.referenced_users.append(user_entity)
-			elif owner_type == 'GROUP':
-				group_entity = self._env_api.get_group(owner_id)
-				if group_entity is not None and group_entity not in self._env_def.referenced_groups:
-					self._env_def.referenced_groups.append(group_entity)
-			elif owner_type == 'ROLE':
-				role_entity = self._env_api.get_role(owner_id)
-				if role_entity is not None and role_entity not in self._env_def.referenced_roles:
-					self._env_def.referenced_roles.append(role_entity)
-			else:
-				self._logger.error("Unexpected OwnerType '" + owner_type + "' for entity ", catalog=entity)
-		# Read AccessControlList
-		if 'accessControlList' in entity:
-			acl = entity['accessControlList']
-			if 'users' in acl:
-				for user in acl['users']:
-					user_entity = self._env_api.get_user(user['id'])
-					if user_entity is not None and user_entity not in self._env_def.referenced_users:
-						self._env_def.referenced_users.append(user_entity)
-			if 'groups' in acl:
-				for group in acl['groups']:
-					group_entity = self._env_api.get_group(group['id'])
-					if group_entity is not None and group_entity not in self._env_def.referenced_groups:
-						self._env_def.referenced_groups.append(group_entity)
-			if 'roles' in acl:
-				for role in acl['roles']:
-					role_entity = self._env_api.get_role(role['id'])
-					if role_entity is not None and role_entity not in self._env_def.referenced_roles:
-						self._env_def.referenced_roles.append(role_entity)
+		if 'owner' in entity and entity['owner']['ownerType'] not in ['USER', 'GROUP', 'ROLE']:
+			self._logger.error("Unexpected OwnerType '" + entity['owner']['ownerType'] + "' for entity ", catalog=entity)
+		for principal_type, principal_id in self._get_acl_principals(entity):
+			principal = self._principal_cache.get(principal_type, principal_id)
+			referenced_principals = getattr(self._env_def, 'referenced_' + principal_type + 's')
+			if principal is not None and referenced_principals.find('id', principal['id']) is None:
+				referenced_principals.append(principal)
 
 	# Helper method, used by many read* methods
 	def _get_referenced_entity(self, ref) -> Optional[Dict]:
@@ -326,10 +395,17 @@ class EnvReader:
 			return None
 		else:
 			path = ref['path'] if 'path' in ref else None
-			return self._env_api.get_catalog(ref['id'], catalog_name=path)
+			return self._fetch('catalog', ref['id'], lambda: self._env_api.get_catalog(ref['id'], catalog_name=path))
 
 	def _read_vds_graph(self, vds):
-		graph = self._env_api.get_catalog_graph(vds['id'], vds['path'])
+		if self._sql_lineage is not None:
+			parents = self._fetch('parents', vds['id'], lambda: self._sql_lineage.get_parents(vds))
+			if parents is not None:
+				self._sql_lineage_count += 1
+				self._env_def.vds_parents.append({'id': vds['id'], 'path': vds['path'], 'parents': parents})
+				return
+			self._graph_lineage_count += 1
+		graph = self._fetch('graph', vds['id'], lambda: self._env_api.get_catalog_graph(vds['id'], vds['path']))
 		if graph is not None:
 			vds_parent_list = []
 			for parent in graph['parents']:
@@ -338,3 +414,93 @@ class EnvReader:
 			self._env_def.vds_parents.append(vds_parent_json)
 		else:
 			self._failed_vds_graphs.append(vds)
+
+	# Traverse catalog hierarchies with a work-queue of catalog references processed by concurrent workers.
+	# API responses are kept in self._prefetched so that the serial traversal that follows produces
+	# the same, deterministic EnvDefinition ordering without waiting on API round-trips.
+	def _prefetch_catalogs(self, containers: list) -> None:
+		self._logger.debug("Traversing " + str(len(containers)) + " catalogs with " + str(self._concurrency) +
+						   " concurrent workers.")
+		work_queue = queue.Queue()
+		for container in containers:
+			work_queue.put(container)
+		workers = []
+		for i in range(self._concurrency):
+			worker = threading.Thread(target=self._prefetch_worker, args=(work_queue,), daemon=True)
+			worker.start()
+			workers.append(worker)
+		work_queue.join()
+		for worker in workers:
+			work_queue.put(None)
+		for worker in workers:
+			worker.join()
+
+	def _prefetch_worker(self, work_queue: queue.Queue) -> None:
+		while True:
+			ref = work_queue.get()
+			if ref is None:
+				work_queue.task_done()
+				return
+			try:
+				self._prefetch_entity(ref, work_queue)
+			except Exception as e:
+				# Serial traversal will retry the API calls that have not been prefetched
+				self._logger.warn("Unable to prefetch catalog: " + str(e), catalog=ref)
+			finally:
+				work_queue.task_done()
+
+	# Collect entity, its ACL principals and the wiki, tags and parents the serial traversal reads for it,
+	# and queue children for further processing
+	def _prefetch_entity(self, ref: dict, work_queue: queue.Queue) -> None:
+		if 'id' not in ref:
+			return
+		path = ref['path'] if 'path' in ref else None
+		entity = self._env_api.get_catalog(ref['id'], catalog_name=path)
+		self._prefetched[('catalog', ref['id'])] = entity
+		if entity is None or 'entityType' not in entity:
+			return
+		if entity['entityType'] == 'dataset' and not Utils.is_vds(entity):
+			return
+		for principal_type, principal_id in self._get_acl_principals(entity):
+			self._principal_cache.get(principal_type, principal_id)
+		if entity['entityType'] in ['space', 'source', 'folder']:
+			self._prefetched[('wiki', entity['id'])] = self._env_api.get_catalog_wiki(entity['id'])
+		if entity['entityType'] == 'dataset':
+			# Wiki, tags and parents of unchanged VDS are carried over from the baseline
+			baseline_vds = self._get_baseline_vds(entity)
+			if baseline_vds is None:
+				self._prefetched[('wiki', entity['id'])] = self._env_api.get_catalog_wiki(entity['id'])
+				self._prefetched[('tags', entity['id'])] = self._env_api.get_catalog_tags(entity['id'])
+			if baseline_vds is None or self._baseline.vds_parents.find('id', entity['id']) is None:
+				self._prefetch_vds_parents(entity)
+		elif entity['entityType'] in ['space', 'folder'] and 'children' in entity:
+			for child in entity['children']:
+				if child['type'] == 'DATASET' or child.get('containerType') == 'FOLDER':
+					work_queue.put(child)
+
+	# Parents derived from SQL are kept as well, the graph is only read for VDS they cannot be derived for
+	def _prefetch_vds_parents(self, vds: dict) -> None:
+		if self._sql_lineage is not None:
+			parents = self._sql_lineage.get_parents(vds)
+			self._prefetched[('parents', vds['id'])] = parents
+			if parents is not None:
+				return
+		self._prefetched[('graph', vds['id'])] = self._env_api.get_catalog_graph(vds['id'], vds['path'])
+
+	# Returns (principal type, principal id) for the owner and every ACL entry of the entity
+	@staticmethod
+	def _get_acl_principals(entity: dict) -> list:
+		principals = []
+		if 'owner' in entity and entity['owner']['ownerType'] in ['USER', 'GROUP', 'ROLE']:
+			principals.append((entity['owner']['ownerType'].lower(), entity['owner']['ownerId']))
+		if 'accessControlList' in entity:
+			for principal_type in ['users', 'groups', 'roles']:
+				for principal in entity['accessControlList'].get(principal_type, []):
+					principals.append((principal_type[:-1], principal['id']))
+		return principals
+
+	# Returns API response collected by the concurrent traversal or calls API if it has not been prefetched
+	def _fetch(self, call: str, key: str, api_call):
+		if (call, key) in self._prefetched:
+			return self._prefetched.pop((call, key))
+		return api_call()
@@ -17,10 +17,12 @@
 #########################################################################
 import json
 import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dremio_toolkit.logger import Logger
 from dremio_toolkit.utils import Utils
 from dremio_toolkit.env_api import EnvApi
-from dremio_toolkit.env_definition import EnvDefinition
+from dremio_toolkit.env_definition import EnvDefinition, IndexedList
 from dremio_toolkit.context import Context
 
 
@@ -28,9 +30,6 @@ from dremio_toolkit.context import Context
 # This class uses EnvDefinition input object to update Dremio environment.
 ###
 class EnvWriter:
-    # Configuration
-    _MAX_VDS_HIERARCHY_DEPTH = 10
-
     _logger = None
     _env_api = None
     _env_def = None
@@ -43,6 +42,8 @@ class EnvWriter:
 
     # Lists used during VDS ordering
     _vds_hierarchy = []
+    _unordered_vds = []
+    _vds_cycles = []
     _referenced_pds = []
 
     # Lists of failed objects
@@ -56,11 +57,28 @@ class EnvWriter:
     # Last errors
     _last_entity_error = {}
 
-    def __init__(self, context: Context, env_def: EnvDefinition):
+    def __init__(self, context: Context, env_def: EnvDefinition, concurrency: int = 1):
         self._context = context
+        # Number of VDSs of the same hierarchy level pushed concurrently
+        self._concurrency = concurrency
         self._env_api = context.get_target_env_api()
         self._env_def = env_def
         self._logger = context.get_logger()
+        self._existing_dremio_users = IndexedList(keys=['name'])
+        self._existing_dremio_groups = IndexedList(keys=['name'])
+        self._existing_dremio_roles = IndexedList(keys=['name'])
+        self._existing_reflections = IndexedList(keys=['name'])
+        self._vds_hierarchy = []
+        self._unordered_vds = []
+        self._vds_cycles = []
+        self._referenced_pds = []
+        self._failed_sources = []
+        self._failed_spaces = []
+        self._failed_folders = []
+        self._failed_reflections = []
+        self._failed_wiki = []
+        self._failed_tags = []
+        self._last_entity_error = {}
 
     def write_dremio_environment(self) -> None:
         self._retrieve_referenced_acl_principals()
@@ -85,7 +103,13 @@ class EnvWriter:
             os.remove(report_file)
         with open(report_file, "w", encoding="utf-8") as f:
             report_json = []
-            for vds in self._env_def.vds_list:
+            for vds, dependency_paths in self._vds_cycles:
+                report_json.append({"error": "Circular VDS dependency",
+                                    "info": "Depends on unordered VDS: " + ", ".join(dependency_paths),
+                                    "object_type": "VDS",
+                                    "id": vds['id'] if 'id' in vds else '',
+                                    "name": str(vds['path'])})
+            for vds in self._unordered_vds:
                 report_json.append({"error": "Unable to push",
                                     "info": self._get_entity_error(vds),
                                     "object_type": "VDS",
@@ -155,7 +179,7 @@ class EnvWriter:
     def _read_existing_reflections(self) -> None:
         self._logger.new_process_status(3, 'Retrieving Reflections. ')
         reflections = self._env_api.list_reflections()
-        self._existing_reflections = reflections['data'] if reflections is not None else []
+        self._existing_reflections = IndexedList(reflections['data'] if reflections is not None else [], ['name'])
 
     def _write_sources(self) -> None:
         self._logger.new_process_status(len(self._env_def.sources), 'Pushing Sources. ')
@@ -181,53 +205,54 @@ class EnvWriter:
             if not self._write_entity(folder):
                 self._failed_folders.append(folder)
 
-    # Process vds_list and save ordered list of VDSs into _vds_hierarchy. Recursive method.
-    def _order_vds(self, processing_level=0):
-        # Verify for the Max Hierarchy Depth
-        if processing_level >= 10:
-            self._logger.debug("Reached level depth limit while ordering VDSs. Still left to process:" +
-                               str(self._env_def.vds_list))
-            return
-        self._logger.new_process_status(len(self._env_def.vds_list), 'Ordering VDS Hierarchy Level ' +
-                                        str(processing_level) + '. ')
-        any_vds_leveled = False
-        # Iterate through the remainder VDS in the list
-        # Go with decreasing index so we can remove VDS from the list
-        vds_count = len(self._env_def.vds_list)
-        for vds in reversed(self._env_def.vds_list):
-            self._logger.print_process_status(increment=1)
-            vds_hierarchy_level = processing_level
-            sql_dependency_paths = self._get_vds_dependency_paths(vds)
-            if sql_dependency_paths:
-                for path in sql_dependency_paths:
-                    sql_context = Utils.get_sql_context(vds)
-                    dependency_vds = self._find_vds_by_path(Utils.get_absolute_path(path, sql_context))
-                    if dependency_vds is None:
-                        # Assume it's PDS since json file should have all VDS
-                        Utils.append_unique_list(self._referenced_pds, Utils.get_absolute_path(path, sql_context))
-                        continue
-                    else:
-                        # Dependency was found as VDS
-                        dependency_hierarchy_level = self._find_vds_level_in_hierarchy(dependency_vds['id'])
-                        if dependency_hierarchy_level is None:
-                            # Dependency has not been processed yet, push this VDS to the next processing level
-                            vds_hierarchy_level = None
-                            break
-                        # Find the highest level of hierarchy among dependencies
-                        elif vds_hierarchy_level < dependency_hierarchy_level + 1:
-                            vds_hierarchy_level = dependency_hierarchy_level + 1
-            if vds_hierarchy_level is None:
-                continue
+    # Order vds_list into self._vds_hierarchy as [level, vds] with Kahn's topological sort of the dependency graph.
+    # The level of a VDS is one more than the highest level of VDSs it depends on. VDSs that are part of, or depend on,
+    # a dependency cycle cannot be ordered. They are saved into self._unordered_vds and reported in self._vds_cycles.
+    def _order_vds(self) -> None:
+        vds_list = self._env_def.vds_list
+        # Lazily loaded VDS definitions are kept in memory for the lookups by path
+        if not isinstance(vds_list, IndexedList):
+            vds_list = IndexedList(vds_list, EnvDefinition.INDEXED_KEYS['vds_list'])
+        self._logger.new_process_status(len(vds_list), 'Ordering VDS Hierarchy. ')
+        positions = {id(vds): position for position, vds in enumerate(vds_list)}
+        # Build dependency graph with edges from a VDS to VDSs depending on it
+        dependents = [[] for vds in vds_list]
+        dependencies = [set() for vds in vds_list]
+        for position, vds in enumerate(vds_list):
+            sql_context = Utils.get_sql_context(vds)
+            for path in self._get_vds_dependency_paths(vds) or []:
+                dependency_path = Utils.get_absolute_path(path, sql_context)
+                dependency_vds = vds_list.find('path', dependency_path)
+                if dependency_vds is None:
+                    # Assume it's PDS since json file should have all VDS
+                    Utils.append_unique_list(self._referenced_pds, dependency_path)
+                elif positions[id(dependency_vds)] not in dependencies[position]:
+                    dependencies[position].add(positions[id(dependency_vds)])
+                    dependents[positions[id(dependency_vds)]].append(position)
+        # Assign levels starting with VDSs that do not depend on other VDSs
+        levels = [0 if not dependencies[position] else None for position in range(len(vds_list))]
+        in_degree = [len(dependencies[position]) for position in range(len(vds_list))]
+        ready = deque(position for position in range(len(vds_list)) if in_degree[position] == 0)
+        while ready:
+            position = ready.popleft()
+            for dependent in dependents[position]:
+                if levels[dependent] is None or levels[dependent] < levels[position] + 1:
+                    levels[dependent] = levels[position] + 1
+                in_degree[dependent] -= 1
+                if in_degree[dependent] == 0:
+                    ready.append(dependent)
+        for position, vds in enumerate(vds_list):
+            if in_degree[position] == 0:
+                self._vds_hierarchy.append([levels[position], vds])
             else:
-                self._vds_hierarchy.append([vds_hierarchy_level, vds])
-                self._env_def.vds_list.remove(vds)
-                # Mark this hierarchy level as successful
-                any_vds_leveled = True
-        # Are we done yet with recursion
-        if not any_vds_leveled or len(self._env_def.vds_list) == 0:
-            return
-        # Process the next Hierarchy Level recursively
-        self._order_vds(processing_level + 1)
+                self._unordered_vds.append(vds)
+                self._vds_cycles.append((vds, [Utils.get_str_path(vds_list[dependency]['path'])
+                                               for dependency in sorted(dependencies[position])
+                                               if in_degree[dependency] > 0]))
+        self._logger.print_process_status(complete=len(vds_list))
+        if self._unordered_vds:
+            self._logger.error("Unable to order " + str(len(self._unordered_vds)) +
+                               " VDSs due to circular dependencies. See exception report for details.")
 
     def _resolve_referenced_pds(self):
         self._logger.new_process_status(len(self._referenced_pds), 'Resoving/Promoting Referenced PDS. ')
@@ -240,23 +265,29 @@ class EnvWriter:
 
     def _write_vds(self) -> None:
         self._logger.new_process_status(len(self._vds_hierarchy), 'Pushing VDS Hierarchy. ')
-        # First push all VDS that have been ordered into a hierarchy
-        for level in range(0, 10, 1):
-            for vds_hierarchy in reversed(self._vds_hierarchy):
-                if level == vds_hierarchy[0]:
-                    vds = vds_hierarchy[1]
-                    if self._write_entity(vds):
-                        self._vds_hierarchy.remove(vds_hierarchy)
+        # First push all VDS that have been ordered into a hierarchy, level by level
+        vds_levels = {}
+        for vds_hierarchy in self._vds_hierarchy:
+            vds_levels.setdefault(vds_hierarchy[0], []).append(vds_hierarchy)
+        failed_vds_hierarchy = []
+        with ThreadPoolExecutor(max_workers=self._concurrency) as executor:
+            for level in sorted(vds_levels.keys()):
+                # VDSs of the same level do not depend on each other. All of them are pushed before the next level.
+                statuses = executor.map(self._write_entity, [vds_hierarchy[1] for vds_hierarchy in vds_levels[level]])
+                for vds_hierarchy, status in zip(vds_levels[level], statuses):
+                    if not status:
+                        failed_vds_hierarchy.append(vds_hierarchy)
                     self._logger.print_process_status(increment=1)
+        self._vds_hierarchy = failed_vds_hierarchy
         # Iterate through the rest of VDS until all VDS have been successfully pushed to the target environment or
         # no VDS has been successfully pushed during the last iteration
-        self._logger.new_process_status(len(self._vds_hierarchy), 'Pushing Unordered VDS. ')
-        while self._env_def.vds_list:
+        self._logger.new_process_status(len(self._unordered_vds), 'Pushing Unordered VDS. ')
+        while self._unordered_vds:
             self._logger.print_process_status(increment=1)
             vds_updated = False
-            for vds in reversed(self._env_def.vds_list):
+            for vds in reversed(self._unordered_vds):
                 if self._write_entity(vds):
-                    self._env_def.vds_list.remove(vds)
+                    self._unordered_vds.remove(vds)
                     vds_updated = True
             if not vds_updated:
                 break
@@ -264,8 +295,8 @@ class EnvWriter:
         if self._vds_hierarchy:
             self._logger.error("Unable to push " + str(len(self._vds_hierarchy)) +
                                " VDSs from processed hierarchy. See exception report for details.")
-        if self._env_def.vds_list:
-            self._logger.error("Unable to push " + str(len(self._env_def.vds_list)) +
+        if self._unordered_vds:
+            self._logger.error("Unable to push " + str(len(self._unordered_vds)) +
                                " un-ordered VDSs. See exception report for details.")
 
     def _write_entity(self, entity: dict) -> bool:
@@ -340,11 +371,10 @@ class EnvWriter:
                (reflection.get('distributionFields') == existing_reflection.get('distributionFields'))
 
     def _find_existing_reflection(self, reflection: dict, dataset: dict) -> dict:
-        for existing_reflection in self._existing_reflections:
-            if reflection['name'] == existing_reflection['name']:
-                existing_dataset = self._env_api.get_catalog(existing_reflection['datasetId'])
-                if existing_dataset is not None and existing_dataset['path'] == dataset['path']:
-                    return existing_reflection
+        for existing_reflection in self._existing_reflections.find_all('name', reflection['name']):
+            existing_dataset = self._env_api.get_catalog(existing_reflection['datasetId'])
+            if existing_dataset is not None and existing_dataset['path'] == dataset['path']:
+                return existing_reflection
         return None
 
     # Search for Principals (users, groups, roles) from entity's ACL in the target environment and:
@@ -376,28 +406,16 @@ class EnvWriter:
         entity['accessControlList'] = new_acl
 
     def _match_to_existing_user(self, user_id: str) -> dict:
-        for user in self._env_def.referenced_users:
-            if user['id'] == user_id:
-                for existing_user in self._existing_dremio_users:
-                    if existing_user['name'] == user['name']:
-                        return existing_user
-        return None
+        user = self._env_def.referenced_users.find('id', user_id)
+        return self._existing_dremio_users.find('name', user['name']) if user is not None else None
 
     def _match_to_existing_group(self, group_id: str) -> dict:
-        for group in self._env_def.referenced_groups:
-            if group['id'] == group_id:
-                for existing_group in self._existing_dremio_groups:
-                    if existing_group['name'] == group['name']:
-                        return existing_group
-        return None
+        group = self._env_def.referenced_groups.find('id', group_id)
+        return self._existing_dremio_groups.find('name', group['name']) if group is not None else None
 
     def _match_to_existing_role(self, role_id: str) -> dict:
-        for role in self._env_def.referenced_roles:
-            if role['id'] == role_id:
-                for existing_role in self._existing_dremio_roles:
-                    if existing_role['name'] == role['name']:
-                        return existing_role
-        return None
+        role = self._env_def.referenced_roles.find('id', role_id)
+        return self._existing_dremio_roles.find('name', role['name']) if role is not None else None
 
     def _get_existing_entity(self, entity: dict) -> dict:
         if 'name' in entity:
@@ -465,19 +483,8 @@ class EnvWriter:
                     continue
 
     def _get_vds_dependency_paths(self, vds):
-        for vds_entry in self._env_def.vds_parents:
-            if vds_entry['path'] == vds['path']:
-                return vds_entry['parents']
-
-    def _find_vds_by_path(self, path):
-        # First, try finding in the VDS list from the source file
-        for vds in self._env_def.vds_list:
-            if path == Utils.get_str_path(vds['path']):
-                return vds
-        for vds_hierarchy in self._vds_hierarchy:
-            if path == Utils.get_str_path(vds_hierarchy[1]['path']):
-                return vds_hierarchy[1]
-        return None
+        vds_entry = self._env_def.vds_parents.find('path', vds['path'])
+        return vds_entry['parents'] if vds_entry is not None else None
 
     def _find_pds_by_path(self, path):
         # Try finding in the target environment
@@ -491,12 +498,6 @@ class EnvWriter:
             return self._env_api.promote_pds(entity)
         return None
 
-    def _find_vds_level_in_hierarchy(self, vds_id):
-        for item in self._vds_hierarchy:
-            if item[1]['id'] == vds_id:
-                return item[0]
-        return None
-
     def _save_entity_error(self, entity: dict, error: str):
         key = Utils.get_str_path(entity['path'] if 'path' in entity else entity['name'] if 'name' in entity else None)
         if key:
@@ -34,10 +34,18 @@ def parse_args():
     arg_parser.add_argument("-d", "--dremio-environment-url", help="URL to Dremio environment.", required=True)
     arg_parser.add_argument("-u", "--user", help="User name. User must be a Dremio admin.", required=True)
     arg_parser.add_argument("-p", "--password", help="User password.", required=False)
+    arg_parser.add_argument("-k", "--personal-access-token", help="Dremio personal access token to use instead of "
+                                                                 "the user password.", required=False)
     arg_parser.add_argument("-s", "--sql-filename", help="File name with SQL code.", required=True)
     arg_parser.add_argument("-e", "--fail-on-error", help="Whether to fail a job on the first error. Default is to continue.",
                             required=False, default=False, action='store_true')
     arg_parser.add_argument("-r", "--report-filename", help="File name for the JSON exception' report.", required=False)
+    arg_parser.add_argument("-n", "--metrics-filename", help="File name for Dremio API request metrics. Metrics are "
+                                                            "saved in Prometheus text format if the file name ends "
+                                                            "with .prom, otherwise as JSON.", required=False)
+    arg_parser.add_argument("-b", "--record-filename", help="Record Dremio API requests and responses to a gzip "
+                                                           "compressed archive for offline replay. Credentials are "
+                                                           "not recorded.", required=False)
     arg_parser.add_argument("-l", "--log-level", help="Set Log Level to DEBUG, INFO, WARN, ERROR.",
                             choices=['ERROR', 'WARN', 'INFO', 'DEBUG'], default='WARN')
     arg_parser.add_argument("-v", "--verbose", help="Set Log to verbose to print object definitions instead of object IDs.",
@@ -64,7 +72,8 @@ def exec_sql(ctx: Context, sql_filename, fail_on_error: bool):
             sql = ctx.get_sql_comment_uuid() + sql
             status, jobid, job_info = env_api.execute_sql(sql)
             job_result = env_api.get_job_result(jobid)
-            sql_statuses.append({'sql': sql, 'jobid': jobid, 'job_info': job_info, 'job_result': job_result})
+            sql_statuses.append({'sql': sql, 'jobid': jobid, 'job_info': job_info, 'job_result': job_result,
+                                 'job_polls': env_api.get_job_poll_count(jobid)})
             if not status:  # any error
                 logger.error('Job ' + str(jobid) + ' failed. See execution report ' + str(report_filename) + '.')
                 if fail_on_error:
@@ -77,6 +86,9 @@ def exec_sql(ctx: Context, sql_filename, fail_on_error: bool):
             os.remove(report_filename)
         with open(report_filename, "w", encoding="utf-8") as f:
             json.dump(sql_statuses, f, indent=4, sort_keys=True)
+    env_api.log_run_stats()
+    if ctx.get_metrics_filepath():
+        env_api.write_metrics_file(ctx.get_metrics_filepath())
 
     logger.finish_process_status_reporting()
     if logger.get_error_count() > 0:
@@ -90,8 +102,10 @@ if __name__ == '__main__':
 
     context = Context(Context.CMD_EXEC_SQL)
     context.init_logger(log_level=args.log_level, log_verbose=args.verbose, log_filepath=args.log_filename)
-    context.set_target(env_api=EnvApi(args.dremio_environment_url, args.user, args.password, context))
-    context.set_report(report_filepath=args.report_filename)
+    context.set_target(env_api=EnvApi(args.dremio_environment_url, args.user, args.password, context,
+                                      personal_access_token=args.personal_access_token,
+                                      record_filepath=args.record_filename))
+    context.set_report(report_filepath=args.report_filename, metrics_filepath=args.metrics_filename)
 
     exec_sql(context, args.sql_filename, args.fail_on_error)
 
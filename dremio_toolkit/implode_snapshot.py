@@ -33,6 +33,10 @@ def parse_args():
     )
     arg_parser.add_argument("-i", "--input-path", help="Directory name with snapshot of a Dremio environment.", required=True)
     arg_parser.add_argument("-o", "--output-path", help="Target filename for saving the snapshot as a JSON file.", required=True)
+    arg_parser.add_argument("-j", "--compact-json", help="Save the snapshot as compact JSON without indentation.",
+                            required=False, default=False, action='store_true')
+    arg_parser.add_argument("-w", "--io-workers", help="Number of threads reading and writing snapshot files. "
+                                                       "Default is 8.", required=False, type=int, default=8)
     arg_parser.add_argument("-l", "--log-level", help="Set Log Level to DEBUG, INFO, WARN, ERROR.",
                             choices=['ERROR', 'WARN', 'INFO', 'DEBUG'], default='WARN')
     arg_parser.add_argument("-v", "--verbose", help="Set Log to verbose to print object definitions instead of object IDs.",
@@ -64,6 +68,8 @@ if __name__ == '__main__':
     context = Context(Context.CMD_IMPLODE_SNAPSHOT)
     context.init_logger(log_level=args.log_level, log_verbose=args.verbose, log_filepath=args.log_filename)
     context.set_source(input_mode=Context.PATH_MODE_DIR, input_path=args.input_path)
-    context.set_target(output_mode=Context.PATH_MODE_FILE, output_path=args.output_path)
+    context.set_io_workers(args.io_workers)
+    context.set_target(output_mode=Context.PATH_MODE_FILE, output_path=args.output_path,
+                       compact_json=args.compact_json)
 
     implode_snapshot(context)
@@ -0,0 +1,136 @@
+#########################################################################
+# Copyright (C) 2023 UCE Systems Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Contact dremio@ucesys.com
+#########################################################################
+
+import threading
+import time
+from concurrent.futures import Future
+
+from dremio_toolkit.env_api import PollPolicy
+
+
+class _WatchedJob:
+    def __init__(self, jobid, future: Future, next_poll_time: float, deadline: float):
+        self.jobid = jobid
+        self.future = future
+        self.next_poll_time = next_poll_time
+        self.deadline = deadline
+        self.polls = 0
+
+
+###
+# JobWatcher tracks outstanding Dremio jobs and polls their status from a single thread.
+# Each job is polled as per poll policy, but no more than max_polls_per_tick jobs are polled per tick, so the number of
+# status requests per second is bounded regardless of the number of outstanding jobs.
+# watch() returns a Future resolved with the final job info, or with None if the job info could not be retrieved or
+# the job did not complete before timeout.
+###
+class JobWatcher:
+    DEFAULT_MAX_POLLS_PER_TICK = 16
+    DEFAULT_TICK_INTERVAL = 0.1
+
+    def __init__(self, env_api, poll_policy: PollPolicy = None, max_polls_per_tick: int = DEFAULT_MAX_POLLS_PER_TICK,
+                 tick_interval: float = DEFAULT_TICK_INTERVAL):
+        self._env_api = env_api
+        self._poll_policy = env_api.DEFAULT_POLL_POLICY if poll_policy is None else poll_policy
+        self._max_polls_per_tick = max_polls_per_tick
+        self._tick_interval = tick_interval
+        self._jobs = {}
+        self._condition = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+    def watch(self, jobid, timeout: float = None) -> Future:
+        future = Future()
+        if jobid is None:
+            future.set_result(None)
+            return future
+        if timeout is None:
+            timeout = self._poll_policy.timeout
+        now = time.monotonic()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("JobWatcher has been closed.")
+            self._jobs[jobid] = _WatchedJob(jobid, future, now + self._poll_policy.get_interval(0),
+                                            None if timeout is None else now + timeout)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return future
+
+    # Returns number of jobs that have not completed yet
+    def get_outstanding_job_count(self) -> int:
+        with self._condition:
+            return len(self._jobs)
+
+    # Stops polling. Futures of outstanding jobs are cancelled.
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+        for job in self._jobs.values():
+            job.future.cancel()
+        self._jobs = {}
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._closed and not self._jobs:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                now = time.monotonic()
+                next_poll_time = min(job.next_poll_time for job in self._jobs.values())
+                if next_poll_time > now:
+                    self._condition.wait(next_poll_time - now)
+                    continue
+                # Jobs waiting the longest are polled first
+                due_jobs = sorted((job for job in self._jobs.values() if job.next_poll_time <= now),
+                                  key=lambda job: job.next_poll_time)[:self._max_polls_per_tick]
+            tick_start = time.monotonic()
+            for job in due_jobs:
+                self._poll(job)
+            # Keep the polling rate bounded when many jobs are due
+            time.sleep(max(0.0, self._tick_interval - (time.monotonic() - tick_start)))
+
+    def _poll(self, job: _WatchedJob) -> None:
+        try:
+            job_info = self._env_api.get_job_info(job.jobid)
+        except Exception as e:
+            self._complete(job)
+            job.future.set_exception(e)
+            return
+        job.polls += 1
+        now = time.monotonic()
+        if job_info is None or job_info["jobState"] in ['COMPLETED', 'CANCELED', 'FAILED']:
+            self._complete(job)
+            job.future.set_result(job_info)
+        elif job.deadline is not None and now >= job.deadline:
+            self._complete(job)
+            job.future.set_result(None)
+        else:
+            job.next_poll_time = now + self._poll_policy.get_interval(job.polls)
+            if job.deadline is not None:
+                job.next_poll_time = min(job.next_poll_time, job.deadline)
+
+    def _complete(self, job: _WatchedJob) -> None:
+        with self._condition:
+            self._jobs.pop(job.jobid, None)
+        self._env_api._record_job_polls(job.jobid, job.polls)
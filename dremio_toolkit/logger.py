@@ -17,6 +17,7 @@
 #########################################################################
 
 import logging
+import threading
 from datetime import datetime
 
 from dremio_toolkit.utils import Utils
@@ -25,6 +26,7 @@ from dremio_toolkit.utils import Utils
 class Logger:
     # Configuration
     _LEVELS = {'ERROR': 40, 'WARN': 30, 'WARNING': 30, 'INFO': 20, 'DEBUG': 10}
+    _PROCESS_STATUS_PRINT_INTERVAL = 0.2  # seconds
 
     def __init__(self, context, level=logging.ERROR, verbose=False, log_file: str = None):
         # Status print
@@ -32,8 +34,10 @@ class Logger:
         self._process_last_complete = 0
         self._process_total = 0
         self._process_start_time = None
+        self._process_last_print_time = None
         # Message collections
         self._errors = []
+        self._summary = []
         # Other initialization
         self._context = context
         self._uuid = context.get_uuid()
@@ -44,7 +48,9 @@ class Logger:
         self._error_count = 0
         self._verbose = verbose
         self._process_start_time = datetime.now()
-        self._last_error_message = ''
+        # Last error message is tracked per thread for concurrent processing
+        self._thread_state = threading.local()
+        self._lock = threading.Lock()
         print('Running command ' + self._context.get_command() + '. Run ID: ' + self._uuid)
         if log_file:
             print('Logger will write to file: ' + log_file)
@@ -58,14 +64,15 @@ class Logger:
         raise RuntimeError("Critical message: " + str(message))
 
     def get_last_error_message(self):
-        return self._last_error_message
+        return getattr(self._thread_state, 'last_error_message', '')
 
     def get_all_errors(self):
         return self._errors
 
     def error(self, message: str, catalog: str = None, object_list: list = None) -> None:
-        self._last_error_message = message
-        self._error_count += 1
+        self._thread_state.last_error_message = message
+        with self._lock:
+            self._error_count += 1
         if object_list:
             enriched_message = self._enrich_message(message)
             if self._verbose:
@@ -92,6 +99,7 @@ class Logger:
         self._process_total = total
         self._process_last_complete = 0
         self._process_start_time = datetime.now()
+        self._process_last_print_time = None
         print()
         print(self._process_prefix_text, end='\r')
 
@@ -103,8 +111,15 @@ class Logger:
         elif complete is not None:
             self._process_last_complete = complete
         else: # increment is not None
-            complete = self._process_last_complete + increment
-            self._process_last_complete = complete
+            with self._lock:
+                complete = self._process_last_complete + increment
+                self._process_last_complete = complete
+        # Limit status updates to a few per second, printing is costly for large number of fast increments
+        now = datetime.now()
+        if complete < self._process_total and self._process_last_print_time is not None and \
+                (now - self._process_last_print_time).total_seconds() < Logger._PROCESS_STATUS_PRINT_INTERVAL:
+            return
+        self._process_last_print_time = now
         if complete != 0:
             pct_complete = complete / self._process_total * 100
             ttn = (datetime.now() - self._process_start_time)  // 1000000 * 1000000  # round to seconds
@@ -119,8 +134,15 @@ class Logger:
                       'Processed: ' + str(round(pct_complete)) + '% in ' + str(ttn) +
                       ' with ' + str(self._error_count) + ' errors.', end='\r')
 
+    # Adds a line to the run summary printed at the end of the process
+    def add_summary(self, message: str) -> None:
+        self._summary.append(message)
+        self._root_logger.info(self._enrich_message(message))
+
     def finish_process_status_reporting(self) -> None:
         print()
+        for message in self._summary:
+            print(message)
         if self._error_count > 0:
             print("Process finished with " + str(self._error_count) +
                   " errors. Please review the log file for more information.")
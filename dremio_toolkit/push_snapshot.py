@@ -35,12 +35,27 @@ def parse_args():
     arg_parser.add_argument("-d", "--dremio-environment-url", help="URL to Dremio environment.", required=True)
     arg_parser.add_argument("-u", "--user", help="User name. User must be a Dremio admin.", required=True)
     arg_parser.add_argument("-p", "--password", help="User password.", required=False)
+    arg_parser.add_argument("-k", "--personal-access-token", help="Dremio personal access token to use instead of "
+                                                                 "the user password.", required=False)
     arg_parser.add_argument("-m", "--input-mode", help="FILE, default, will read from a single JSON file, DIR will read "
                                                        "from a directory with individual files for each object.", required=False, choices=['FILE', 'DIR'], default='FILE')
     arg_parser.add_argument("-i", "--input-path", help="Json file name or a directory name with a snapshot of a Dremio environment.", required=True)
+    arg_parser.add_argument("-z", "--lazy-load", help="Read the snapshot file section by section instead of loading it "
+                                                      "into memory at once. Lowers peak memory by the size of the sections not "
+                                                      "being pushed. VDS definitions are still loaded at once to order them. "
+                                                      "Only applies to FILE input mode.",
+                            required=False, default=False, action='store_true')
     arg_parser.add_argument("-y", "--dry-run", help="Whether it's a dry run or changes should be made to the target "
                                                     "Dremio environment.", required=False, default=False, action='store_true')
+    arg_parser.add_argument("-c", "--concurrency", help="Number of VDSs of the same dependency level pushed concurrently. "
+                                                        "Default concurrency is 1.", required=False, type=int, default=1)
     arg_parser.add_argument("-r", "--report-filename", help="CSV file name for the exception' report.", required=False)
+    arg_parser.add_argument("-n", "--metrics-filename", help="File name for Dremio API request metrics. Metrics are "
+                                                            "saved in Prometheus text format if the file name ends "
+                                                            "with .prom, otherwise as JSON.", required=False)
+    arg_parser.add_argument("-b", "--record-filename", help="Record Dremio API requests and responses to a gzip "
+                                                           "compressed archive for offline replay. Credentials are "
+                                                           "not recorded.", required=False)
     arg_parser.add_argument("-e", "--report-delimiter", help="Delimiter to use in the exception report. Default is tab.",
                             required=False, default='\t')
     arg_parser.add_argument("-l", "--log-level", help="Set Log Level to DEBUG, INFO, WARN, ERROR.",
@@ -55,12 +70,15 @@ def parse_args():
     return parsed_args
 
 
-def push_snapshot(ctx, dry_run):
+def push_snapshot(ctx, dry_run, concurrency=1):
     file_reader = EnvFileReader()
     env_def = file_reader.read_dremio_source_environment(ctx)
-    env_writer = EnvWriter(ctx, env_def)
+    env_writer = EnvWriter(ctx, env_def, concurrency)
     env_writer.write_dremio_environment()
     env_writer.write_exception_report()
+    ctx.get_target_env_api().log_run_stats()
+    if ctx.get_metrics_filepath():
+        ctx.get_target_env_api().write_metrics_file(ctx.get_metrics_filepath())
 
     # Return process status to the OS
     ctx.get_logger().finish_process_status_reporting()
@@ -75,7 +93,11 @@ if __name__ == '__main__':
 
     context = Context(Context.CMD_PUSH_SNAPSHOT)
     context.init_logger(log_level=args.log_level, log_verbose=args.verbose, log_filepath=args.log_filename)
-    context.set_source(input_mode=args.input_mode, input_path=args.input_path)
-    context.set_target(env_api=EnvApi(args.dremio_environment_url, args.user, args.password, context, dry_run=args.dry_run))
-    context.set_report(report_filepath=args.report_filename, report_delimiter=args.report_delimiter)
-    push_snapshot(context, bool(args.dry_run))
+    context.set_source(input_mode=args.input_mode, input_path=args.input_path, lazy_load=args.lazy_load)
+    context.set_target(env_api=EnvApi(args.dremio_environment_url, args.user, args.password, context, dry_run=args.dry_run,
+                                      pool_size=EnvApi.get_pool_size(args.concurrency),
+                                      personal_access_token=args.personal_access_token,
+                                      record_filepath=args.record_filename))
+    context.set_report(report_filepath=args.report_filename, report_delimiter=args.report_delimiter,
+                       metrics_filepath=args.metrics_filename)
+    push_snapshot(context, bool(args.dry_run), args.concurrency)
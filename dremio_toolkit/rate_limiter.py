@@ -0,0 +1,142 @@
+#########################################################################
+# Copyright (C) 2023 UCE Systems Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Contact dremio@ucesys.com
+#########################################################################
+
+import threading
+import time
+
+
+###
+# Token bucket limiting the rate of requests. Tokens are reserved in order of arrival, so waiting callers are served
+# fairly and the long-run rate never exceeds the configured rate.
+###
+class TokenBucket:
+    def __init__(self, rate: float, burst: float = None):
+        self._lock = threading.Lock()
+        self._rate = rate
+        self._burst = max(1.0, rate) if burst is None else burst
+        self._tokens = self._burst
+        self._last_refill = time.monotonic()
+
+    def get_rate(self) -> float:
+        return self._rate
+
+    def set_rate(self, rate: float) -> None:
+        with self._lock:
+            self._refill()
+            self._rate = rate
+
+    # Takes a token, waiting for it if needed. Returns seconds waited.
+    def acquire(self) -> float:
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            wait = 0.0 if self._tokens >= 0 else -self._tokens / self._rate
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self._burst, self._tokens + (now - self._last_refill) * self._rate)
+        self._last_refill = now
+
+
+###
+# Budget for a class of requests: optional rate limit and limit of requests in flight.
+# On 429 and 503 responses both the rate and the in-flight limit are halved (at most once per slow_down_interval),
+# and are restored additively with each successful response.
+###
+class RequestBudget:
+    SLOW_DOWN_STATUS_CODES = [429, 503]
+
+    def __init__(self, name: str, rate: float = None, max_in_flight: int = None, min_rate_fraction: float = 0.1,
+                 slow_down_interval: float = 1.0):
+        self._name = name
+        self._rate = rate
+        self._max_in_flight = max_in_flight
+        self._min_rate = None if rate is None else rate * min_rate_fraction
+        self._slow_down_interval = slow_down_interval
+        self._bucket = None if rate is None else TokenBucket(rate)
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        # Current in-flight limit, None if unlimited
+        self._in_flight_limit = None if max_in_flight is None else float(max_in_flight)
+        self._last_slow_down = None
+        self._slow_down_count = 0
+        self._wait_time = 0.0
+
+    def get_name(self) -> str:
+        return self._name
+
+    # Returns True if acquire may wait
+    def is_limited(self) -> bool:
+        with self._condition:
+            return self._bucket is not None or self._in_flight_limit is not None
+
+    def acquire(self) -> None:
+        start_time = time.monotonic()
+        with self._condition:
+            while self._in_flight_limit is not None and self._in_flight >= int(self._in_flight_limit):
+                self._condition.wait()
+            self._in_flight += 1
+        if self._bucket is not None:
+            self._bucket.acquire()
+        wait_time = time.monotonic() - start_time
+        if wait_time > 0.001:
+            with self._condition:
+                self._wait_time += wait_time
+
+    # Releases the request slot. status_code is None if no response has been received.
+    def release(self, status_code: int = None) -> None:
+        with self._condition:
+            self._in_flight -= 1
+            if status_code in self.SLOW_DOWN_STATUS_CODES:
+                self._slow_down()
+            elif status_code is not None:
+                self._recover()
+            self._condition.notify_all()
+
+    def get_stats(self) -> dict:
+        with self._condition:
+            return {'name': self._name, 'slow_downs': self._slow_down_count, 'wait_time': self._wait_time,
+                    'rate': None if self._bucket is None else self._bucket.get_rate(),
+                    'in_flight_limit': None if self._in_flight_limit is None else int(self._in_flight_limit)}
+
+    def _slow_down(self) -> None:
+        now = time.monotonic()
+        # Responses to requests sent before the last slow down do not slow down again
+        if self._last_slow_down is not None and now - self._last_slow_down < self._slow_down_interval:
+            return
+        self._last_slow_down = now
+        self._slow_down_count += 1
+        if self._bucket is not None:
+            self._bucket.set_rate(max(self._min_rate, self._bucket.get_rate() / 2))
+        # Without a configured limit, the limit starts from the number of requests in flight
+        in_flight_limit = self._in_flight + 1 if self._in_flight_limit is None else self._in_flight_limit
+        self._in_flight_limit = max(1.0, in_flight_limit / 2)
+
+    def _recover(self) -> None:
+        if self._bucket is not None and self._bucket.get_rate() < self._rate:
+            self._bucket.set_rate(min(self._rate, self._bucket.get_rate() + self._rate / 100))
+        if self._in_flight_limit is not None:
+            self._in_flight_limit += 1 / self._in_flight_limit
+            if self._max_in_flight is None and self._in_flight_limit > self._in_flight * 2 + 1:
+                # Limit imposed by slow down is no longer constraining
+                self._in_flight_limit = None
+            elif self._max_in_flight is not None:
+                self._in_flight_limit = min(float(self._max_in_flight), self._in_flight_limit)
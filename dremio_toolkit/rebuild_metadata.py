@@ -17,17 +17,15 @@
 #########################################################################
 
 import argparse
-import time
 import os
 import json
+from collections import deque
+from concurrent.futures import wait, FIRST_COMPLETED
 from dremio_toolkit.utils import Utils
 from dremio_toolkit.env_api import EnvApi
 from dremio_toolkit.logger import Logger
-from dremio_toolkit.rebuild_metadata_thread import RebuildMetadataThread
+from dremio_toolkit.rebuild_metadata_task import RebuildMetadataTask
 from dremio_toolkit.context import Context
-import threading
-
-MAX_ROWS_PER_PAGE = 100
 
 def parse_args():
     # Process arguments
@@ -38,10 +36,25 @@ def parse_args():
     arg_parser.add_argument("-d", "--dremio-environment-url", help="URL to Dremio environment.", required=True)
     arg_parser.add_argument("-u", "--user", help="User name. User must be a Dremio admin.", required=True)
     arg_parser.add_argument("-p", "--password", help="User password.", required=False)
+    arg_parser.add_argument("-k", "--personal-access-token", help="Dremio personal access token to use instead of "
+                                                                 "the user password.", required=False)
     arg_parser.add_argument("-s", "--datasource", help="Limits the scope of the metadata refresh to physical datasets in a specified datasource. If not specified, metadata for all physical datasets in all datasources will be refreshed.", required=False)
     arg_parser.add_argument("-c", "--concurrency", help="Concurrency for executing metadata refresh. It is not recommended to set it higher than 4 if dremio.iceberg.enabled is not set to True. Default concurrency is 1.", required=False, default=1)
     arg_parser.add_argument("-m", "--refresh-only", help="Whether to refresh metadata only or to forget metadata first and then re-promote the PDS which can be helpful for enabling Iceberg on Dremio.", required=False, default=False, action='store_true')
+    arg_parser.add_argument("-t", "--max-request-rate", help="Max number of Dremio API requests per second, "
+                                                            "excluding SQL submissions. Unlimited by default.",
+                            required=False, type=float)
+    arg_parser.add_argument("-q", "--max-sql-rate", help="Max number of SQL queries submitted per second. "
+                                                        "Unlimited by default.", required=False, type=float)
+    arg_parser.add_argument("-x", "--max-in-flight", help="Max number of concurrent Dremio API requests of each kind. "
+                                                         "Unlimited by default.", required=False, type=int)
     arg_parser.add_argument("-r", "--report-filename", help="CSV file name for the JSON exception' report.", required=False)
+    arg_parser.add_argument("-n", "--metrics-filename", help="File name for Dremio API request metrics. Metrics are "
+                                                            "saved in Prometheus text format if the file name ends "
+                                                            "with .prom, otherwise as JSON.", required=False)
+    arg_parser.add_argument("-b", "--record-filename", help="Record Dremio API requests and responses to a gzip "
+                                                           "compressed archive for offline replay. Credentials are "
+                                                           "not recorded.", required=False)
     arg_parser.add_argument("-l", "--log-level", help="Set Log Level to DEBUG, INFO, WARN, ERROR.",
                             choices=['ERROR', 'WARN', 'INFO', 'DEBUG'], default='WARN')
     arg_parser.add_argument("-v", "--verbose", help="Set Log to verbose to print object definitions instead of object IDs.",
@@ -66,27 +79,32 @@ def rebuild_metadata(ctx: Context, datasource, concurrency, refresh_only: False)
     if len(pds_list) == 0:
         print("\nNo PDS found in the specified scope. Nothing to do.")
     logger.new_process_status(len(pds_list), 'Rebuilding metadata. ')
-    base_threads_count = threading.activeCount()
-    threads = []
-    for pds in reversed(pds_list):
-        # Wait for a thread to become available to not exceed specified concurrency
-        while threading.activeCount() >= base_threads_count + concurrency:
-            time.sleep(3)
-        new_thread = RebuildMetadataThread(ctx, pds, refresh_only)
-        new_thread.start()
-        threads.append(new_thread)
+    # Up to concurrency PDS are processed at a time. Their jobs are polled by a single JobWatcher thread.
+    pending_pds = deque(reversed(pds_list))
+    tasks = []
+    running_jobs = {}
+    while pending_pds or running_jobs:
+        while pending_pds and len(running_jobs) < concurrency:
+            task = RebuildMetadataTask(ctx, pending_pds.popleft(), refresh_only)
+            tasks.append(task)
+            running_jobs[task.start()] = task
+        completed_jobs = wait(running_jobs.keys(), return_when=FIRST_COMPLETED).done
+        for future in completed_jobs:
+            task = running_jobs.pop(future)
+            next_future = task.complete_job_future(future)
+            if next_future is not None:
+                running_jobs[next_future] = task
 
-    # Wait for all threads to finish
     job_statuses = []
-    for thread in threads:
-        if thread.is_alive():
-            thread.join()
-        job_statuses.append({'pds': thread.get_pds_path(),
-                             'forget_job_id': thread.get_forget_job_id(),
-                             'refresh_job_id': thread.get_refresh_job_id(),
-                             'pds_rebuild_status': 'SUCCESS' if thread.get_status() else 'FAILED',
-                             'forget_job_info': thread.get_forget_job_info(),
-                             'refresh_job_info': thread.get_refresh_job_info()})
+    for task in tasks:
+        job_statuses.append({'pds': task.get_pds_path(),
+                             'forget_job_id': task.get_forget_job_id(),
+                             'refresh_job_id': task.get_refresh_job_id(),
+                             'pds_rebuild_status': 'SUCCESS' if task.get_status() else 'FAILED',
+                             'forget_job_info': task.get_forget_job_info(),
+                             'refresh_job_info': task.get_refresh_job_info(),
+                             'forget_job_polls': env_api.get_job_poll_count(task.get_forget_job_id()),
+                             'refresh_job_polls': env_api.get_job_poll_count(task.get_refresh_job_id())})
 
     # Produce execution report
     report_filename = ctx.get_report_filepath()
@@ -95,6 +113,9 @@ def rebuild_metadata(ctx: Context, datasource, concurrency, refresh_only: False)
             os.remove(report_filename)
         with open(report_filename, "w", encoding="utf-8") as f:
             json.dump(job_statuses, f, indent=4, sort_keys=True)
+    env_api.log_run_stats()
+    if ctx.get_metrics_filepath():
+        env_api.write_metrics_file(ctx.get_metrics_filepath())
 
     logger.finish_process_status_reporting()
     if logger.get_error_count() > 0:
@@ -111,16 +132,14 @@ def get_pds_list(ctx: Context, datasource) -> list:
     status, jobid, job_result = env_api.execute_sql(sql)
     if not status:
         return None
-    num_rows = int(job_result['rowCount'])
-    # Page through the results, MAX_ROWS_PER_PAGE rows per page
-    limit = MAX_ROWS_PER_PAGE
     pds_list = []
-    for i in range(int(num_rows / limit) + 1):
-        job_result = env_api.get_job_result(jobid, limit * i, limit)
-        if job_result is not None:
-            for row in job_result['rows']:
-                table_fqn = '"' + row['TABLE_SCHEMA'].replace('.', '"."') + '"."' + row['TABLE_NAME'] + '"'
-                pds_list.append(table_fqn)
+    try:
+        for row in env_api.iter_job_result(jobid, int(job_result['rowCount'])):
+            table_fqn = '"' + row['TABLE_SCHEMA'].replace('.', '"."') + '"."' + row['TABLE_NAME'] + '"'
+            pds_list.append(table_fqn)
+    except RuntimeError:
+        # A partial list would leave PDS out of the rebuild silently
+        return None
     return pds_list
 
 
@@ -131,8 +150,14 @@ if __name__ == '__main__':
 
     context = Context(Context.CMD_REBUILD_METADATA)
     context.init_logger(log_level=args.log_level, log_verbose=args.verbose, log_filepath=args.log_filename)
-    context.set_target(env_api=EnvApi(args.dremio_environment_url, args.user, args.password, context))
-    context.set_report(report_filepath=args.report_filename)
+    request_budgets = EnvApi.get_request_budgets(max_request_rate=args.max_request_rate,
+                                                 max_sql_rate=args.max_sql_rate, max_in_flight=args.max_in_flight)
+    context.set_target(env_api=EnvApi(args.dremio_environment_url, args.user, args.password, context,
+                                      pool_size=EnvApi.get_pool_size(int(args.concurrency)),
+                                      request_budgets=request_budgets,
+                                      personal_access_token=args.personal_access_token,
+                                      record_filepath=args.record_filename))
+    context.set_report(report_filepath=args.report_filename, metrics_filepath=args.metrics_filename)
     refresh_only = args.refresh_only
 
     rebuild_metadata(context, args.datasource, int(args.concurrency), refresh_only)
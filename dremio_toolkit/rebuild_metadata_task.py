@@ -0,0 +1,106 @@
+#########################################################################
+# Copyright (C) 2023 UCE Systems Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Contact dremio@ucesys.com
+#########################################################################
+
+from concurrent.futures import Future
+
+from dremio_toolkit.context import Context
+
+
+###
+# Forgets and refreshes metadata of a PDS. Jobs are submitted by the caller's thread and tracked by the JobWatcher
+# of the target EnvApi, so many PDS can be processed concurrently without a thread per PDS.
+###
+class RebuildMetadataTask:
+
+    def __init__(self, context: Context, pds_path: str, refresh_only: False):
+        self._context = context
+        self._logger = context.get_logger()
+        self._env_api = context.get_target_env_api()
+        self._job_watcher = self._env_api.get_job_watcher()
+        self._pds_path = pds_path
+        self._status = None
+        self._forget_job_id = None
+        self._refresh_job_id = None
+        self._forget_job_info = None
+        self._refresh_job_info = None
+        self._refresh_only = refresh_only
+        self._refreshing = False
+
+    # Submits the first job. Returns Future resolved with its job info.
+    def start(self) -> Future:
+        if self._refresh_only:
+            return self._submit_refresh()
+        self._forget_job_id = self._env_api.submit_sql(self._context.get_sql_comment_uuid() +
+                                                       'ALTER PDS ' + self._pds_path + ' FORGET METADATA')
+        return self._job_watcher.watch(self._forget_job_id)
+
+    # Processes the Future of the job that has completed. Polling errors, e.g. connection errors after retries,
+    # fail this PDS only. Returns Future of the next job or None if the task is done.
+    def complete_job_future(self, future: Future) -> Future:
+        try:
+            job_info = future.result()
+        except Exception as e:
+            self._logger.error('Unable to get job status for PDS: ' + str(self._pds_path) + ' jobid: ' +
+                               str(self._refresh_job_id if self._refreshing else self._forget_job_id) +
+                               ' error: ' + str(e))
+            job_info = None
+        return self.complete_job(job_info)
+
+    # Processes info of the job that has completed. Returns Future of the next job or None if the task is done.
+    def complete_job(self, job_info) -> Future:
+        success = job_info is not None and job_info["jobState"] == 'COMPLETED'
+        if not self._refreshing:
+            self._forget_job_info = job_info
+            if success:
+                return self._submit_refresh()
+            self._logger.error('Unable to ALTER PDS: ' + str(self._pds_path) + ' jobid: ' +
+                               str(self._forget_job_id) + ' jobInfo: ' + str(job_info))
+        else:
+            self._refresh_job_info = job_info
+            if not success:
+                self._logger.error('Unable to ALTER PDS: ' + str(self._pds_path) + ' jobid: ' +
+                                   str(self._refresh_job_id) + ' jobInfo: ' + str(job_info))
+        self._status = success
+        self._logger.print_process_status(increment=1)
+        return None
+
+    def _submit_refresh(self) -> Future:
+        self._refreshing = True
+        self._refresh_job_id = self._env_api.submit_sql(self._context.get_sql_comment_uuid() + 'ALTER PDS ' +
+                                                        self._pds_path + ' REFRESH METADATA AUTO PROMOTION')
+        return self._job_watcher.watch(self._refresh_job_id)
+
+    def get_forget_job_id(self):
+        if self._refresh_only:
+            return 'N/A - refresh only run'
+        return self._forget_job_id
+
+    def get_refresh_job_id(self):
+        return self._refresh_job_id
+
+    def get_pds_path(self):
+        return self._pds_path
+
+    def get_status(self):
+        return self._status
+
+    def get_forget_job_info(self):
+        return self._forget_job_info
+
+    def get_refresh_job_info(self):
+        return self._refresh_job_info
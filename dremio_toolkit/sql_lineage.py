@@ -0,0 +1,242 @@
+#########################################################################
+# Copyright (C) 2023 UCE Systems Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Contact dremio@ucesys.com
+#########################################################################
+
+import re
+from typing import Optional
+
+from dremio_toolkit.utils import Utils
+
+
+###
+# Derives VDS parents from VDS SQL definitions instead of calling catalog/{id}/graph for every VDS.
+# Paths of all views and tables are read in bulk with two queries against SYS."VIEWS" and
+# INFORMATION_SCHEMA."TABLES". Table references are extracted from the FROM and JOIN clauses of the VDS SQL and
+# resolved against the SQL context and then the root, the way Dremio resolves them. Path components are not quoted in
+# the results of the queries, so a '.' or ', ' in a name cannot be told from a separator. Reported paths are indexed
+# as they are and matched against references joined the same way.
+# Extraction is conservative: SQL with constructs that may hide or fake a table reference (CTEs, table functions,
+# parenthesized joins, versioned references) and references that do not resolve to exactly one known dataset make
+# get_parents return None, so the caller can fall back to the graph endpoint.
+###
+class SqlLineage:
+    MIN_DREMIO_VERSION = 21
+    _TOKEN_PATTERN = re.compile(r'(?P<skip>\s+|--[^\n]*|/\*.*?\*/)|(?P<ident>"(?:[^"]|"")*")|'
+                                r'(?P<string>\'(?:[^\']|\'\')*\')|(?P<backtick>`(?:[^`]|``)*`)|'
+                                r'(?P<word>[A-Za-z_][A-Za-z0-9_$]*)|(?P<number>\d+(?:\.\d*)?)|(?P<punct>.)', re.S)
+    # Keywords that end a FROM clause or follow a table reference and therefore cannot be a table alias
+    _CLAUSE_KEYWORDS = {'WHERE', 'GROUP', 'HAVING', 'ORDER', 'LIMIT', 'OFFSET', 'FETCH', 'UNION', 'INTERSECT',
+                        'EXCEPT', 'MINUS', 'WINDOW', 'QUALIFY', 'SELECT'}
+    _JOIN_KEYWORDS = {'JOIN', 'INNER', 'LEFT', 'RIGHT', 'FULL', 'OUTER', 'CROSS', 'NATURAL', 'ON', 'USING'}
+    # Constructs the extraction does not understand
+    _UNSUPPORTED_KEYWORDS = {'WITH', 'LATERAL', 'UNNEST', 'TABLE', 'AT', 'TABLESAMPLE', 'MATCH_RECOGNIZE', 'PIVOT',
+                             'UNPIVOT', 'EXTEND'}
+    # Separators of path components in INFORMATION_SCHEMA."TABLES".TABLE_SCHEMA and SYS."VIEWS".PATH
+    _SCHEMA_SEPARATOR = '.'
+    _VIEW_PATH_SEPARATOR = ', '
+
+    def __init__(self, env_api, sql_comment: str = ''):
+        self._env_api = env_api
+        self._sql_comment = sql_comment
+        # Reported (schema, name) of tables and paths of views keyed by their lower case. A key reported more than
+        # once is ambiguous, e.g. for folder "a.b" and folder "b" in folder "a".
+        self._tables = {}
+        self._views = {}
+
+    # Reads paths of all views and tables. Returns False if Dremio does not support the queries or a query failed.
+    def load(self) -> bool:
+        version = self._env_api.get_dremio_version()
+        if version is None or not version.split('.')[0].isdigit() or \
+                int(version.split('.')[0]) < self.MIN_DREMIO_VERSION:
+            return False
+        views = self._query('SELECT PATH FROM SYS."VIEWS"')
+        tables = self._query('SELECT TABLE_SCHEMA, TABLE_NAME FROM INFORMATION_SCHEMA."TABLES" '
+                             'WHERE TABLE_TYPE <> \'VIEW\'')
+        if views is None or tables is None:
+            return False
+        for row in views:
+            path = row['PATH'].strip()
+            if path.startswith('[') and path.endswith(']'):
+                path = path[1:-1]
+            self._views.setdefault(path.lower(), []).append(path)
+        for row in tables:
+            key = (row['TABLE_SCHEMA'].lower(), row['TABLE_NAME'].lower())
+            self._tables.setdefault(key, []).append((row['TABLE_SCHEMA'], row['TABLE_NAME']))
+        return True
+
+    def get_dataset_count(self) -> int:
+        return sum(len(tables) for tables in self._tables.values()) + sum(len(views) for views in self._views.values())
+
+    # Returns parent paths of the VDS in the format of the graph based lineage or None if they cannot be derived
+    def get_parents(self, vds: dict) -> Optional[list]:
+        references = self.get_table_references(vds.get('sql'))
+        if references is None:
+            return None
+        sql_context = vds.get('sqlContext') or []
+        parents = []
+        for reference in references:
+            parent = self._resolve(reference, sql_context)
+            if parent is None:
+                return None
+            str_path = Utils.get_str_path(parent)
+            if str_path not in parents:
+                parents.append(str_path)
+        return parents
+
+    # Returns table references in the FROM and JOIN clauses as lists of path components, in order of appearance,
+    # or None if the SQL contains a construct that is not understood.
+    @staticmethod
+    def get_table_references(sql: str) -> Optional[list]:
+        if not sql:
+            return None
+        tokens = []
+        for match in SqlLineage._TOKEN_PATTERN.finditer(sql):
+            kind = match.lastgroup
+            if kind == 'skip':
+                continue
+            # Backtick quoting, unterminated quotes and multiple statements are not supported
+            if kind == 'backtick' or (kind == 'punct' and match.group() in ['"', "'", '`', ';']):
+                return None
+            value = match.group()[1:-1].replace('""', '"') if kind == 'ident' else match.group()
+            tokens.append((kind, value))
+        references = []
+        # One item per open parenthesis: True if it encloses a query. FROM in other parentheses belongs to functions
+        # such as EXTRACT(YEAR FROM ...) or TRIM(... FROM ...).
+        parens = []
+        # Depths at which a FROM clause is open, a comma there starts another table reference
+        from_depths = set()
+        i = 0
+        while i < len(tokens):
+            kind, value = tokens[i]
+            keyword = value.upper() if kind == 'word' else None
+            in_query = not parens or parens[-1]
+            if keyword in SqlLineage._UNSUPPORTED_KEYWORDS:
+                return None
+            if kind == 'punct' and value == '(':
+                parens.append(i + 1 < len(tokens) and tokens[i + 1][0] == 'word' and
+                              tokens[i + 1][1].upper() in ['SELECT', 'VALUES'])
+                from_depths.discard(len(parens))
+            elif kind == 'punct' and value == ')':
+                from_depths.discard(len(parens))
+                if not parens:
+                    return None
+                parens.pop()
+            elif keyword in SqlLineage._CLAUSE_KEYWORDS:
+                from_depths.discard(len(parens))
+            elif in_query and (keyword in ['FROM', 'JOIN'] or
+                               (kind == 'punct' and value == ',' and len(parens) in from_depths)):
+                if keyword == 'FROM':
+                    from_depths.add(len(parens))
+                i = SqlLineage._read_table_reference(tokens, i + 1, references)
+                if i is None:
+                    return None
+                continue
+            i += 1
+        return references if not parens else None
+
+    # Reads a table reference with an optional alias starting at token i. Returns index of the next token or None.
+    @staticmethod
+    def _read_table_reference(tokens: list, i: int, references: list) -> Optional[int]:
+        if i >= len(tokens):
+            return None
+        kind, value = tokens[i]
+        if kind == 'punct' and value == '(':
+            # Subquery. Its own FROM clause is read by the caller. Parenthesized joins are not supported.
+            if i + 1 < len(tokens) and tokens[i + 1][0] == 'word' and tokens[i + 1][1].upper() in ['SELECT', 'VALUES']:
+                return i
+            return None
+        path = []
+        while True:
+            kind, value = tokens[i]
+            if kind not in ['ident', 'word'] or (kind == 'word' and value.upper() in SqlLineage._CLAUSE_KEYWORDS):
+                return None
+            path.append(value)
+            i += 1
+            if i < len(tokens) and tokens[i] == ('punct', '.') and i + 1 < len(tokens):
+                i += 1
+                continue
+            break
+        if i < len(tokens) and tokens[i] == ('punct', '('):
+            # Table function
+            return None
+        references.append(path)
+        # Skip alias
+        if i < len(tokens) and tokens[i][0] == 'word' and tokens[i][1].upper() == 'AS':
+            i += 2
+        elif i < len(tokens) and (tokens[i][0] == 'ident' or (
+                tokens[i][0] == 'word' and tokens[i][1].upper() not in SqlLineage._CLAUSE_KEYWORDS and
+                tokens[i][1].upper() not in SqlLineage._JOIN_KEYWORDS and
+                tokens[i][1].upper() not in SqlLineage._UNSUPPORTED_KEYWORDS)):
+            i += 1
+        return i
+
+    # A reference resolves if exactly one of the context relative and the absolute path is a known dataset
+    def _resolve(self, reference: list, sql_context: list) -> Optional[list]:
+        candidates = ([list(sql_context) + reference] if sql_context else []) + [reference]
+        found = []
+        for candidate in candidates:
+            datasets = self._find(candidate)
+            if datasets is None:
+                return None
+            for dataset in datasets:
+                if dataset not in found:
+                    found.append(dataset)
+        return found[0] if len(found) == 1 else None
+
+    # Returns canonical paths of the known datasets at the path or None if the path matches an ambiguous report
+    def _find(self, path: list) -> Optional[list]:
+        tables = self._tables.get((self._SCHEMA_SEPARATOR.join(path[:-1]).lower(), path[-1].lower()), [])
+        views = self._views.get(self._VIEW_PATH_SEPARATOR.join(path).lower(), [])
+        if len(tables) > 1 or len(views) > 1:
+            return None
+        found = []
+        if tables:
+            schema = self._split(tables[0][0], self._SCHEMA_SEPARATOR, path[:-1])
+            if schema is None:
+                return None
+            found.append(schema + [tables[0][1]])
+        if views:
+            view = self._split(views[0], self._VIEW_PATH_SEPARATOR, path)
+            if view is None:
+                return None
+            found.append(view)
+        return found
+
+    # Splits a reported path into components of the same lengths as the components of the matching path
+    @staticmethod
+    def _split(reported: str, separator: str, path: list) -> Optional[list]:
+        components = []
+        start = 0
+        for item in path:
+            components.append(reported[start:start + len(item)])
+            start += len(item) + len(separator)
+        # Lower case of some characters differs in length
+        if separator.join(components).lower() != separator.join(path).lower():
+            return None
+        return components
+
+    # Returns all rows of the query or None if it failed
+    def _query(self, sql: str) -> Optional[list]:
+        status, jobid, job_info = self._env_api.execute_sql(self._sql_comment + sql)
+        if not status:
+            return None
+        num_rows = int(job_info['rowCount'])
+        try:
+            return list(self._env_api.iter_job_result(jobid, num_rows))
+        except RuntimeError:
+            # An incomplete index could resolve references wrongly
+            return None
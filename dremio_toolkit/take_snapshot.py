@@ -19,6 +19,7 @@
 import argparse
 from dremio_toolkit.env_api import EnvApi
 from dremio_toolkit.env_reader import EnvReader
+from dremio_toolkit.env_file_reader import EnvFileReader
 from dremio_toolkit.env_file_writer import EnvFileWriter
 from dremio_toolkit.context import Context
 
@@ -32,6 +33,8 @@ def parse_args():
     arg_parser.add_argument("-d", "--dremio-environment-url", help="URL to Dremio environment.", required=True)
     arg_parser.add_argument("-u", "--user", help="User name. User must be a Dremio admin.", required=True)
     arg_parser.add_argument("-p", "--password", help="User password.", required=False)
+    arg_parser.add_argument("-k", "--personal-access-token", help="Dremio personal access token to use instead of "
+                                                                 "the user password.", required=False)
     arg_parser.add_argument("-a", "--add-space", help="Limits the scope of creating a snapshot to a specified "
                                                           "Dremio Space(s). Repeat this option multiple times to "
                                                           "process multiple spaces", required=False, action='append')
@@ -42,7 +45,38 @@ def parse_args():
                                                         "create a directory with individual files for each object.", required=False,
                                                         choices=['FILE', 'DIR'], default='FILE')
     arg_parser.add_argument("-o", "--output-path", help="Json file name or a directory name to save Dremio environment.", required=True)
+    arg_parser.add_argument("-j", "--compact-json", help="Save the snapshot as compact JSON without indentation. "
+                                                         "Only applies to FILE output mode.",
+                            required=False, default=False, action='store_true')
+    arg_parser.add_argument("-i", "--baseline-path", help="Previous snapshot file or directory of the same Dremio "
+                                                         "environment. For VDS whose tag (version) has not changed, "
+                                                         "wiki, tags and parents are carried over from it instead of "
+                                                         "being read again. VDS ACL and owner are always read. "
+                                                         "Changes to wikis and tags alone do not change the VDS "
+                                                         "version and are not detected.", required=False)
+    arg_parser.add_argument("-c", "--concurrency", help="Number of concurrent workers reading Dremio catalogs. "
+                                                        "Default concurrency is 1.", required=False, type=int, default=1)
+    arg_parser.add_argument("-g", "--lineage-source", help="GRAPH, default, reads VDS parents with a catalog graph "
+                                                           "request per VDS. SQL derives them from VDS SQL resolved "
+                                                           "against views and tables read in bulk, and uses the graph "
+                                                           "only for VDS it cannot resolve. SQL requires Dremio R21 "
+                                                           "or higher.", required=False,
+                            choices=[EnvReader.LINEAGE_SOURCE_GRAPH, EnvReader.LINEAGE_SOURCE_SQL],
+                            default=EnvReader.LINEAGE_SOURCE_GRAPH)
+    arg_parser.add_argument("-t", "--max-request-rate", help="Max number of Dremio API requests per second, "
+                                                            "excluding SQL submissions. Unlimited by default.",
+                            required=False, type=float)
+    arg_parser.add_argument("-q", "--max-sql-rate", help="Max number of SQL queries submitted per second. "
+                                                        "Unlimited by default.", required=False, type=float)
+    arg_parser.add_argument("-x", "--max-in-flight", help="Max number of concurrent Dremio API requests of each kind. "
+                                                         "Unlimited by default.", required=False, type=int)
     arg_parser.add_argument("-r", "--report-filename", help="CSV file name for the exception report.", required=False)
+    arg_parser.add_argument("-n", "--metrics-filename", help="File name for Dremio API request metrics. Metrics are "
+                                                            "saved in Prometheus text format if the file name ends "
+                                                            "with .prom, otherwise as JSON.", required=False)
+    arg_parser.add_argument("-b", "--record-filename", help="Record Dremio API requests and responses to a gzip "
+                                                           "compressed archive for offline replay. Credentials are "
+                                                           "not recorded.", required=False)
     arg_parser.add_argument("-e", "--report-delimiter", help="Delimiter to use in the exception report. Default is tab.", required=False, default='\t')
     arg_parser.add_argument("-l", "--log-level", help="Set Log Level to DEBUG, INFO, WARN, ERROR.",
                             choices=['ERROR', 'WARN', 'INFO', 'DEBUG'], default='WARN')
@@ -56,13 +90,18 @@ def parse_args():
     return parsed_args
 
 
-def create_snapshot(context, spaces, suppress_dependencies):
-    env_reader = EnvReader(context)
+def create_snapshot(context, spaces, suppress_dependencies, concurrency=1,
+                    lineage_source=EnvReader.LINEAGE_SOURCE_GRAPH, baseline_path=None):
+    baseline = EnvFileReader.read_dremio_environment(context, baseline_path) if baseline_path else None
+    env_reader = EnvReader(context, concurrency, lineage_source, baseline)
     env_def = env_reader.read_dremio_environment(spaces, suppress_dependencies)
 
     EnvFileWriter.save_dremio_environment(context, env_def)
 
     env_reader.write_exception_report(context)
+    context.get_source_env_api().log_run_stats()
+    if context.get_metrics_filepath():
+        context.get_source_env_api().write_metrics_file(context.get_metrics_filepath())
 
     context.get_logger().finish_process_status_reporting()
     if context.get_logger().get_error_count() > 0:
@@ -76,8 +115,17 @@ if __name__ == '__main__':
 
     context = Context(Context.CMD_CREATE_SNAPSHOT)
     context.init_logger(log_level=args.log_level, log_verbose=args.verbose, log_filepath=args.log_filename)
-    context.set_source(env_api=EnvApi(args.dremio_environment_url, args.user, args.password, context))
-    context.set_target(output_mode=args.output_mode, output_path=args.output_path)
-    context.set_report(report_filepath=args.report_filename, report_delimiter=args.report_delimiter)
-    create_snapshot(context=context, spaces=args.add_space, suppress_dependencies=args.suppress_dependencies)
+    request_budgets = EnvApi.get_request_budgets(max_request_rate=args.max_request_rate,
+                                                 max_sql_rate=args.max_sql_rate, max_in_flight=args.max_in_flight)
+    context.set_source(env_api=EnvApi(args.dremio_environment_url, args.user, args.password, context,
+                                      pool_size=EnvApi.get_pool_size(args.concurrency),
+                                      request_budgets=request_budgets,
+                                      personal_access_token=args.personal_access_token,
+                                      record_filepath=args.record_filename))
+    context.set_target(output_mode=args.output_mode, output_path=args.output_path, compact_json=args.compact_json)
+    context.set_report(report_filepath=args.report_filename, report_delimiter=args.report_delimiter,
+                       metrics_filepath=args.metrics_filename)
+    create_snapshot(context=context, spaces=args.add_space, suppress_dependencies=args.suppress_dependencies,
+                    concurrency=args.concurrency, lineage_source=args.lineage_source,
+                    baseline_path=args.baseline_path)
 
@@ -0,0 +1,345 @@
+#########################################################################
+# Copyright (C) 2023 UCE Systems Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Contact dremio@ucesys.com
+#########################################################################
+
+import json
+import random
+import re
+import threading
+import time
+import urllib.parse
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from dremio_toolkit.env_definition import EnvDefinition
+
+
+###
+# Local stand-in for a Dremio coordinator serving an EnvDefinition, e.g. one produced by generate_env_definition.
+# Implements the REST API endpoints used by EnvApi: login, catalog by ID and by path, graph, wiki and tags,
+# reflections, users, groups and roles, WLM queues and rules, votes, and SQL jobs. Catalog, wiki, tag and reflection
+# writes are applied to the served environment. SQL jobs return rows for the few queries the toolkit runs.
+# Every request is delayed by latency plus a random jitter. With probability error_rate a request other than login
+# fails with error_status. Random choices are seeded for repeatable runs.
+#
+#   with MockDremioServer(generate_env_definition(num_vds=10000), latency=0.002) as server:
+#       env_api = EnvApi(server.get_endpoint(), 'admin', 'password', context)
+###
+class MockDremioServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+    DREMIO_VERSION = '24.0.0'
+
+    def __init__(self, env_def: EnvDefinition, latency: float = 0.0, latency_jitter: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 503, job_polls: int = 1, port: int = 0, seed: int = 0):
+        super().__init__(('127.0.0.1', port), _MockDremioRequestHandler)
+        self._latency = latency
+        self._latency_jitter = latency_jitter
+        self._error_rate = error_rate
+        self._error_status = error_status
+        self._job_polls = job_polls
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._thread = None
+        self._request_count = 0
+        self._error_count = 0
+        self._admin_users = {}
+        self._jobs = {}
+        self._load(env_def)
+
+    def start(self) -> 'MockDremioServer':
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def get_endpoint(self) -> str:
+        return 'http://127.0.0.1:' + str(self.server_address[1]) + '/'
+
+    def get_request_count(self) -> int:
+        return self._request_count
+
+    def get_error_count(self) -> int:
+        return self._error_count
+
+    # Index the environment by ID and path. Promoted PDSs are taken from children of sources.
+    def _load(self, env_def: EnvDefinition) -> None:
+        self._containers = [dict(container) for container in env_def.containers]
+        self._entities = {}
+        self._paths = {}
+        for entity in list(env_def.sources) + list(env_def.spaces) + list(env_def.folders) + list(env_def.vds_list):
+            self._add_entity(json.loads(json.dumps(entity)))
+        for source in env_def.sources:
+            for child in source.get('children', []):
+                if child.get('type') == 'DATASET':
+                    self._add_entity({'entityType': 'dataset', 'type': 'PHYSICAL_DATASET', 'id': child['id'],
+                                      'path': child['path'], 'tag': str(uuid.uuid4())[:8],
+                                      'format': {'type': 'Parquet'}, 'accessControlList': {}})
+        self._parents = {vds_parents['id']: vds_parents['parents'] for vds_parents in env_def.vds_parents}
+        self._wikis = {wiki['entity_id']: {'text': wiki['text'], 'version': wiki['version']} for wiki in env_def.wikis}
+        self._tags = {tags['entity_id']: {'tags': tags['tags'], 'version': tags['version']} for tags in env_def.tags}
+        self._reflections = {}
+        for reflection in env_def.reflections:
+            reflection = dict(reflection)
+            reflection.pop('path', None)
+            self._reflections[reflection['id']] = reflection
+        self._principals = {}
+        for principal_type in ['user', 'group', 'role']:
+            for principal in getattr(env_def, 'referenced_' + principal_type + 's'):
+                self._principals[(principal_type, principal['id'])] = principal
+                self._principals[(principal_type + '_name', principal['name'])] = principal
+        self._queues = list(env_def.queues)
+        self._rules = list(env_def.rules)
+        self._votes = list(env_def.votes)
+
+    def _add_entity(self, entity: dict) -> None:
+        self._entities[entity['id']] = entity
+        self._paths[tuple(self._get_path(entity))] = entity
+
+    @staticmethod
+    def _get_path(entity: dict) -> list:
+        return entity['path'] if 'path' in entity else [entity['name']]
+
+    # Returns (status, response JSON) for a request
+    def handle_api_request(self, method: str, path: str, authorization: str, body) -> (int, dict):
+        with self._lock:
+            self._request_count += 1
+            delay = self._latency + (self._random.uniform(0, self._latency_jitter) if self._latency_jitter else 0)
+            fail = self._error_rate > 0 and path != 'apiv2/login' and self._random.random() < self._error_rate
+            if fail:
+                self._error_count += 1
+        if delay > 0:
+            time.sleep(delay)
+        if fail:
+            return self._error_status, {'errorMessage': 'Injected error.'}
+        if path == 'apiv2/login':
+            return self._login(body)
+        if authorization is None:
+            return 401, {'errorMessage': 'Authentication required.'}
+        path = path[len('api/v3/'):] if path.startswith('api/v3/') else path
+        with self._lock:
+            if path.startswith('catalog'):
+                return self._catalog(method, path[len('catalog'):].strip('/'), body)
+            if path.startswith('reflection'):
+                return self._reflection(method, path[len('reflection'):].strip('/'), body)
+            if path.startswith('sql') and method == 'POST':
+                return self._submit_sql(body)
+            if path.startswith('job/'):
+                return self._job(path[len('job/'):])
+            for principal_type in ['user', 'group', 'role']:
+                if path.startswith(principal_type + '/by-name/'):
+                    name = urllib.parse.unquote(path[len(principal_type + '/by-name/'):])
+                    return self._found(self._principals.get((principal_type + '_name', name)))
+                if path.startswith(principal_type + '/'):
+                    return self._found(self._principals.get((principal_type, path[len(principal_type + '/'):])))
+            if path.startswith('wlm/queue'):
+                return 200, {'data': self._queues}
+            if path.startswith('wlm/rule'):
+                return 200, {'rules': self._rules}
+            if path.startswith('vote'):
+                return 200, {'data': self._votes}
+        return 404, {'errorMessage': 'Unknown endpoint.'}
+
+    # Any user may log in and is an admin unless defined otherwise in the environment
+    def _login(self, body) -> (int, dict):
+        username = body['userName']
+        with self._lock:
+            if ('user_name', username) not in self._principals:
+                user = {'id': 'user-' + username, 'name': username, 'roles': [{'id': 'admin', 'name': 'ADMIN'}]}
+                self._principals[('user', user['id'])] = user
+                self._principals[('user_name', username)] = user
+        return 200, {'token': str(uuid.uuid4()), 'version': self.DREMIO_VERSION, 'userName': username}
+
+    def _catalog(self, method: str, path: str, body) -> (int, dict):
+        if path == '':
+            if method == 'POST':
+                return self._create_entity(body)
+            return 200, {'data': self._containers}
+        if path.startswith('by-path/'):
+            entity_path = [urllib.parse.unquote(item) for item in path[len('by-path/'):].split('/') if item != '']
+            return self._found(self._paths.get(tuple(entity_path)))
+        parts = path.split('/')
+        entity_id = urllib.parse.unquote(parts[0])
+        entity = self._entities.get(entity_id)
+        if len(parts) == 1:
+            if method == 'GET':
+                return self._found(entity)
+            if method == 'PUT' and entity is not None:
+                body['tag'] = str(uuid.uuid4())[:8]
+                self._add_entity(body)
+                # Listings of the parent show the new version
+                parent = self._paths.get(tuple(self._get_path(body)[:-1]))
+                for child in parent.get('children', []) if parent is not None else []:
+                    if child['id'] == entity_id:
+                        child['tag'] = body['tag']
+                return 200, body
+            if method == 'DELETE' and entity is not None:
+                del self._entities[entity_id]
+                self._paths.pop(tuple(self._get_path(entity)), None)
+                return 204, None
+            if method == 'POST':
+                # Promote PDS
+                return self._found(self._paths.get(tuple(body.get('path', []))))
+            return 404, {'errorMessage': 'Not found.'}
+        if entity is None:
+            return 404, {'errorMessage': 'Not found.'}
+        if parts[1] == 'graph':
+            parents = []
+            for parent_path in self._parents.get(entity_id, []):
+                parent = self._paths.get(tuple(parent_path.split('/')))
+                if parent is not None:
+                    parents.append({'id': parent['id'], 'path': parent['path'], 'type': 'DATASET',
+                                    'datasetType': 'VIRTUAL' if parent['type'] == 'VIRTUAL_DATASET' else 'PROMOTED'})
+            return 200, {'parents': parents, 'children': []}
+        if parts[1] == 'refresh':
+            return 204, None
+        if parts[1] == 'collaboration' and len(parts) == 3:
+            collaboration = self._wikis if parts[2] == 'wiki' else self._tags
+            if method == 'POST':
+                body['version'] = str(uuid.uuid4())[:8]
+                collaboration[entity_id] = body
+            return self._found(collaboration.get(entity_id))
+        return 404, {'errorMessage': 'Not found.'}
+
+    def _create_entity(self, body: dict) -> (int, dict):
+        path = self._get_path(body)
+        if tuple(path) in self._paths:
+            return 409, {'errorMessage': 'Already exists.'}
+        entity = dict(body)
+        entity['id'] = str(uuid.uuid4())
+        entity['tag'] = str(uuid.uuid4())[:8]
+        if entity.get('entityType') == 'dataset':
+            entity['type'] = 'VIRTUAL_DATASET'
+        elif entity.get('entityType') in ['space', 'folder']:
+            entity['children'] = []
+        self._add_entity(entity)
+        parent = self._paths.get(tuple(path[:-1]))
+        if parent is not None and 'children' in parent:
+            child = {'id': entity['id'], 'path': path, 'tag': entity['tag']}
+            if entity.get('entityType') == 'dataset':
+                child.update({'type': 'DATASET', 'datasetType': 'VIRTUAL'})
+            else:
+                child.update({'type': 'CONTAINER', 'containerType': 'FOLDER'})
+            parent['children'].append(child)
+        elif len(path) == 1 and entity.get('entityType') in ['space', 'source']:
+            self._containers.append({'containerType': entity['entityType'].upper(), 'id': entity['id'], 'path': path,
+                                     'tag': entity['tag'], 'type': 'CONTAINER'})
+        return 200, entity
+
+    def _reflection(self, method: str, reflection_id: str, body) -> (int, dict):
+        if reflection_id == '':
+            if method == 'POST':
+                body['id'] = str(uuid.uuid4())
+                self._reflections[body['id']] = body
+                return 200, body
+            return 200, {'data': list(self._reflections.values())}
+        if method == 'PUT' and reflection_id in self._reflections:
+            self._reflections[reflection_id] = body
+            return 200, body
+        return self._found(self._reflections.get(reflection_id))
+
+    def _submit_sql(self, body) -> (int, dict):
+        job_id = str(uuid.uuid4())
+        self._jobs[job_id] = {'sql': body['sql'], 'polls': 0, 'rows': self._execute_sql(body['sql'])}
+        return 200, {'id': job_id}
+
+    # Returns rows for the queries run by the toolkit, other queries return no rows
+    def _execute_sql(self, sql: str) -> list:
+        if re.search(r'from\s+sys\.version', sql, re.IGNORECASE):
+            return [{'version': self.DREMIO_VERSION}]
+        if 'INFORMATION_SCHEMA."TABLES"' in sql:
+            table_types = {'PHYSICAL_DATASET': 'TABLE', 'VIRTUAL_DATASET': 'VIEW'}
+            rows = [{'TABLE_SCHEMA': '.'.join(entity['path'][:-1]), 'TABLE_NAME': entity['path'][-1],
+                     'TABLE_TYPE': table_types[entity['type']]}
+                    for entity in self._entities.values() if entity.get('type') in table_types]
+            if "TABLE_TYPE = 'TABLE'" in sql:
+                rows = [row for row in rows if row['TABLE_TYPE'] == 'TABLE']
+            elif "TABLE_TYPE <> 'VIEW'" in sql:
+                rows = [row for row in rows if row['TABLE_TYPE'] != 'VIEW']
+            return rows
+        if 'SYS."VIEWS"' in sql:
+            rows = [{'VIEW_NAME': entity['path'][-1], 'PATH': '[' + ', '.join(entity['path']) + ']',
+                     'SQL_DEFINITION': entity.get('sql', ''),
+                     'SQL_CONTEXT': '[' + ', '.join(entity.get('sqlContext') or []) + ']', 'OWNER_USER_NAME': 'admin'}
+                    for entity in self._entities.values() if entity.get('type') == 'VIRTUAL_DATASET']
+            # Private VDS in home spaces
+            if "POSITION('@' IN PATH)=2" in sql:
+                rows = [row for row in rows if row['PATH'].startswith('[@')]
+            return rows
+        return []
+
+    def _job(self, path: str) -> (int, dict):
+        job_id = path.split('/')[0].split('?')[0]
+        job = self._jobs.get(job_id)
+        if job is None:
+            return 404, {'errorMessage': 'Job not found.'}
+        if '/results' in path:
+            query = urllib.parse.parse_qs(urllib.parse.urlparse(path).query)
+            offset = int(query.get('offset', ['0'])[0])
+            limit = int(query.get('limit', ['100'])[0])
+            return 200, {'rowCount': len(job['rows']), 'rows': job['rows'][offset:offset + limit]}
+        job['polls'] += 1
+        if job['polls'] < self._job_polls:
+            return 200, {'jobState': 'RUNNING'}
+        return 200, {'jobState': 'COMPLETED', 'rowCount': len(job['rows'])}
+
+    @staticmethod
+    def _found(entity) -> (int, dict):
+        return (404, {'errorMessage': 'Not found.'}) if entity is None else (200, entity)
+
+
+class _MockDremioRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are sent in one segment, otherwise delayed ACKs add ~40ms to keep-alive requests
+    wbufsize = 64 * 1024
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_PUT(self):
+        self._handle('PUT')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+    def _handle(self, method: str) -> None:
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length)) if length > 0 else None
+        status, result = self.server.handle_api_request(method, self.path.lstrip('/'),
+                                                        self.headers.get('Authorization'), body)
+        content = b'' if result is None else json.dumps(result).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
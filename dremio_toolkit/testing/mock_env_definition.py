@@ -16,9 +16,13 @@
 # Contact dremio@ucesys.com
 #########################################################################
 
+import base64
+import random
+import uuid
 from typing import List, Dict, Any
 
 from dremio_toolkit.env_definition import EnvDefinition
+from dremio_toolkit.utils import Utils
 
 
 def mock_env_definition() -> EnvDefinition:
@@ -391,3 +395,139 @@ def mock_env_definition() -> EnvDefinition:
 
     return env_def
 
+
+
+# Generates a synthetic Dremio environment of a given size. The same arguments always produce the same environment.
+# Spaces contain a tree of folders folder_depth levels deep with folders_per_level folders on each level.
+# VDSs are spread over spaces and folders. Each VDS selects from 1 to max_parents parents, which are PDSs or VDSs
+# created before it, so the dependency graph is acyclic. Half of the parents are picked from the first 5% of datasets,
+# which gives a few heavily reused VDSs and a long tail, as in real environments.
+# Ratios are the shares of VDSs with a reflection, wiki, tags and an ACL with a user and a role.
+def generate_env_definition(num_spaces: int = 2, folder_depth: int = 2, folders_per_level: int = 2,
+                            num_vds: int = 100, num_sources: int = 1, num_pds: int = 20, max_parents: int = 3,
+                            num_users: int = 10, num_roles: int = 5, reflection_ratio: float = 0.1,
+                            wiki_ratio: float = 0.2, tag_ratio: float = 0.2, acl_ratio: float = 0.3,
+                            seed: int = 0) -> EnvDefinition:
+    rng = random.Random(seed)
+
+    def new_id() -> str:
+        return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+    def new_tag() -> str:
+        return base64.b64encode(rng.getrandbits(64).to_bytes(8, 'big')).decode('ascii')
+
+    def container_ref(entity: dict, container_type: str) -> dict:
+        return {'containerType': container_type, 'id': entity['id'], 'path': entity['path'], 'tag': entity['tag'],
+                'type': 'CONTAINER'}
+
+    env_def = EnvDefinition()
+    env_def.referenced_users = [{'@type': 'EnterpriseUser', 'active': True, 'email': 'user' + str(i) + '@example.com',
+                                 'firstName': 'User', 'id': new_id(), 'lastName': str(i), 'name': 'user' + str(i),
+                                 'roles': [], 'source': 'local', 'tag': new_tag()} for i in range(num_users)]
+    env_def.referenced_roles = [{'description': '', 'id': new_id(), 'memberCount': 1, 'name': 'role' + str(i),
+                                 'roles': [], 'type': 'INTERNAL'} for i in range(num_roles)]
+    owner = {'ownerId': env_def.referenced_users[0]['id'], 'ownerType': 'USER'} if num_users > 0 else None
+
+    def new_acl() -> dict:
+        if rng.random() >= acl_ratio or num_users == 0 or num_roles == 0:
+            return {}
+        return {'users': [{'id': rng.choice(env_def.referenced_users)['id'], 'permissions': ['SELECT']}],
+                'roles': [{'id': rng.choice(env_def.referenced_roles)['id'], 'permissions': ['SELECT', 'ALTER']}]}
+
+    def add_owner(entity: dict) -> dict:
+        if owner is not None:
+            entity['owner'] = dict(owner)
+        return entity
+
+    # Sources with promoted PDSs
+    pds_list = []
+    containers = []
+    for i in range(num_sources):
+        name = 'Source' + str(i)
+        source = add_owner({'accessControlList': {}, 'children': [], 'config': {'path': '/data/' + name.lower()},
+                            'createdAt': '2023-01-01T00:00:00.000Z', 'entityType': 'source', 'id': new_id(),
+                            'metadataPolicy': {'authTTLMs': 86400000, 'autoPromoteDatasets': True,
+                                               'datasetRefreshAfterMs': 3600000, 'datasetUpdateMode': 'PREFETCH_QUERIED',
+                                               'namesRefreshMs': 3600000},
+                            'name': name, 'path': [name], 'permissions': [], 'tag': new_tag(), 'type': 'NAS'})
+        env_def.sources.append(source)
+        containers.append(container_ref(source, 'SOURCE'))
+    for i in range(num_pds if num_sources > 0 else 0):
+        source = env_def.sources[i % num_sources]
+        pds = {'datasetType': 'PROMOTED', 'id': new_id(), 'path': [source['name'], 'table' + str(i)], 'type': 'DATASET'}
+        source['children'].append(pds)
+        pds_list.append(pds)
+
+    # Spaces with a tree of folders
+    parent_containers = []
+    for i in range(num_spaces):
+        name = 'Space' + str(i)
+        space = add_owner({'accessControlList': new_acl(), 'children': [], 'createdAt': '2023-01-01T00:00:00.000Z',
+                           'entityType': 'space', 'id': new_id(), 'name': name, 'path': [name], 'tag': new_tag()})
+        env_def.spaces.append(space)
+        containers.append(container_ref(space, 'SPACE'))
+        parent_containers.append(space)
+        level = [space]
+        for depth in range(folder_depth):
+            next_level = []
+            for parent in level:
+                for j in range(folders_per_level):
+                    path = parent['path'] + ['folder' + str(depth) + '_' + str(j)]
+                    folder = add_owner({'accessControlList': new_acl(), 'children': [], 'entityType': 'folder',
+                                        'id': new_id(), 'path': path, 'tag': new_tag()})
+                    parent['children'].append(container_ref(folder, 'FOLDER'))
+                    env_def.folders.append(folder)
+                    parent_containers.append(folder)
+                    next_level.append(folder)
+            level = next_level
+    env_def.containers = containers
+
+    # VDSs with a DAG of dependencies on PDSs and earlier VDSs
+    datasets = list(pds_list)
+    for i in range(num_vds if parent_containers else 0):
+        container = parent_containers[i % len(parent_containers)]
+        path = container['path'] + ['vds' + str(i)]
+        parents = []
+        for j in range(rng.randint(1, max_parents) if datasets else 0):
+            if rng.random() < 0.5:
+                parent = datasets[rng.randrange(max(1, len(datasets) // 20))]
+            else:
+                parent = datasets[rng.randrange(len(datasets))]
+            if parent not in parents:
+                parents.append(parent)
+        sql = 'SELECT * FROM ' + ' NATURAL JOIN '.join('"' + '"."'.join(parent['path']) + '"' for parent in parents) \
+            if parents else 'SELECT 1'
+        vds = add_owner({'accessControlList': new_acl(), 'createdAt': '2023-01-01T00:00:00.000Z',
+                         'entityType': 'dataset', 'fields': [{'name': 'col' + str(k), 'type': {'name': 'VARCHAR'}}
+                                                             for k in range(3)],
+                         'id': new_id(), 'path': path, 'sql': sql, 'sqlContext': [container['path'][0]],
+                         'tag': new_tag(), 'type': 'VIRTUAL_DATASET'})
+        container['children'].append({'createdAt': vds['createdAt'], 'datasetType': 'VIRTUAL', 'id': vds['id'],
+                                      'path': path, 'tag': vds['tag'], 'type': 'DATASET'})
+        env_def.vds_list.append(vds)
+        env_def.vds_parents.append({'id': vds['id'], 'path': path,
+                                    'parents': [Utils.get_str_path(parent['path']) for parent in parents]})
+        datasets.append({'id': vds['id'], 'path': path})
+        if rng.random() < reflection_ratio:
+            env_def.reflections.append({'arrowCachingEnabled': False, 'canAlter': True, 'canView': True,
+                                        'datasetId': vds['id'], 'enabled': True, 'entityType': 'reflection',
+                                        'id': new_id(), 'name': 'Raw ' + str(i),
+                                        'partitionDistributionStrategy': 'CONSOLIDATED', 'path': path,
+                                        'displayFields': [{'name': 'col0'}],
+                                        'status': {'availability': 'AVAILABLE', 'combinedStatus': 'CAN_ACCELERATE',
+                                                   'config': 'OK', 'refresh': 'SCHEDULED'},
+                                        'tag': new_tag(), 'type': 'RAW'})
+        if rng.random() < wiki_ratio:
+            env_def.wikis.append({'entity_id': vds['id'], 'path': path, 'text': '# ' + path[-1] + '\n\nGenerated VDS.',
+                                  'version': 0})
+        if rng.random() < tag_ratio:
+            env_def.tags.append({'entity_id': vds['id'], 'path': path, 'tags': ['tag' + str(rng.randrange(10))],
+                                 'version': new_tag()})
+
+    env_def.queues = [{'cpuTier': 'MEDIUM', 'id': new_id(), 'maxAllowedRunningJobs': 10, 'name': 'Default',
+                       'tag': new_tag()}]
+    env_def.rules = []
+    env_def.file_version = "1.1"
+    env_def.endpoint = "http://localhost:9047/"
+    env_def.timestamp_utc = "2023-01-01 00:00:00"
+    return env_def
@@ -0,0 +1,110 @@
+#########################################################################
+# Copyright (C) 2023 UCE Systems Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Contact dremio@ucesys.com
+#########################################################################
+
+import gzip
+import json
+import threading
+import time
+from collections import deque
+
+import requests
+
+from dremio_toolkit.api_recorder import ApiRecorder
+from dremio_toolkit.env_api import EnvApi
+
+
+###
+# HTTP session serving responses from an ApiRecorder archive. Requests are matched by method, URL and normalized
+# body. Repeated requests, e.g. job status polls, get recorded responses in order, the last one is repeated.
+# Latency is None for no delay, RECORDED_LATENCY to sleep for the recorded time, or a number of seconds.
+###
+class ReplaySession:
+    RECORDED_LATENCY = 'recorded'
+    ENDPOINT = 'http://replay/'
+
+    def __init__(self, archive_filepath: str, latency=None):
+        self._lock = threading.Lock()
+        self._latency = latency
+        self._responses = {}
+        self.adapters = {}
+        self.unmatched_requests = []
+        with gzip.open(archive_filepath, 'rt', encoding='utf-8') as f:
+            header = json.loads(f.readline())
+            if header.get('format') != ApiRecorder.FORMAT:
+                raise ValueError("Not a dremio-toolkit API recording: " + archive_filepath)
+            self._username = header['username']
+            for line in f:
+                entry = json.loads(line)
+                key = (entry['method'], entry['url'], entry['body'])
+                self._responses.setdefault(key, deque()).append(entry)
+
+    def get_username(self) -> str:
+        return self._username
+
+    def request(self, method, url, **kwargs):
+        body = kwargs.get('json') if kwargs.get('json') is not None else kwargs.get('data')
+        url = ApiRecorder.get_relative_url(url, self.ENDPOINT)
+        key = (method, url, ApiRecorder.normalize_body(url, body))
+        with self._lock:
+            entries = self._responses.get(key)
+            if entries is None:
+                entry = None
+                self.unmatched_requests.append(key)
+            else:
+                entry = entries.popleft() if len(entries) > 1 else entries[0]
+        if self._latency == self.RECORDED_LATENCY:
+            time.sleep(0 if entry is None else entry['latency'])
+        elif self._latency:
+            time.sleep(self._latency)
+        if entry is not None and 'error' in entry:
+            raise getattr(requests.exceptions, entry['error'], requests.exceptions.RequestException)()
+        response = requests.Response()
+        response.url = self.ENDPOINT + url
+        response.request = requests.PreparedRequest()
+        response.request.body = body if body is None or isinstance(body, (str, bytes)) else json.dumps(body)
+        if entry is None:
+            response.status_code = 404
+            response._content = json.dumps({'errorMessage': 'Request has not been recorded.'}).encode('utf-8')
+        else:
+            response.status_code = entry['status']
+            response._content = entry['response'].encode('utf-8')
+            if 'retry_after' in entry:
+                response.headers['Retry-After'] = entry['retry_after']
+        return response
+
+    def close(self) -> None:
+        pass
+
+
+###
+# EnvApi serving a recorded Dremio environment, see ReplaySession. Everything above the HTTP session works as with
+# a live Dremio: authentication, retries, request budgets and metrics.
+###
+class ReplayEnvApi(EnvApi):
+    def __init__(self, archive_filepath: str, context, latency=None, dry_run=True, **kwargs):
+        self._replay_session = ReplaySession(archive_filepath, latency)
+        super().__init__(ReplaySession.ENDPOINT, self._replay_session.get_username(), ApiRecorder.REDACTED, context,
+                         dry_run=dry_run, **kwargs)
+
+    def _init_session(self, pool_size: int) -> None:
+        super()._init_session(pool_size)
+        self._session = self._replay_session
+
+    # Returns requests that were not found in the archive as (method, URL, body) tuples
+    def get_unmatched_requests(self) -> list:
+        return list(self._replay_session.unmatched_requests)
@@ -0,0 +1,71 @@
+#########################################################################
+# Copyright (C) 2023 UCE Systems Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Contact dremio@ucesys.com
+#########################################################################
+
+import json
+
+from dremio_toolkit.api_metrics import ApiMetrics
+from dremio_toolkit.env_api import RetryPolicy
+from dremio_toolkit.tests.test_env_api import RetryEnvApi
+
+
+def test_get_endpoint_class():
+    assert ApiMetrics.get_endpoint_class('GET', 'http://localhost:9047/api/v3/catalog/') == 'GET catalog'
+    assert ApiMetrics.get_endpoint_class('GET', 'api/v3/catalog/8f2e-11/graph') == 'GET catalog/{id}/graph'
+    assert ApiMetrics.get_endpoint_class('GET', 'api/v3/catalog/8f2e-11/collaboration/wiki') == \
+        'GET catalog/{id}/collaboration/wiki'
+    assert ApiMetrics.get_endpoint_class('GET', 'api/v3/catalog/by-path/s3/bucket/file') == \
+        'GET catalog/by-path/{path}'
+    assert ApiMetrics.get_endpoint_class('GET', 'api/v3/user/by-name/admin') == 'GET user/by-name/{name}'
+    assert ApiMetrics.get_endpoint_class('GET', 'api/v3/job/1a/results?offset=0&limit=500') == \
+        'GET job/{id}/results'
+    assert ApiMetrics.get_endpoint_class('GET', 'api/v3/wlm/queue/') == 'GET wlm/queue'
+    assert ApiMetrics.get_endpoint_class('POST', 'apiv2/login') == 'POST login'
+
+
+def test_api_metrics(tmp_path):
+    api_metrics = ApiMetrics()
+    for i in range(100):
+        api_metrics.record_request('GET catalog/{id}', (i + 1) / 1000, 200, 0, 100)
+    api_metrics.record_request('GET catalog/{id}', 200.0, 503)
+    api_metrics.record_request('GET catalog/{id}', 0.5, error='ReadTimeout')
+    api_metrics.record_retry('GET catalog/{id}')
+    metrics = api_metrics.get_metrics()['GET catalog/{id}']
+    assert metrics['count'] == 102 and metrics['retries'] == 1 and metrics['bytes_received'] == 10000
+    assert metrics['errors'] == {'503': 1, 'ReadTimeout': 1}
+    assert metrics['latency_p50'] == 0.052 and metrics['latency_p99'] == 0.5
+    assert metrics['latency_buckets']['0.005'] == 5 and metrics['latency_buckets']['+Inf'] == 1
+    assert len(api_metrics.get_summary()) == 1
+
+    api_metrics.write_metrics_file(str(tmp_path / 'metrics.json'), 'create_snapshot')
+    with open(str(tmp_path / 'metrics.json')) as f:
+        assert json.load(f)['endpoints']['GET catalog/{id}']['count'] == 102
+    text = api_metrics.get_prometheus_text('create_snapshot')
+    assert 'dremio_toolkit_api_requests_total{command="create_snapshot",endpoint="GET catalog/{id}"} 102' in text
+    assert 'dremio_toolkit_api_request_duration_seconds_bucket{command="create_snapshot",' \
+           'endpoint="GET catalog/{id}",le="+Inf"} 102' in text
+    assert 'dremio_toolkit_api_errors_total{command="create_snapshot",endpoint="GET catalog/{id}",' \
+           'error="503"} 1' in text
+
+
+def test_env_api_metrics():
+    env_api = RetryEnvApi([(503, None), (200, None)], RetryPolicy(initial_backoff=0.001, max_backoff=0.002))
+    env_api._api_metrics = ApiMetrics()
+    assert env_api._http_get('api/v3/catalog/1') == {'id': '1'}
+    metrics = env_api.get_api_metrics().get_metrics()['GET catalog/{id}']
+    assert metrics['count'] == 2 and metrics['retries'] == 1 and metrics['errors'] == {'503': 1}
+    assert metrics['bytes_received'] == 2 * len(b'{"id": "1"}')
@@ -0,0 +1,95 @@
+#########################################################################
+# Copyright (C) 2023 UCE Systems Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Contact dremio@ucesys.com
+#########################################################################
+
+import socket
+
+import pytest
+import requests
+
+from dremio_toolkit.context import Context
+from dremio_toolkit.env_api import EnvApi, RetryPolicy
+from dremio_toolkit.testing.mock_dremio_server import MockDremioServer
+from dremio_toolkit.testing.mock_env_definition import generate_env_definition
+from dremio_toolkit.tests.test_env_api import RetryEnvApi
+
+aiohttp = pytest.importorskip('aiohttp')
+
+
+def test_async_env_api():
+    env_def = generate_env_definition(num_vds=40)
+    context = Context(Context.CMD_CREATE_SNAPSHOT)
+    context.init_logger(log_level='ERROR', log_verbose=False)
+    with MockDremioServer(env_def, error_rate=0.05) as server:
+        env_api = EnvApi(server.get_endpoint(), 'admin', 'password', context, dry_run=False,
+                         retry_policy=RetryPolicy(max_attempts=10, initial_backoff=0.001, max_backoff=0.002))
+        vds_ids = [vds['id'] for vds in env_def.vds_list]
+        results = env_api.gather([('get_catalog', (vds_id,)) for vds_id in vds_ids] + [('get_catalog', ('missing',))])
+        assert [entity['id'] for entity in results[:-1]] == vds_ids and results[-1] is None
+
+        async_api = env_api.get_async_api()
+        status, jobid, job_info = async_api.run(async_api.execute_sql('SELECT * FROM SYS."VIEWS"'))
+        assert status and int(job_info['rowCount']) == len(vds_ids)
+        assert len(async_api.run(async_api.get_job_result(jobid, 0, 500))['rows']) == len(vds_ids)
+        vds = dict(results[0])
+        vds['sql'] = vds['sql'] + ' WHERE 1=1'
+        assert async_api.run(async_api.update_catalog(vds['id'], vds)) is not None
+        assert env_api.get_catalog(vds['id'])['sql'] == vds['sql']
+
+        # Requests, retries and metrics are accounted by EnvApi
+        assert server.get_error_count() > 0 and sum(env_api.get_retry_counts().values()) == server.get_error_count()
+        assert env_api.get_connection_pool_stats()['requests'] == server.get_request_count()
+        assert sum(metrics['count'] for metrics in env_api.get_api_metrics().get_metrics().values()) == \
+            server.get_request_count()
+        env_api.close()
+
+
+def test_async_retry_policy():
+    # Same retries as EnvApi._send, see test_retry_policy
+    retry_policy = RetryPolicy(initial_backoff=0.001, max_backoff=0.002)
+    env_api = RetryEnvApi([(503, None), requests.exceptions.ConnectionError(), (200, None)], retry_policy)
+    async_api = env_api.get_async_api()
+    assert async_api.run(async_api._http_get('api/v3/catalog/1')) == {'id': '1'}
+    assert env_api.get_retry_counts() == {'503': 1, 'ConnectionError': 1}
+    async_api.close()
+
+    env_api = RetryEnvApi([(429, '0'), (503, None), (200, None)], retry_policy)
+    async_api = env_api.get_async_api()
+    assert async_api.run(async_api._http_post('api/v3/catalog/', {})) is None
+    assert env_api.get_retry_counts() == {'429': 1}
+    async_api.close()
+
+
+def test_async_connect_error():
+    # Nothing listens on the port, connection errors are retried and raised as by EnvApi
+    with socket.socket() as listener:
+        listener.bind(('127.0.0.1', 0))
+        port = listener.getsockname()[1]
+    context = Context()
+    context.init_logger(log_level='ERROR', log_verbose=False)
+    env_api = EnvApi('http://127.0.0.1:' + str(port), 'admin', None, context, dry_run=False,
+                     personal_access_token='pat',
+                     retry_policy=RetryPolicy(max_attempts=3, initial_backoff=0.001, max_backoff=0.002))
+    async_api = env_api.get_async_api()
+    try:
+        async_api.run(async_api.create_catalog({'entityType': 'space', 'name': 'Space'}))
+        assert False
+    except requests.exceptions.ConnectionError:
+        pass
+    # Requests that did not reach Dremio are retried even if not idempotent
+    assert env_api.get_retry_counts() == {'ConnectionError': 2}
+    env_api.close()
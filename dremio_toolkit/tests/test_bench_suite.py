@@ -0,0 +1,61 @@
+#########################################################################
+# Copyright (C) 2023 UCE Systems Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Contact dremio@ucesys.com
+#########################################################################
+
+import json
+import os
+
+from dremio_toolkit.benchmarks.bench_suite import compare_results, generate_benchmark_env, get_object_count, \
+    run_benchmark_suite
+
+
+def test_generate_benchmark_env():
+    env_def = generate_benchmark_env(1000)
+    assert 900 <= get_object_count(env_def) <= 1100
+
+
+def test_run_benchmark_suite(tmp_path):
+    results = run_benchmark_suite([200], ['create_snapshot', 'diff_snapshot', 'implode_snapshot', 'exec_sql'],
+                                  str(tmp_path), concurrency=2)
+    assert [result['benchmark'] for result in results['results']] == \
+        ['create_snapshot', 'diff_snapshot', 'implode_snapshot', 'exec_sql']
+    for result in results['results']:
+        assert result['exit_code'] == 0 and result['errors'] == 0
+        assert result['seconds'] > 0 and result['objects'] > 0
+    assert results['results'][0]['requests'] > results['results'][0]['objects']
+    assert results['results'][1]['requests'] == 0
+    assert results['results'][3]['requests'] >= 20
+    assert os.path.isfile(os.path.join(str(tmp_path), '200', 'snapshot.json'))
+    # Results are JSON serializable
+    json.dumps(results)
+
+
+def test_compare_results():
+    baseline = {'results': [{'benchmark': 'create_snapshot', 'size': 1000, 'seconds': 10.0, 'requests': 3000,
+                             'peak_rss_mb': 50.0},
+                            {'benchmark': 'diff_snapshot', 'size': 1000, 'seconds': 0.01, 'requests': 0,
+                             'peak_rss_mb': 50.0}]}
+    results = {'results': [{'benchmark': 'create_snapshot', 'size': 1000, 'seconds': 11.0, 'requests': 3700,
+                            'peak_rss_mb': 50.0},
+                           {'benchmark': 'diff_snapshot', 'size': 1000, 'seconds': 0.03, 'requests': 0,
+                            'peak_rss_mb': 70.0},
+                           {'benchmark': 'exec_sql', 'size': 1000, 'seconds': 1.0, 'requests': 30,
+                            'peak_rss_mb': 50.0}]}
+    regressions = compare_results(results, baseline, 0.2)
+    assert len(regressions) == 2
+    assert regressions[0].startswith('create_snapshot size 1000: requests')
+    assert regressions[1].startswith('diff_snapshot size 1000: peak_rss_mb')
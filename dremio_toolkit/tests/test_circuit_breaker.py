@@ -0,0 +1,100 @@
+#########################################################################
+# Copyright (C) 2023 UCE Systems Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Contact dremio@ucesys.com
+#########################################################################
+
+import time
+
+import requests
+
+from dremio_toolkit.circuit_breaker import CircuitBreaker, CircuitBreakerPolicy
+from dremio_toolkit.context import Context
+from dremio_toolkit.env_api import RetryPolicy
+from dremio_toolkit.tests.test_env_api import RetryEnvApi
+
+
+def test_circuit_breaker():
+    context = Context()
+    context.init_logger(log_level='ERROR', log_verbose=False)
+    circuit_breaker = CircuitBreaker('s3', CircuitBreakerPolicy(failure_threshold=2, cool_down=0.05),
+                                     context.get_logger())
+    circuit_breaker.record_failure()
+    assert circuit_breaker.allow_request()
+    circuit_breaker.record_failure()
+    assert circuit_breaker.get_state() == CircuitBreaker.STATE_OPEN
+    assert not circuit_breaker.allow_request()
+
+    # A single probe is allowed after cool down, a failed probe opens the breaker again
+    time.sleep(0.05)
+    assert circuit_breaker.allow_request()
+    assert not circuit_breaker.allow_request()
+    circuit_breaker.record_failure()
+    assert circuit_breaker.get_state() == CircuitBreaker.STATE_OPEN
+
+    time.sleep(0.05)
+    assert circuit_breaker.allow_request()
+    circuit_breaker.record_success()
+    assert circuit_breaker.get_state() == CircuitBreaker.STATE_CLOSED
+    assert circuit_breaker.get_stats()['transitions'] == {'closed -> open': 1, 'open -> half-open': 2,
+                                                          'half-open -> open': 1, 'half-open -> closed': 1}
+    assert circuit_breaker.get_stats()['rejected'] == 2
+
+
+def test_get_source_name():
+    env_api = RetryEnvApi([(200, None)], RetryPolicy())
+    assert env_api._get_source_name('api/v3/catalog/by-path/s3/bucket/file.csv') == 's3'
+    assert env_api._get_source_name('api/v3/catalog/by-path/My%20Source') == 'My Source'
+    assert env_api._get_source_name('api/v3/catalog/by-path/') is None
+    assert env_api._get_source_name('api/v3/catalog/id-1') is None
+    assert env_api._get_source_name('api/v3/user/id-1') is None
+
+    env_api._learn_source_roots('api/v3/catalog/id-1', {'id': 'id-1', 'path': ['s3', 'bucket'],
+                                                        'children': [{'id': 'id-2', 'path': ['s3', 'bucket', 'f']}]})
+    assert env_api._get_source_name('api/v3/catalog/id-1') == 's3'
+    assert env_api._get_source_name('api/v3/catalog/id-2/graph') == 's3'
+
+
+def test_http_get_circuit_breaker():
+    env_api = RetryEnvApi([requests.exceptions.Timeout(), requests.exceptions.Timeout(), (200, None)],
+                          RetryPolicy(max_timeout_attempts=1))
+    env_api._circuit_breaker_policy = CircuitBreakerPolicy(failure_threshold=2, cool_down=0.05)
+    assert env_api._http_get('api/v3/catalog/by-path/s3/a') is None
+    assert env_api._http_get('api/v3/catalog/by-path/s3/b') is None
+    # Open breaker skips requests for the source without sending them
+    assert env_api._http_get('api/v3/catalog/by-path/s3/c') is None
+    assert len(env_api._session.methods) == 2
+
+    time.sleep(0.05)
+    assert env_api._http_get('api/v3/catalog/by-path/s3/c') == {'id': '1'}
+    assert env_api.get_circuit_breaker_stats()[0]['state'] == CircuitBreaker.STATE_CLOSED
+
+
+def test_http_get_circuit_breaker_connection_error():
+    env_api = RetryEnvApi([requests.exceptions.Timeout(), requests.exceptions.ConnectionError(), (200, None)],
+                          RetryPolicy(max_attempts=1, max_timeout_attempts=1))
+    env_api._circuit_breaker_policy = CircuitBreakerPolicy(failure_threshold=1, cool_down=0.05)
+    assert env_api._http_get('api/v3/catalog/by-path/s3/a') is None
+    time.sleep(0.05)
+    # A probe failing with a connection error opens the breaker again instead of keeping it half-open
+    try:
+        env_api._http_get('api/v3/catalog/by-path/s3/b')
+        assert False
+    except requests.exceptions.ConnectionError:
+        pass
+    assert env_api.get_circuit_breaker_stats()[0]['state'] == CircuitBreaker.STATE_OPEN
+    time.sleep(0.05)
+    assert env_api._http_get('api/v3/catalog/by-path/s3/c') == {'id': '1'}
+    assert env_api.get_circuit_breaker_stats()[0]['state'] == CircuitBreaker.STATE_CLOSED
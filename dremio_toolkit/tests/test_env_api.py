@@ -0,0 +1,265 @@
+#########################################################################
+# Copyright (C) 2023 UCE Systems Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Contact dremio@ucesys.com
+#########################################################################
+
+import io
+import threading
+import time
+
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+from dremio_toolkit.context import Context
+from dremio_toolkit.env_api import EnvApi, PollPolicy, RetryPolicy
+from dremio_toolkit.testing.mock_dremio_server import MockDremioServer
+from dremio_toolkit.testing.mock_env_definition import generate_env_definition
+
+
+class JobEnvApi(EnvApi):
+    def __init__(self, polls_to_complete):
+        self._stats_lock = threading.Lock()
+        self._job_poll_counts = {}
+        self._polls_to_complete = polls_to_complete
+        self._polls = 0
+
+    def get_job_info(self, jobid):
+        self._polls += 1
+        return {'jobState': 'COMPLETED' if self._polls >= self._polls_to_complete else 'RUNNING'}
+
+
+def test_poll_policy():
+    poll_policy = PollPolicy(initial_interval=0.1, max_interval=1.0, multiplier=2.0, jitter=0.2)
+    assert 0.08 <= poll_policy.get_interval(0) <= 0.12
+    assert 0.16 <= poll_policy.get_interval(1) <= 0.24
+    assert 0.8 <= poll_policy.get_interval(1000) <= 1.2
+
+
+def test_wait_for_job():
+    poll_policy = PollPolicy(initial_interval=0.01, max_interval=0.02)
+    env_api = JobEnvApi(polls_to_complete=3)
+    assert env_api.wait_for_job('job-1', poll_policy=poll_policy)['jobState'] == 'COMPLETED'
+    assert env_api.get_job_poll_count('job-1') == 3
+
+    # Timeout is measured in wall-clock seconds
+    env_api = JobEnvApi(polls_to_complete=1000000)
+    start_time = time.monotonic()
+    assert env_api.wait_for_job('job-2', timeout=0.2, poll_policy=poll_policy) is None
+    assert 0.2 <= time.monotonic() - start_time < 1
+    assert env_api.get_job_poll_count('job-2') > 5
+
+
+class ResultEnvApi(EnvApi):
+    def __init__(self, num_rows):
+        self._num_rows = num_rows
+        self.requests = []
+
+    def get_job_result(self, jobid, offset=0, limit=100):
+        self.requests.append((offset, limit))
+        # Later pages complete first
+        time.sleep(0.01 if offset < 1000 else 0)
+        return {'rowCount': self._num_rows,
+                'rows': [{'n': n} for n in range(offset, min(offset + limit, self._num_rows))]}
+
+
+def test_iter_job_result():
+    env_api = ResultEnvApi(2345)
+    assert [row['n'] for row in env_api.iter_job_result('job')] == list(range(2345))
+    assert sorted(env_api.requests) == [(offset, 500) for offset in range(0, 2345, 500)]
+
+    env_api = ResultEnvApi(1000)
+    assert [row['n'] for row in env_api.iter_job_result('job', 1000, page_size=100)] == list(range(1000))
+    assert len(env_api.requests) == 10
+    assert list(ResultEnvApi(0).iter_job_result('job', 0)) == []
+
+
+class FailedPageEnvApi(ResultEnvApi):
+    def __init__(self, num_rows, failed_offset):
+        ResultEnvApi.__init__(self, num_rows)
+        self._failed_offset = failed_offset
+        context = Context()
+        context.init_logger(log_level='ERROR', log_verbose=False)
+        self._logger = context.get_logger()
+
+    def get_job_result(self, jobid, offset=0, limit=100):
+        if offset == self._failed_offset:
+            return None
+        return ResultEnvApi.get_job_result(self, jobid, offset, limit)
+
+
+def test_iter_job_result_failed_page():
+    for failed_offset in [0, 1000]:
+        env_api = FailedPageEnvApi(2345, failed_offset)
+        rows = []
+        try:
+            for row in env_api.iter_job_result('job', page_size=500):
+                rows.append(row['n'])
+            assert False
+        except RuntimeError:
+            pass
+        assert rows == list(range(failed_offset))
+        assert env_api._logger.get_error_count() == 1
+
+
+class ScriptedSession:
+    def __init__(self, script):
+        self.script = list(script)
+        self.methods = []
+
+    def request(self, method, url, **kwargs):
+        self.methods.append(method)
+        item = self.script.pop(0)
+        if isinstance(item, Exception):
+            raise item
+        response = requests.Response()
+        response.status_code, response.headers['Retry-After'] = item
+        response._content = b'{"id": "1"}'
+        response.raw = io.BytesIO()
+        return response
+
+
+class RetryEnvApi(EnvApi):
+    def __init__(self, script, retry_policy):
+        context = Context()
+        context.init_logger(log_level='ERROR', log_verbose=False)
+        self._logger = context.get_logger()
+        self._stats_lock = threading.Lock()
+        self._retry_counts = {}
+        self._thread_state = threading.local()
+        self._retry_policy = retry_policy
+        self._circuit_breakers = {}
+        self._source_roots = {}
+        self._session = ScriptedSession(script)
+
+
+def test_retry_policy():
+    retry_policy = RetryPolicy(initial_backoff=0.001, max_backoff=0.002)
+    env_api = RetryEnvApi([(503, None), requests.exceptions.ConnectionError(), (200, None)], retry_policy)
+    assert env_api._http_get('api/v3/catalog/1') == {'id': '1'}
+    assert env_api.get_retry_counts() == {'503': 1, 'ConnectionError': 1}
+
+    # POST is only retried when the request has not been processed
+    env_api = RetryEnvApi([(429, '0'), (503, None), (200, None)], retry_policy)
+    assert env_api._http_post('api/v3/catalog/', {}) is None
+    assert env_api.get_retry_counts() == {'429': 1}
+
+    # Failed connection attempts are retried for any request, other connection errors only for idempotent requests
+    connect_error = requests.exceptions.ConnectionError(MaxRetryError(None, '/', NewConnectionError(None, 'refused')))
+    env_api = RetryEnvApi([connect_error, (200, None)], retry_policy)
+    assert env_api._send('POST', 'api/v3/catalog/', idempotent=False).status_code == 200
+    env_api = RetryEnvApi([requests.exceptions.ConnectionError(), (200, None)], retry_policy)
+    try:
+        env_api._send('POST', 'api/v3/catalog/', idempotent=False)
+        assert False
+    except requests.exceptions.ConnectionError:
+        pass
+
+    env_api = RetryEnvApi([(500, None)] * 4, retry_policy)
+    assert env_api._http_get('api/v3/catalog/1') is None
+    assert env_api._session.methods == ['GET'] * 4
+
+    assert retry_policy.get_backoff(1, '3') == 3.0
+    assert retry_policy.get_backoff(1, 'Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+    assert 0.0005 <= retry_policy.get_backoff(1) <= 0.001
+
+
+class TokenSession:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.logins = 0
+        self.valid_token = None
+
+    def request(self, method, url, **kwargs):
+        response = requests.Response()
+        response.raw = io.BytesIO()
+        response.status_code = 200
+        if url.endswith(EnvApi._login):
+            time.sleep(0.01)
+            with self.lock:
+                self.logins += 1
+                self.valid_token = '_dremio' + str(self.logins)
+            response._content = ('{"token": "' + str(self.logins) + '", "version": "24.0.0"}').encode('utf-8')
+        elif kwargs['headers']['Authorization'] in [self.valid_token, 'Bearer pat']:
+            response._content = b'{"id": "1"}'
+        else:
+            response.status_code = 401
+            response._content = b'{}'
+        return response
+
+
+class TokenEnvApi(RetryEnvApi):
+    def __init__(self, token_refresh_age=None, personal_access_token=None):
+        super().__init__([], RetryPolicy())
+        self._endpoint = 'http://localhost/'
+        self._session = TokenSession()
+        self._token_lock = threading.Lock()
+        self._token_refresh_age = token_refresh_age
+        self._personal_access_token = personal_access_token
+        self._admin_verified = True
+        self._request_budgets = {}
+        if personal_access_token is None:
+            self._authenticate()
+        else:
+            self._set_token('Bearer ' + personal_access_token)
+
+
+def test_token_refresh():
+    # Concurrent requests with an expired token share a single login
+    env_api = TokenEnvApi()
+    env_api._session.valid_token = 'expired'
+    threads = [threading.Thread(target=env_api._http_get, args=('api/v3/catalog/1',)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert env_api._session.logins == 2
+    assert env_api._http_get('api/v3/catalog/1') == {'id': '1'}
+    assert env_api._http_post('api/v3/sql', {}) == {'id': '1'}
+
+    # Token is refreshed ahead of expiry
+    env_api = TokenEnvApi(token_refresh_age=0)
+    assert env_api._http_get('api/v3/catalog/1') == {'id': '1'}
+    assert env_api._session.logins == 2
+
+    # Personal access token does not log in
+    env_api = TokenEnvApi(personal_access_token='pat')
+    assert env_api._http_get('api/v3/catalog/1') == {'id': '1'}
+    assert env_api._session.logins == 0
+
+
+def test_connection_pool():
+    env_def = generate_env_definition(num_vds=10)
+    context = Context(Context.CMD_CREATE_SNAPSHOT)
+    context.init_logger(log_level='ERROR', log_verbose=False)
+    with MockDremioServer(env_def) as server:
+        env_api = EnvApi(server.get_endpoint(), 'admin', 'password', context, pool_size=EnvApi.get_pool_size(4))
+        threads = [threading.Thread(target=env_api.list_catalogs) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for i in range(20):
+            env_api.list_catalogs()
+        stats = env_api.get_connection_pool_stats()
+        assert stats['requests'] == server.get_request_count()
+        assert len(stats['pools']) == 1
+        pool = stats['pools'][0]
+        assert pool['max_size'] == EnvApi.DEFAULT_POOL_SIZE
+        assert pool['requests'] == stats['requests']
+        assert 1 <= pool['opened_connections'] <= 4 < pool['requests']
+        env_api.close()
+    assert EnvApi.get_pool_size(1) == EnvApi.DEFAULT_POOL_SIZE
+    assert EnvApi.get_pool_size(EnvApi.DEFAULT_POOL_SIZE * 2) == EnvApi.DEFAULT_POOL_SIZE * 2
@@ -0,0 +1,60 @@
+#########################################################################
+# Copyright (C) 2023 UCE Systems Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Contact dremio@ucesys.com
+#########################################################################
+
+from dremio_toolkit.env_definition import EnvDefinition, IndexedList
+from dremio_toolkit.testing.mock_env_definition import mock_env_definition
+
+
+def test_env_definition_indexes():
+    env_def = mock_env_definition()
+
+    assert isinstance(env_def.vds_list, IndexedList)
+    vds = env_def.vds_list[0]
+    assert env_def.vds_list.find('id', vds['id']) is vds
+    assert env_def.vds_list.find('path', vds['path']) is vds
+    assert env_def.vds_list.find('path', '/'.join(vds['path'])) is vds
+    assert env_def.referenced_users.find('name', 'user123') is env_def.referenced_users[0]
+    assert env_def.vds_list.find('path', 'No/Such/VDS') is None
+
+
+def test_indexed_list_consistency():
+    items = IndexedList(keys=['id', 'path'])
+    items.append({'id': '1', 'path': ['A', 'B']})
+    items.extend([{'id': '2', 'path': ['A', 'C']}, {'id': '3', 'path': ['A', 'D']}])
+    items.insert(0, {'id': '0', 'path': ['A']})
+
+    assert {'id': '2', 'path': ['A', 'C']} in items
+    assert {'id': '2', 'path': ['A', 'X']} not in items
+
+    items.remove({'id': '2', 'path': ['A', 'C']})
+    assert items.find('id', '2') is None
+    assert items.find('path', 'A/C') is None
+
+    removed = items.pop()
+    assert removed['id'] == '3' and items.find('id', '3') is None
+
+    items[0] = {'id': '4', 'path': ['E']}
+    assert items.find('id', '0') is None
+    assert items.find('path', ['E'])['id'] == '4'
+
+    del items[:]
+    assert len(items) == 0 and items.find('id', '1') is None
+
+    env_def = EnvDefinition()
+    env_def.tags = [{'entity_id': 'x', 'path': ['S'], 'tags': []}]
+    assert env_def.tags.find('entity_id', 'x')['path'] == ['S']
@@ -0,0 +1,36 @@
+#########################################################################
+# Copyright (C) 2023 UCE Systems Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Contact dremio@ucesys.com
+#########################################################################
+
+from dremio_toolkit.context import Context
+from dremio_toolkit.env_diff import EnvDiff
+
+
+def test_diff_lists():
+    context = Context(Context.CMD_DIFF_SNAPSHOT)
+    context.init_logger(log_level='ERROR', log_verbose=False)
+    env_diff = EnvDiff(context)
+    base_list = [{'path': ['S', 'A'], 'sql': '1'}, {'path': ['S', 'B'], 'sql': '2'}, {'path': ['S', 'C'], 'sql': '3'}]
+    comp_list = [{'path': ['S', 'D'], 'sql': '4'}, {'path': ['S', 'B'], 'sql': '2'}, {'path': ['S', 'A'], 'sql': '0'}]
+    report = []
+    env_diff._diff_lists(base_list, comp_list, 'path', ['sql'], report, 'VDS')
+
+    assert [item['diff'] for item in report] == ['Different attribute. ', 'Item is missing in Comp Environment',
+                                                 'Extra item in Comp Environment']
+    assert report[0]['base'] is base_list[0] and report[0]['comp'] is comp_list[2]
+    assert report[1]['base'] is base_list[2]
+    assert report[2]['comp'] is comp_list[0]
@@ -0,0 +1,89 @@
+#########################################################################
+# Copyright (C) 2023 UCE Systems Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Contact dremio@ucesys.com
+#########################################################################
+
+import json
+import tempfile
+
+from dremio_toolkit.context import Context
+from dremio_toolkit.env_file_reader import EnvFileReader, SnapshotSection, _JsonStreamParser
+from dremio_toolkit.env_file_writer import EnvFileWriter
+from dremio_toolkit.testing.mock_env_definition import mock_env_definition
+
+SECTIONS = ['sources', 'spaces', 'folders', 'vds_list', 'vds_parents', 'files', 'reflections', 'queues', 'rules',
+            'tags', 'wikis', 'votes', 'referenced_users', 'referenced_groups', 'referenced_roles']
+
+
+def test_lazy_load():
+    env_def = mock_env_definition()
+    env_def.vds_list[0]['sql'] = 'SELECT \'é中\' FROM "Space"."Table"'
+    with tempfile.NamedTemporaryFile(mode='w') as tmp_file:
+        context = Context()
+        context.init_logger(log_level="WARN", log_verbose=False)
+        context.set_target(output_mode=Context.PATH_MODE_FILE, output_path=tmp_file.name)
+        EnvFileWriter.save_dremio_environment(context, env_def)
+
+        context.set_source(input_mode=Context.PATH_MODE_FILE, input_path=tmp_file.name)
+        eager_env_def = EnvFileReader.read_dremio_source_environment(context)
+        context.set_source(input_mode=Context.PATH_MODE_FILE, input_path=tmp_file.name, lazy_load=True)
+        lazy_env_def = EnvFileReader.read_dremio_source_environment(context)
+
+        assert isinstance(lazy_env_def.vds_list, SnapshotSection)
+        assert lazy_env_def.file_version == eager_env_def.file_version
+        assert lazy_env_def.referenced_users.find('id', env_def.referenced_users[0]['id']) is not None
+        for section in SECTIONS:
+            assert len(getattr(lazy_env_def, section)) == len(getattr(eager_env_def, section))
+            # Sections can be iterated more than once
+            for i in range(2):
+                assert list(getattr(lazy_env_def, section)) == list(getattr(eager_env_def, section))
+
+
+def test_index_snapshot_file_small_chunks(monkeypatch):
+    # Values, escapes and multibyte characters are split between chunks
+    vds = [{'sql': 'é中'}, 12345, [1, 2], {'sql': 'SELECT "]}\\", \'[{\'', 'path': ['a\\', '{']}, 'x"]', None]
+    content = '{"other": {"a": ["]", "\\"}"]}, "data": {"vds": ' + json.dumps(vds) + ', "wikis": [], ' \
+              '"referenced_users": [{"id": "é"}]}, "last": "\\\\"}'
+    with tempfile.NamedTemporaryFile(mode='w', encoding='utf-8') as tmp_file:
+        tmp_file.write(content)
+        tmp_file.flush()
+        for chunk_size in range(1, 8):
+            monkeypatch.setattr(_JsonStreamParser, '_CHUNK_SIZE', chunk_size)
+            data = EnvFileReader._index_snapshot_file(tmp_file.name)
+
+            assert list(data['vds']) == vds
+            assert len(data['vds']) == len(vds)
+            assert list(data['wikis']) == [] and len(data['wikis']) == 0
+            assert data['referenced_users'] == [{'id': 'é'}]
+
+
+def test_directory_round_trip():
+    env_def = mock_env_definition()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        context = Context()
+        context.init_logger(log_level="WARN", log_verbose=False)
+        context.set_io_workers(4)
+        context.set_target(output_mode=Context.PATH_MODE_DIR, output_path=tmp_dir)
+        EnvFileWriter.save_dremio_environment(context, env_def)
+
+        context.set_source(input_mode=Context.PATH_MODE_DIR, input_path=tmp_dir)
+        dir_env_def = EnvFileReader.read_dremio_source_environment(context)
+
+        # Directory snapshot does not preserve order of items
+        for section in SECTIONS:
+            if section != 'files':
+                assert sorted(json.dumps(item, sort_keys=True) for item in getattr(dir_env_def, section)) == \
+                    sorted(json.dumps(item, sort_keys=True) for item in getattr(env_def, section))
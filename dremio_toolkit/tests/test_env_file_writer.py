@@ -38,4 +38,32 @@ def test_env_file_writer():
         EnvFileWriter.save_dremio_environment(context, env_def)
 
         assert os.path.isfile(tmp_file.name), "Snapshot does not exist"
-        assert json.load(open(tmp_file.name)) == expected_snapshot, "Snapshot is different than expected"
\ No newline at end of file
+        assert json.load(open(tmp_file.name)) == expected_snapshot, "Snapshot is different than expected"
+
+def test_env_file_writer_stream_format():
+    env_def = mock_env_definition()
+    env_def.timestamp_utc = '2023-01-01 00:00:00'
+    sections = {'dremio_environment': [{'file_version': EnvFileWriter.DREMIO_ENV_FILE_VERSION},
+                                       {'endpoint': env_def.endpoint}, {'timestamp_utc': env_def.timestamp_utc}],
+                'sources': env_def.sources, 'spaces': env_def.spaces, 'folders': env_def.folders,
+                'vds': env_def.vds_list, 'vds_parents': env_def.vds_parents, 'files': env_def.files,
+                'reflections': env_def.reflections, 'queues': env_def.queues, 'rules': env_def.rules,
+                'tags': env_def.tags, 'wikis': env_def.wikis, 'votes': env_def.votes,
+                'referenced_users': env_def.referenced_users, 'referenced_groups': env_def.referenced_groups,
+                'referenced_roles': env_def.referenced_roles}
+
+    for compact in [False, True]:
+        with tempfile.NamedTemporaryFile(mode='w') as tmp_file:
+            context = Context()
+            context.init_logger(log_level="WARN", log_verbose=False)
+            context.set_target(output_mode=Context.PATH_MODE_FILE, output_path=tmp_file.name, compact_json=compact)
+
+            EnvFileWriter.save_dremio_environment(context, env_def)
+
+            with open(tmp_file.name, encoding='utf-8') as f:
+                content = f.read()
+            if compact:
+                expected = json.dumps({'data': sections}, separators=(',', ':'), sort_keys=True)
+            else:
+                expected = json.dumps({'data': sections}, indent=4, sort_keys=True)
+            assert content == expected, "Snapshot is not byte-identical to json.dump output"
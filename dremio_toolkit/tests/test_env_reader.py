@@ -17,9 +17,11 @@
 #########################################################################
 
 from dremio_toolkit.logger import Logger
-from dremio_toolkit.env_reader import EnvReader
+from dremio_toolkit.env_api import EnvApi
+from dremio_toolkit.env_reader import EnvReader, PrincipalCache
+from dremio_toolkit.testing.mock_dremio_server import MockDremioServer
 from dremio_toolkit.testing.mock_env_api import MockEnvApi
-from dremio_toolkit.testing.mock_env_definition import mock_env_definition
+from dremio_toolkit.testing.mock_env_definition import generate_env_definition, mock_env_definition
 from dremio_toolkit.context import Context
 
 
@@ -44,3 +46,87 @@ def test_read_dremio_environment():
     assert env_def.wikis == expected_env_def.wikis
     assert env_def.referenced_users == expected_env_def.referenced_users
     assert env_def.referenced_roles == expected_env_def.referenced_roles
+
+
+def test_read_dremio_environment_concurrently():
+    context = Context()
+    context.init_logger(log_level="WARN", log_verbose=False)
+    context.set_source_env_api(MockEnvApi())
+    env_def = EnvReader(context).read_dremio_environment()
+    concurrent_env_def = EnvReader(context, concurrency=4).read_dremio_environment()
+
+    assert concurrent_env_def.containers == env_def.containers
+    assert concurrent_env_def.sources == env_def.sources
+    assert concurrent_env_def.spaces == env_def.spaces
+    assert concurrent_env_def.folders == env_def.folders
+    assert concurrent_env_def.vds_list == env_def.vds_list
+    assert concurrent_env_def.vds_parents == env_def.vds_parents
+    assert concurrent_env_def.tags == env_def.tags
+    assert concurrent_env_def.wikis == env_def.wikis
+    assert concurrent_env_def.referenced_users == env_def.referenced_users
+    assert concurrent_env_def.referenced_roles == env_def.referenced_roles
+
+
+class CountingMockEnvApi(MockEnvApi):
+    def __init__(self):
+        super().__init__()
+        self.principal_calls = 0
+
+    def get_user(self, user_id):
+        self.principal_calls += 1
+        return super().get_user(user_id)
+
+    def get_group(self, group_id):
+        self.principal_calls += 1
+        return super().get_group(group_id)
+
+    def get_last_status_code(self):
+        return 404
+
+
+def test_principal_cache():
+    env_api = CountingMockEnvApi()
+    principal_cache = PrincipalCache(env_api)
+    for i in range(10):
+        assert principal_cache.get('user', 'cd6b0335-5113-485e-bf38-e75090857592')['name'] == 'user123'
+        assert principal_cache.get('group', 'missing-group-id') is None
+
+    assert env_api.principal_calls == 2
+    assert principal_cache.get_hit_ratio() == 0.9
+
+
+def test_read_dremio_environment_incrementally():
+    env_def = generate_env_definition(num_vds=50, wiki_ratio=0.5, tag_ratio=0.5)
+    for concurrency in [1, 4]:
+        context = Context(Context.CMD_CREATE_SNAPSHOT)
+        context.init_logger(log_level='ERROR', log_verbose=False)
+        with MockDremioServer(env_def) as server:
+            env_api = EnvApi(server.get_endpoint(), 'admin', 'password', context, dry_run=False)
+            context.set_source(env_api=env_api)
+            baseline = EnvReader(context, concurrency).read_dremio_environment()
+            changed_vds = dict(baseline.vds_list[3])
+            changed_vds['sql'] = changed_vds['sql'] + ' WHERE 1=1'
+            env_api.update_catalog(changed_vds['id'], changed_vds)
+            # SQL GRANT does not change the VDS version
+            granted_vds_id = baseline.vds_list[5]['id']
+            server._entities[granted_vds_id]['accessControlList'] = \
+                {'roles': [{'id': 'f71cfba5-e144-4090-883e-df878aca225e', 'permissions': ['SELECT']}]}
+            request_count = server.get_request_count()
+            full_snapshot = EnvReader(context, concurrency).read_dremio_environment()
+            full_requests = server.get_request_count() - request_count
+            request_count = server.get_request_count()
+            incremental_reader = EnvReader(context, concurrency, baseline=baseline)
+            incremental_snapshot = incremental_reader.read_dremio_environment()
+            incremental_requests = server.get_request_count() - request_count
+            for section in ['spaces', 'folders', 'vds_list', 'vds_parents', 'wikis', 'tags', 'referenced_users',
+                            'referenced_roles']:
+                assert sorted(map(str, getattr(incremental_snapshot, section))) == \
+                    sorted(map(str, getattr(full_snapshot, section)))
+            assert incremental_snapshot.vds_list.find('id', changed_vds['id'])['sql'].endswith('WHERE 1=1')
+            assert incremental_snapshot.vds_list.find('id', granted_vds_id)['accessControlList'] == \
+                {'roles': [{'id': 'f71cfba5-e144-4090-883e-df878aca225e', 'permissions': ['SELECT']}]}
+            assert incremental_requests < full_requests
+            assert incremental_reader._prefetched == {}
+            assert 'Incremental snapshot: 49 VDS carried over from baseline, 1 VDS read from catalog.' in \
+                context.get_logger()._summary
+            env_api.close()
@@ -0,0 +1,93 @@
+#########################################################################
+# Copyright (C) 2023 UCE Systems Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Contact dremio@ucesys.com
+#########################################################################
+
+from dremio_toolkit.context import Context
+from dremio_toolkit.env_definition import EnvDefinition
+from dremio_toolkit.env_writer import EnvWriter
+
+
+def _vds(name: str, parents: list) -> (dict, dict):
+    vds = {'id': name, 'path': ['Space', name], 'sql': 'SELECT 1', 'sqlContext': ['Space'],
+           'entityType': 'dataset', 'type': 'VIRTUAL_DATASET'}
+    return vds, {'id': name, 'path': ['Space', name], 'parents': parents}
+
+
+def test_order_vds():
+    env_def = EnvDefinition()
+    # A chain of VDSs deeper than 10 levels, listed in reverse order, depending on a PDS at the bottom
+    for level in reversed(range(15)):
+        vds, vds_parents = _vds('chain' + str(level), ['Source/pds'] if level == 0 else ['chain' + str(level - 1)])
+        env_def.vds_list.append(vds)
+        env_def.vds_parents.append(vds_parents)
+    # Diamond dependency
+    for name, parents in [('top', ['Space/left', 'Space/right']), ('left', ['Space/chain3']),
+                          ('right', ['Space/chain7'])]:
+        vds, vds_parents = _vds(name, parents)
+        env_def.vds_list.append(vds)
+        env_def.vds_parents.append(vds_parents)
+    # Cycle
+    for name, parents in [('cycle_a', ['Space/cycle_b']), ('cycle_b', ['Space/cycle_a']),
+                          ('after_cycle', ['Space/cycle_a'])]:
+        vds, vds_parents = _vds(name, parents)
+        env_def.vds_list.append(vds)
+        env_def.vds_parents.append(vds_parents)
+
+    context = Context(Context.CMD_PUSH_SNAPSHOT)
+    context.init_logger(log_level="ERROR", log_verbose=False)
+    env_writer = EnvWriter(context, env_def)
+    env_writer._order_vds()
+
+    levels = {vds['id']: level for level, vds in env_writer._vds_hierarchy}
+    assert levels == dict([('chain' + str(level), level) for level in range(15)] +
+                          [('left', 4), ('right', 8), ('top', 9)])
+    assert [vds['id'] for vds in env_writer._unordered_vds] == ['cycle_a', 'cycle_b', 'after_cycle']
+    assert env_writer._vds_cycles[0][1] == ['Space/cycle_b']
+    assert env_writer._referenced_pds == ['Source/pds']
+
+
+class RecordingEnvApi:
+    def __init__(self):
+        self.created_paths = []
+
+    def get_catalog_by_path(self, path):
+        return None
+
+    def create_catalog(self, catalog_definition):
+        self.created_paths.append(catalog_definition['path'][-1])
+        return catalog_definition
+
+
+def test_write_vds_concurrently():
+    env_def = EnvDefinition()
+    for name, parents in [('a', []), ('b', []), ('c', ['Space/a', 'Space/b']), ('d', ['Space/a']), ('e', ['Space/c'])]:
+        vds, vds_parents = _vds(name, parents)
+        env_def.vds_list.append(vds)
+        env_def.vds_parents.append(vds_parents)
+
+    context = Context(Context.CMD_PUSH_SNAPSHOT)
+    context.init_logger(log_level="ERROR", log_verbose=False)
+    env_api = RecordingEnvApi()
+    context.set_target(env_api=env_api)
+    env_writer = EnvWriter(context, env_def, concurrency=4)
+    env_writer._order_vds()
+    env_writer._write_vds()
+
+    assert sorted(env_api.created_paths[:2]) == ['a', 'b']
+    assert sorted(env_api.created_paths[2:4]) == ['c', 'd']
+    assert env_api.created_paths[4] == 'e'
+    assert env_writer._vds_hierarchy == []
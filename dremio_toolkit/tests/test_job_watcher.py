@@ -0,0 +1,95 @@
+#########################################################################
+# Copyright (C) 2023 UCE Systems Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Contact dremio@ucesys.com
+#########################################################################
+
+import threading
+import time
+
+import requests
+
+from dremio_toolkit.context import Context
+from dremio_toolkit.env_api import EnvApi, PollPolicy
+from dremio_toolkit.job_watcher import JobWatcher
+from dremio_toolkit.rebuild_metadata_task import RebuildMetadataTask
+
+
+class JobEnvApi(EnvApi):
+    def __init__(self):
+        self._stats_lock = threading.Lock()
+        self._job_poll_counts = {}
+        self._job_watcher = None
+        self._submitted = []
+        self._polls = {}
+        self.max_polls_per_second = 0
+
+    def submit_sql(self, sql, sql_context=None):
+        jobid = 'job' + str(len(self._submitted))
+        self._submitted.append(sql)
+        return jobid
+
+    def get_job_info(self, jobid):
+        with self._stats_lock:
+            self._polls[jobid] = self._polls.get(jobid, 0) + 1
+            # Connection lost for PDS named "broken"
+            if 'broken' in self._submitted[int(jobid[3:])]:
+                raise requests.exceptions.ConnectionError('Connection refused')
+            # FAILED jobs for PDS named "fail"
+            if 'fail' in self._submitted[int(jobid[3:])]:
+                return {'jobState': 'FAILED'}
+            return {'jobState': 'COMPLETED' if self._polls[jobid] >= 3 else 'RUNNING'}
+
+
+def test_job_watcher():
+    env_api = JobEnvApi()
+    job_watcher = JobWatcher(env_api, PollPolicy(initial_interval=0.001, max_interval=0.002),
+                             max_polls_per_tick=50, tick_interval=0.01)
+    start_time = time.monotonic()
+    futures = [job_watcher.watch(env_api.submit_sql('SELECT ' + str(i))) for i in range(200)]
+    assert all(future.result(timeout=10)['jobState'] == 'COMPLETED' for future in futures)
+    # 600 polls with at most 50 polls per 10ms tick
+    assert time.monotonic() - start_time >= 0.11
+    assert env_api.get_job_poll_count('job0') == 3
+    assert job_watcher.get_outstanding_job_count() == 0
+    assert job_watcher.watch(None).result() is None
+    job_watcher.close()
+
+
+def test_rebuild_metadata_task():
+    context = Context()
+    context.init_logger(log_level='ERROR', log_verbose=False)
+    env_api = JobEnvApi()
+    env_api._job_watcher = JobWatcher(env_api, PollPolicy(initial_interval=0.001, max_interval=0.002))
+    context.set_target(env_api=env_api)
+    context.get_logger().new_process_status(2, 'Rebuilding metadata. ')
+
+    task = RebuildMetadataTask(context, '"Source"."pds"', False)
+    future = task.start()
+    while future is not None:
+        future = task.complete_job(future.result(timeout=10))
+    assert task.get_status() is True
+    assert env_api._submitted[-1].endswith('REFRESH METADATA AUTO PROMOTION')
+    assert task.get_forget_job_info()['jobState'] == 'COMPLETED'
+
+    task = RebuildMetadataTask(context, '"Source"."fail"', False)
+    assert task.complete_job(task.start().result(timeout=10)) is None
+    assert task.get_status() is False and task.get_refresh_job_id() is None
+
+    # Polling errors fail the task instead of being raised to the caller
+    task = RebuildMetadataTask(context, '"Source"."broken"', False)
+    assert task.complete_job_future(task.start()) is None
+    assert task.get_status() is False and task.get_forget_job_info() is None
+    env_api.close()
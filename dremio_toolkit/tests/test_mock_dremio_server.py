@@ -0,0 +1,54 @@
+#########################################################################
+# Copyright (C) 2023 UCE Systems Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Contact dremio@ucesys.com
+#########################################################################
+
+from dremio_toolkit.context import Context
+from dremio_toolkit.env_api import EnvApi, RetryPolicy
+from dremio_toolkit.env_reader import EnvReader
+from dremio_toolkit.testing.mock_dremio_server import MockDremioServer
+from dremio_toolkit.testing.mock_env_definition import generate_env_definition
+
+
+def test_generate_env_definition():
+    env_def = generate_env_definition(num_spaces=2, folder_depth=2, folders_per_level=2, num_vds=200, seed=1)
+    assert len(env_def.spaces) == 2 and len(env_def.folders) == 12 and len(env_def.vds_list) == 200
+    assert list(env_def.vds_list) == list(generate_env_definition(num_vds=200, seed=1).vds_list)
+    # Parents are PDSs or VDSs defined earlier
+    defined_paths = set('/'.join(pds['path']) for pds in env_def.sources[0]['children'])
+    for vds_parents in env_def.vds_parents:
+        assert 1 <= len(vds_parents['parents']) <= 3
+        assert all(parent in defined_paths for parent in vds_parents['parents'])
+        defined_paths.add('/'.join(vds_parents['path']))
+
+
+def test_read_from_mock_dremio_server():
+    env_def = generate_env_definition(num_vds=40)
+    context = Context(Context.CMD_CREATE_SNAPSHOT)
+    context.init_logger(log_level='ERROR', log_verbose=False)
+    with MockDremioServer(env_def, error_rate=0.05, job_polls=2) as server:
+        env_api = EnvApi(server.get_endpoint(), 'admin', 'password', context,
+                         retry_policy=RetryPolicy(max_attempts=10, initial_backoff=0.001, max_backoff=0.002))
+        context.set_source(env_api=env_api)
+        snapshot = EnvReader(context, 4).read_dremio_environment(None, False)
+        assert sorted(vds['id'] for vds in snapshot.vds_list) == sorted(vds['id'] for vds in env_def.vds_list)
+        assert sorted(vds_parents['parents'] for vds_parents in snapshot.vds_parents) == \
+            sorted(vds_parents['parents'] for vds_parents in env_def.vds_parents)
+        assert len(snapshot.wikis) == len(env_def.wikis) and len(snapshot.tags) == len(env_def.tags)
+        assert len(snapshot.reflections) == len(env_def.reflections)
+        assert server.get_error_count() > 0 and sum(env_api.get_retry_counts().values()) == server.get_error_count()
+        assert env_api.get_dremio_version() == MockDremioServer.DREMIO_VERSION
+        env_api.close()
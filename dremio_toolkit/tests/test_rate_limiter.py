@@ -0,0 +1,95 @@
+#########################################################################
+# Copyright (C) 2023 UCE Systems Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Contact dremio@ucesys.com
+#########################################################################
+
+import threading
+import time
+
+from dremio_toolkit.env_api import EnvApi, RetryPolicy
+from dremio_toolkit.rate_limiter import TokenBucket, RequestBudget
+from dremio_toolkit.tests.test_env_api import RetryEnvApi
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=100, burst=1)
+    start_time = time.monotonic()
+    for i in range(11):
+        bucket.acquire()
+    assert time.monotonic() - start_time >= 0.09
+
+
+def test_request_budget_slow_down():
+    budget = RequestBudget('test', rate=100, max_in_flight=8, slow_down_interval=10)
+    budget.acquire()
+    budget.release(429)
+    # Slow down is applied once per interval
+    budget.acquire()
+    budget.release(503)
+    stats = budget.get_stats()
+    assert stats['slow_downs'] == 1 and stats['rate'] == 50 and stats['in_flight_limit'] == 4
+    for i in range(100):
+        budget.acquire()
+        budget.release(200)
+    stats = budget.get_stats()
+    assert stats['rate'] == 100 and stats['in_flight_limit'] == 8
+
+    # Unlimited budget is limited by the number of requests in flight when slowed down
+    budget = RequestBudget('test')
+    assert not budget.is_limited()
+    for i in range(4):
+        budget.acquire()
+    budget.release(429)
+    assert budget.get_stats()['in_flight_limit'] == 2
+
+
+def test_request_budget_in_flight():
+    budget = RequestBudget('test', max_in_flight=2)
+    lock = threading.Lock()
+    in_flight = [0, 0]
+
+    def request():
+        budget.acquire()
+        with lock:
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight[1], in_flight[0])
+        time.sleep(0.01)
+        with lock:
+            in_flight[0] -= 1
+        budget.release(200)
+
+    threads = [threading.Thread(target=request) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert in_flight[1] == 2
+
+
+def test_env_api_request_budgets():
+    env_api = RetryEnvApi([(503, None), (200, None), (200, None)], RetryPolicy(initial_backoff=0.001,
+                                                                                max_backoff=0.002))
+    env_api._init_request_budgets(EnvApi.get_request_budgets(max_sql_rate=10))
+    assert env_api._get_request_budget('GET', 'api/v3/catalog/1').get_name() == EnvApi.BUDGET_CATALOG_READ
+    assert env_api._get_request_budget('GET', 'api/v3/job/1').get_name() == EnvApi.BUDGET_CATALOG_READ
+    assert env_api._get_request_budget('PUT', 'api/v3/catalog/1').get_name() == EnvApi.BUDGET_CATALOG_WRITE
+    assert env_api._get_request_budget('POST', 'api/v3/sql').get_name() == EnvApi.BUDGET_SQL
+    assert env_api._get_request_budget('POST', 'apiv2/login') is None
+
+    assert env_api._http_get('api/v3/catalog/1') == {'id': '1'}
+    assert env_api._request_budgets[EnvApi.BUDGET_CATALOG_READ].get_stats()['slow_downs'] == 1
+    assert env_api._http_post('api/v3/sql', {}) == {'id': '1'}
+    assert env_api._request_budgets[EnvApi.BUDGET_SQL].get_stats()['slow_downs'] == 0
@@ -0,0 +1,85 @@
+#########################################################################
+# Copyright (C) 2023 UCE Systems Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Contact dremio@ucesys.com
+#########################################################################
+
+import gzip
+import json
+
+import requests
+
+from dremio_toolkit.api_recorder import ApiRecorder, RecordingSession
+from dremio_toolkit.context import Context
+from dremio_toolkit.testing.replay_env_api import ReplayEnvApi
+
+ENDPOINT = 'http://dremio:9047/'
+
+
+class RecordedDremio:
+    def __init__(self):
+        self.job_polls = 0
+
+    def request(self, method, url, **kwargs):
+        url = url[len(ENDPOINT):]
+        if url == 'apiv2/login':
+            result = {'token': 'secret-token', 'version': '24.0.0'}
+        elif url == 'api/v3/user/by-name/admin':
+            result = {'id': 'u1'}
+        elif url == 'api/v3/user/u1':
+            result = {'id': 'u1', 'roles': [{'name': 'ADMIN'}]}
+        elif url == 'api/v3/sql':
+            result = {'id': 'job1'}
+        elif url == 'api/v3/job/job1':
+            self.job_polls += 1
+            result = {'jobState': 'RUNNING' if self.job_polls < 2 else 'COMPLETED'}
+        else:
+            result = {'id': 'c1', 'path': ['s3'], 'config': {'accessKey': 'key', 'secretKey': 'value'}}
+        response = requests.Response()
+        response.status_code = 200
+        response._content = json.dumps(result).encode('utf-8')
+        return response
+
+
+def test_record_and_replay(tmp_path):
+    archive_filepath = str(tmp_path / 'recording.jsonl.gz')
+    recorder = ApiRecorder(archive_filepath, ENDPOINT, 'admin')
+    session = RecordingSession(RecordedDremio(), recorder)
+    # Requests as sent by EnvApi of the recorded run
+    session.request('POST', ENDPOINT + 'apiv2/login', data=b'{"userName": "admin","password": "pwd"}')
+    session.request('GET', ENDPOINT + 'api/v3/user/by-name/admin')
+    session.request('GET', ENDPOINT + 'api/v3/user/u1')
+    session.request('GET', ENDPOINT + 'api/v3/catalog/c1')
+    sql = '// dremio-toolkit \n// run_id: 3f1c61f2-9f7a-4a56-8b8e-43a3b7d1e7a5\nSELECT 1'
+    session.request('POST', ENDPOINT + 'api/v3/sql', data=('{ "sql":' + json.dumps(sql) + ' }').encode('utf-8'))
+    session.request('GET', ENDPOINT + 'api/v3/job/job1')
+    session.request('GET', ENDPOINT + 'api/v3/job/job1')
+    recorder.close()
+    with gzip.open(archive_filepath, 'rt') as f:
+        content = f.read()
+    assert 'secret-token' not in content and 'pwd' not in content and 'value' not in content
+
+    context = Context()
+    context.init_logger(log_level='ERROR', log_verbose=False)
+    env_api = ReplayEnvApi(archive_filepath, context)
+    assert env_api.get_dremio_version() == '24.0.0'
+    assert env_api.get_catalog('c1')['config'] == {'accessKey': 'key', 'secretKey': '***'}
+    # SQL is matched regardless of run ID, job polls are replayed in order
+    status, jobid, job_info = env_api.execute_sql(context.get_sql_comment_uuid() + 'SELECT 1')
+    assert status and jobid == 'job1'
+    assert env_api.get_job_poll_count('job1') == 2
+    assert env_api.get_unmatched_requests() == []
+    assert env_api.get_catalog('c2') is None
+    assert env_api.get_unmatched_requests() == [('GET', 'api/v3/catalog/c2', None)]
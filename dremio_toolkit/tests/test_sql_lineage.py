@@ -0,0 +1,114 @@
+#########################################################################
+# Copyright (C) 2023 UCE Systems Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Contact dremio@ucesys.com
+#########################################################################
+
+from dremio_toolkit.context import Context
+from dremio_toolkit.env_api import EnvApi
+from dremio_toolkit.env_reader import EnvReader
+from dremio_toolkit.sql_lineage import SqlLineage
+from dremio_toolkit.testing.mock_dremio_server import MockDremioServer
+from dremio_toolkit.testing.mock_env_definition import generate_env_definition
+
+
+def test_get_table_references():
+    assert SqlLineage.get_table_references('SELECT * FROM "Space"."My ""VDS""" NATURAL JOIN src.t') == \
+        [['Space', 'My "VDS"'], ['src', 't']]
+    assert SqlLineage.get_table_references('select a.x from t1 a, s.t2 as b, (select 1 from t3) c '
+                                           'where x in (select y from t4) -- from t5') == \
+        [['t1'], ['s', 't2'], ['t3'], ['t4']]
+    assert SqlLineage.get_table_references('SELECT EXTRACT(YEAR FROM d), TRIM(\' \' FROM n) FROM t') == [['t']]
+    assert SqlLineage.get_table_references('SELECT 1') == []
+    # Constructs that are not understood
+    for sql in ['WITH c AS (SELECT 1) SELECT * FROM c', 'SELECT * FROM (a JOIN b ON a.x = b.x)',
+                'SELECT * FROM TABLE(s.f(1))', 'SELECT * FROM s.t AT BRANCH main', 'SELECT * FROM `t`',
+                'SELECT * FROM "t', 'SELECT 1; SELECT 2', '']:
+        assert SqlLineage.get_table_references(sql) is None
+
+
+def test_sql_lineage_matches_graph():
+    env_def = generate_env_definition(num_vds=60)
+    # Context relative, mixed case and ambiguous references
+    pds_path = env_def.sources[0]['children'][0]['path']
+    env_def.vds_list[0]['sql'] = 'SELECT * FROM ' + '.'.join(pds_path[1:]).upper()
+    env_def.vds_list[0]['sqlContext'] = pds_path[:1]
+    env_def.vds_parents[0]['parents'] = ['/'.join(pds_path)]
+    env_def.vds_list[1]['sql'] = 'SELECT * FROM unknown_table'
+    context = Context(Context.CMD_CREATE_SNAPSHOT)
+    context.init_logger(log_level='ERROR', log_verbose=False)
+    with MockDremioServer(env_def) as server:
+        env_api = EnvApi(server.get_endpoint(), 'admin', 'password', context)
+        context.set_source(env_api=env_api)
+        graph_snapshot = EnvReader(context, 4).read_dremio_environment(None, False)
+        sql_reader = EnvReader(context, 4, EnvReader.LINEAGE_SOURCE_SQL)
+        sql_snapshot = sql_reader.read_dremio_environment(None, False)
+        assert list(sql_snapshot.vds_parents) == list(graph_snapshot.vds_parents)
+        # Only the VDS with an unknown table is read from the graph
+        assert sql_reader._graph_lineage_count == 1 and sql_reader._sql_lineage_count == 59
+        graph_requests = env_api.get_api_metrics().get_metrics()['GET catalog/{id}/graph']['count']
+        assert graph_requests == 60 + 1
+        env_api.close()
+
+
+class RowsEnvApi:
+    def __init__(self, views, tables):
+        self._rows = {'VIEWS': views, 'TABLES': tables}
+
+    def get_dremio_version(self):
+        return '24.0.0'
+
+    def execute_sql(self, sql):
+        jobid = 'VIEWS' if 'SYS."VIEWS"' in sql else 'TABLES'
+        return True, jobid, {'rowCount': len(self._rows[jobid])}
+
+    def iter_job_result(self, jobid, num_rows):
+        return iter(self._rows[jobid])
+
+
+def test_sql_lineage_dotted_names():
+    # Folder "a.b" is reported like folder "b" in folder "a"
+    lineage = SqlLineage(RowsEnvApi([{'PATH': '[Space, f, g, View]'}, {'PATH': '[Space, Folder, View]'}],
+                                    [{'TABLE_SCHEMA': 'src.a.b', 'TABLE_NAME': 't'},
+                                     {'TABLE_SCHEMA': 'src.c.d', 'TABLE_NAME': 't'},
+                                     {'TABLE_SCHEMA': 'src.c.d', 'TABLE_NAME': 't'}]))
+    assert lineage.load() and lineage.get_dataset_count() == 5
+    assert lineage.get_parents({'sql': 'SELECT * FROM src."a.b".T'}) == ['src/a.b/t']
+    assert lineage.get_parents({'sql': 'SELECT * FROM "A.B".t', 'sqlContext': ['SRC']}) == ['src/a.b/t']
+    assert lineage.get_parents({'sql': 'SELECT * FROM space."f, g".view JOIN space.folder.view ON 1 = 1'}) == \
+        ['Space/f, g/View', 'Space/Folder/View']
+    # Folder "c.d" and folder "d" in folder "c" cannot be told apart
+    assert lineage.get_parents({'sql': 'SELECT * FROM src."c.d".t'}) is None
+    assert lineage.get_parents({'sql': 'SELECT * FROM src.c.d.t'}) is None
+
+
+def test_sql_lineage_prefetched(monkeypatch):
+    calls = []
+    get_parents = SqlLineage.get_parents
+    monkeypatch.setattr(SqlLineage, 'get_parents', lambda self, vds: calls.append(vds['id']) or get_parents(self, vds))
+    env_def = generate_env_definition(num_vds=30)
+    env_def.vds_list[0]['sql'] = 'SELECT * FROM unknown_table'
+    context = Context(Context.CMD_CREATE_SNAPSHOT)
+    context.init_logger(log_level='ERROR', log_verbose=False)
+    with MockDremioServer(env_def) as server:
+        env_api = EnvApi(server.get_endpoint(), 'admin', 'password', context)
+        context.set_source(env_api=env_api)
+        sql_reader = EnvReader(context, 4, EnvReader.LINEAGE_SOURCE_SQL)
+        sql_snapshot = sql_reader.read_dremio_environment(None, False)
+        # Parents are derived once per VDS and every prefetched response is used by the serial traversal
+        assert sorted(calls) == sorted(vds['id'] for vds in env_def.vds_list)
+        assert sql_reader._prefetched == {}
+        assert len(sql_snapshot.vds_parents) == 30 and sql_reader._graph_lineage_count == 1
+        env_api.close()